@@ -0,0 +1,331 @@
+"""
+変換・エクスポート・同期・API のベンチマーク
+結果を JSON で出力し、--compare で以前の結果と比較する (遅くなったものがあれば終了コード 1)
+
+    python benchmarks/run.py --sizes 1000,10000 -o bench.json
+    python benchmarks/run.py --compare bench.json
+"""
+import sys
+import os
+import argparse
+import contextlib
+import io
+import json
+import platform
+import runpy
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+# プロジェクトルートをパスに追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from instance import config
+from src.clients.anki_connect import close_shared_client
+from src.core.converter import (
+    clear_conversion_cache,
+    create_markdown_content,
+    html_to_markdown,
+    markdown_to_html,
+    parse_anki_markdown,
+)
+from src.core.profiling import measure_import_time
+from src.testing.fake_anki_connect import FakeAnkiConnectServer, FakeAnkiStore
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+BENCH_DECK_NAME = "Benchmark"
+# 変換系のベンチマークで1回に変換する件数
+MICRO_BATCH = 1000
+# 比較時、平均がこの割合を超えて遅くなったら劣化とみなす
+DEFAULT_THRESHOLD = 0.2
+
+# 実際のカードに近い内容 (表・コードブロック・日本語)
+SAMPLE_MARKDOWN = """光合成 ({i}) の**明反応**と*暗反応*の違いを説明せよ。
+
+| 段階 | 場所 | 生成物 |
+| --- | --- | --- |
+| 明反応 | チラコイド膜 | ATP, NADPH, O₂ |
+| カルビン回路 | ストロマ | グルコース |
+
+```python
+def calvin_cycle(co2, atp, nadph):
+    return {{"glucose": co2 // 6, "id": {i}}}
+```
+
+- 光エネルギーを化学エネルギーに変換する
+- 参考: [光合成](https://ja.wikipedia.org/wiki/光合成)
+"""
+
+SAMPLE_HTML = """<p>光合成 ({i}) の<strong>明反応</strong>と<em>暗反応</em>の違いを説明せよ。</p>
+<table><thead><tr><th>段階</th><th>場所</th><th>生成物</th></tr></thead>
+<tbody><tr><td>明反応</td><td>チラコイド膜</td><td>ATP, NADPH, O₂</td></tr>
+<tr><td>カルビン回路</td><td>ストロマ</td><td>グルコース</td></tr></tbody></table>
+<pre><code class="language-python">def calvin_cycle(co2, atp, nadph):
+    return {{"glucose": co2 // 6, "id": {i}}}
+</code></pre>
+<ul><li>光エネルギーを化学エネルギーに変換する</li>
+<li>参考: <a href="https://ja.wikipedia.org/wiki/光合成">光合成</a></li></ul>
+"""
+
+
+def sample_note(i, field_front, field_back):
+    return {
+        "noteId": 1_600_000_000_000 + i,
+        "tags": ["生物::光合成", f"chapter{i % 10}"],
+        "fields": {
+            field_front: {"value": f"<p>問題 {i}: 光合成の<strong>明反応</strong>とは？</p>", "order": 0},
+            field_back: {"value": SAMPLE_HTML.format(i=i), "order": 1},
+        },
+    }
+
+
+def measure(func, repeat, setup=None):
+    """func を repeat 回実行して所要時間 (秒) の統計を返す (setup の時間は含めない)"""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min": min(times),
+        "mean": statistics.mean(times),
+        "median": statistics.median(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """スクリプトの進捗表示を抑える"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+# --- 変換 ---
+
+def bench_conversion(repeat):
+    results = {}
+    texts = [SAMPLE_MARKDOWN.format(i=i) for i in range(MICRO_BATCH)]
+    html = [SAMPLE_HTML.format(i=i) for i in range(MICRO_BATCH)]
+    notes = [sample_note(i, config.FIELD_FRONT, config.FIELD_BACK) for i in range(MICRO_BATCH)]
+    with quiet():
+        documents = [create_markdown_content(n, config.FIELD_FRONT, config.FIELD_BACK)[1] for n in notes]
+
+    # 変換結果のキャッシュが効かない状態 (初回変換) を測る
+    results["convert.markdown_to_html"] = measure(
+        lambda: [markdown_to_html(t) for t in texts], repeat, clear_conversion_cache)
+    results["convert.html_to_markdown"] = measure(
+        lambda: [html_to_markdown(h) for h in html], repeat, clear_conversion_cache)
+    results["convert.parse_anki_markdown"] = measure(
+        lambda: [parse_anki_markdown(d) for d in documents], repeat)
+    results["convert.create_markdown_content"] = measure(
+        lambda: [create_markdown_content(n, config.FIELD_FRONT, config.FIELD_BACK) for n in notes],
+        repeat, clear_conversion_cache)
+    for name in results:
+        results[name]["size"] = MICRO_BATCH
+    return results
+
+
+# --- 起動時間 ---
+
+STARTUP_TARGETS = {
+    "export": os.path.join(SCRIPTS_DIR, "export.py"),
+    "sync": os.path.join(SCRIPTS_DIR, "sync.py"),
+    "generate": os.path.join(SCRIPTS_DIR, "generate.py"),
+    "server": os.path.join(SCRIPTS_DIR, "..", "src", "server.py"),
+}
+
+
+def bench_startup(repeat):
+    """別プロセスでスクリプトを読み込むまでの時間 (インタプリタの起動を含む)。import_ms は import のみの時間"""
+    results = {}
+    for name, path in STARTUP_TARGETS.items():
+        import_times = []
+
+        def run():
+            _, imports = measure_import_time(os.path.abspath(path))
+            import_times.append(sum(item[2] for item in imports if item[3] == 0))
+
+        results[f"startup.{name}"] = measure(run, repeat)
+        results[f"startup.{name}"]["import_ms"] = statistics.median(import_times) * 1000
+    return results
+
+
+# --- Fake AnkiConnect を相手にしたスクリプト・API ---
+
+def build_store(size):
+    store = FakeAnkiStore()
+    store.decks.add(BENCH_DECK_NAME)
+    notes = []
+    for i in range(size):
+        note = sample_note(i, store.fields[0], store.fields[1])
+        notes.append({
+            "deckName": BENCH_DECK_NAME,
+            "modelName": store.model_name,
+            "fields": {name: field["value"] for name, field in note["fields"].items()},
+            "tags": note["tags"],
+        })
+    store.invoke("addNotes", {"notes": notes})
+    return store
+
+
+def run_script(name, argv):
+    """scripts/ のスクリプトの main() を同じプロセスで実行する"""
+    path = os.path.join(SCRIPTS_DIR, name)
+    module = runpy.run_path(path)
+    saved_argv = sys.argv
+    sys.argv = [path] + argv
+    try:
+        with quiet():
+            module["main"]()
+    finally:
+        sys.argv = saved_argv
+
+
+def bench_scripts(server, size, workdir):
+    results = {}
+    export_dir = os.path.join(workdir, "export")
+    config.OUTPUT_DIR = export_dir
+    config.SYNC_BASE_DIR = workdir
+    args = ["--deck", BENCH_DECK_NAME]
+
+    def clean_export():
+        shutil.rmtree(export_dir, ignore_errors=True)
+
+    def run(name, script, script_args, setup=None):
+        # AnkiConnect へのリクエスト数も記録する (往復回数の増加も劣化として見つけるため)
+        server.reset_stats()
+        results[name] = measure(lambda: run_script(script, script_args), 1, setup)
+        results[name]["requests"] = server.requests
+
+    # 初回 (全件) と、変更がない状態での再実行
+    run(f"export.full@{size}", "export.py", args, clean_export)
+    run(f"export.unchanged@{size}", "export.py", args)
+    run(f"sync.full@{size}", "sync.py", ["--dir", "export", "--force"])
+    run(f"sync.unchanged@{size}", "sync.py", ["--dir", "export"])
+    close_shared_client()
+    return results
+
+
+def bench_api(size, repeat):
+    from fastapi.testclient import TestClient
+    from src.server import app
+
+    results = {}
+    with TestClient(app) as http:
+        # 起動直後 (ノートキャッシュが空) の1ページ目
+        results[f"api.get_cards.first_page@{size}"] = measure(
+            lambda: http.get("/cards", params={"limit": 100}).raise_for_status(), 1)
+        results[f"api.get_cards.cached_page@{size}"] = measure(
+            lambda: http.get("/cards", params={"limit": 100, "offset": size // 2}).raise_for_status(), repeat)
+        results[f"api.get_cards.stream_all@{size}"] = measure(
+            lambda: http.get("/cards", params={"stream": "true"}).raise_for_status(), 1)
+    return results
+
+
+def bench_size(size, repeat, latency):
+    print(f"🧪 {size} 件のノートで計測中...", file=sys.stderr)
+    server = FakeAnkiConnectServer(build_store(size), latency=latency).start()
+    config.ANKI_CONNECT_URL = server.url
+    config.ANKI_DECK_NAME = BENCH_DECK_NAME
+    config.ANKI_MODEL_NAME = server.store.model_name
+    workdir = tempfile.mkdtemp(prefix="forAnki_bench_")
+    # サーバーの起動時に開く SQLite も一時ディレクトリに置く (開発用のインデックス・キャッシュを上書きしない)
+    config.SEARCH_INDEX_PATH = os.path.join(workdir, "search_index.sqlite3")
+    config.GEMINI_CACHE_PATH = os.path.join(workdir, "gemini_cache.sqlite3")
+    try:
+        results = bench_scripts(server, size, workdir)
+        results.update(bench_api(size, repeat))
+    finally:
+        close_shared_client()
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    for name in results:
+        results[name]["size"] = size
+    return results
+
+
+# --- 出力・比較 ---
+
+def metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(baseline, results, threshold):
+    """平均時間を比較して表示し、劣化したベンチマーク名のリストを返す"""
+    regressions = []
+    print(f"{'benchmark':45} {'before':>10} {'after':>10} {'ratio':>7}", file=sys.stderr)
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:45} {'-':>10} {result['mean']:10.4f} {'new':>7}", file=sys.stderr)
+            continue
+        ratio = result["mean"] / before["mean"] if before["mean"] else float("inf")
+        mark = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            mark = " ❌"
+        print(f"{name:45} {before['mean']:10.4f} {result['mean']:10.4f} {ratio:7.2f}{mark}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run forAnki benchmarks and emit JSON results")
+    parser.add_argument("--sizes", type=str, default="1000,10000", help="Comma separated note counts (e.g. 1000,10000,100000)")
+    parser.add_argument("--repeat", "-r", type=int, default=5, help="Repetitions for micro benchmarks")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake AnkiConnect latency per request (seconds)")
+    parser.add_argument("--only", type=str, help="Run only benchmarks whose group matches (convert, startup, scripts)")
+    parser.add_argument("--output", "-o", type=str, help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", type=str, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown ratio before failing")
+    args = parser.parse_args()
+
+    results = {}
+    if args.only in (None, "convert"):
+        print("🧪 変換のベンチマークを計測中...", file=sys.stderr)
+        results.update(bench_conversion(args.repeat))
+    if args.only in (None, "startup"):
+        print("🧪 起動時間を計測中...", file=sys.stderr)
+        results.update(bench_startup(args.repeat))
+    if args.only in (None, "scripts"):
+        for size in (int(s) for s in args.sizes.split(",") if s):
+            results.update(bench_size(size, args.repeat, args.latency))
+
+    report = {"meta": metadata(), "results": results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"✅ 結果を保存しました: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} 件のベンチマークが遅くなりました: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+        print("✅ 劣化はありません。", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,18 @@ load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
 ANKI_DECK_NAME = os.getenv("ANKI_DECK_NAME")
 ANKI_MODEL_NAME = os.getenv("ANKI_MODEL_NAME")
 ANKI_CONNECT_URL = os.getenv("ANKI_CONNECT_URL")
+ANKI_CONNECT_BATCH_SIZE = int(os.getenv("ANKI_CONNECT_BATCH_SIZE", "100")) # multi 1回あたりのアクション数上限
+ANKI_CONNECT_POOL_SIZE = int(os.getenv("ANKI_CONNECT_POOL_SIZE", "4")) # Keep-Alive 接続の最大数
+ANKI_CONNECT_CONNECT_TIMEOUT = float(os.getenv("ANKI_CONNECT_CONNECT_TIMEOUT", "3")) # 秒
+ANKI_CONNECT_READ_TIMEOUT = float(os.getenv("ANKI_CONNECT_READ_TIMEOUT", "60")) # 秒
+ANKI_CONNECT_RETRIES = int(os.getenv("ANKI_CONNECT_RETRIES", "3")) # 接続拒否時のリトライ回数
 
 # ファイル設定
 OUTPUT_DIR = os.getenv("OUTPUT_DIR", "export_sample")
 SYNC_BASE_DIR = os.getenv("SYNC_BASE_DIR", ".") # 同期用ベースディレクトリ
+SYNC_CARD_TYPE = os.getenv("SYNC_CARD_TYPE", "AnkiCards") # ディレクトリ同期の対象にする Frontmatter の type (空にするとすべての .md)
 TARGET_FILE = os.getenv("TARGET_FILE", "sample_anki_card.md")
+FILE_WRITER_WORKERS = int(os.getenv("FILE_WRITER_WORKERS", "8")) # エクスポート時にファイルを並行に書き込むスレッド数
 
 # フィールド名
 FIELD_FRONT = os.getenv("FIELD_FRONT", "表面")
@@ -21,3 +28,18 @@ FIELD_BACK = os.getenv("FIELD_BACK", "裏面")
 # Gemini API
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME")
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60")) # レート制限 (1分あたり)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")) # バッチ生成の同時実行数
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3")) # クォータ超過時のリトライ回数
+GEMINI_RETRY_BACKOFF = float(os.getenv("GEMINI_RETRY_BACKOFF", "2")) # リトライ間隔の初期値 (秒)
+GEMINI_CACHE_ENABLED = os.getenv("GEMINI_CACHE_ENABLED", "true").lower() in ("1", "true", "yes") # レスポンスキャッシュ
+GEMINI_CACHE_PATH = os.getenv("GEMINI_CACHE_PATH", os.path.join(os.path.dirname(__file__), "gemini_cache.sqlite3"))
+GEMINI_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", str(7 * 86400))) # 秒
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "5000"))
+
+# カードの全文検索インデックス (GET /cards/search)
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(os.path.dirname(__file__), "search_index.sqlite3"))
+SEARCH_INDEX_REFRESH_INTERVAL = float(os.getenv("SEARCH_INDEX_REFRESH_INTERVAL", "30")) # Anki との照合間隔 (秒)
+
+# 計測
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() in ("1", "true", "yes") # Server-Timing ヘッダーで処理時間の内訳を返す
@@ -5,6 +5,7 @@ import unittest
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from src.clients.anki_connect import AnkiConnectClient
+from src.testing.fake_anki_connect import FakeAnkiConnectServer, FakeAnkiStore
 
 class TestAnkiConnect(unittest.TestCase):
     def test_connection_and_deck_names(self):
@@ -26,5 +27,38 @@ class TestAnkiConnect(unittest.TestCase):
             # CI/コード生成中にAnkiが起動していない場合でもテストを失敗させない
             pass
 
+class TestAnkiConnectWithFake(unittest.TestCase):
+    """Ankiを起動せず、FakeAnkiConnectServer を相手にクライアントの動作を確認する"""
+    def setUp(self):
+        self.store = FakeAnkiStore.populated(1000, "Sample")
+        self.server = FakeAnkiConnectServer(self.store).start()
+        self.client = AnkiConnectClient(self.server.url)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_find_and_notes_info(self):
+        note_ids = self.client.invoke('findNotes', query='"deck:Sample"')
+        self.assertEqual(len(note_ids), 1000)
+        notes = self.client.notes_info(note_ids, chunk_size=300)
+        self.assertEqual([n["noteId"] for n in notes], note_ids)
+        # 300件ずつ4回に分けて、1回の multi で取得している
+        self.assertEqual(self.server.actions["notesInfo"], 4)
+
+    def test_add_and_update_in_batch(self):
+        front, back = self.store.fields
+        note = {"deckName": "Sample", "modelName": self.store.model_name,
+                "fields": {front: "new", back: "answer"}, "tags": ["sample"]}
+        note_id = self.client.invoke('addNote', note=note)
+        self.assertIsNotNone(note_id)
+
+        with self.client.batch() as batch:
+            update = batch.add('updateNoteFields', note={"id": note_id, "fields": {back: "changed"}})
+            duplicate = batch.add('addNote', note=note)
+        self.assertTrue(update.ok)
+        self.assertFalse(duplicate.ok)
+        self.assertEqual(self.store.notes[note_id]["fields"][back]["value"], "changed")
+
 if __name__ == '__main__':
     unittest.main()
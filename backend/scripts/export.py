@@ -7,81 +7,239 @@ import argparse
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from instance import config
-from src.clients.anki_connect import AnkiConnectClient
+from src.clients.anki_connect import get_shared_client
 from src.clients.obsidian import ObsidianClient
-from src.core.converter import create_markdown_content
+from src.core.anki_query import deck_query
+from src.core.converter import create_markdown_contents
+from src.core.export_manifest import ExportManifest, content_hash
+from src.core.file_writer import FileWriter
+from src.core.processor import deck_directory
+from src.core.profiling import add_import_time_argument, add_profile_argument, profiled, report_import_time
 
 def main():
     # 0. 設定
     parser = argparse.ArgumentParser(description="Export Anki notes to Markdown")
-    parser.add_argument("--deck", "-d", type=str, default=config.ANKI_DECK_NAME, help="Name of the Anki deck to export")
+    parser.add_argument("--deck", "-d", type=str, action="append",
+                        help="Name of the Anki deck to export (repeatable; default: ANKI_DECK_NAME)")
+    parser.add_argument("--all-decks", "-a", action="store_true", help="Export every deck in the collection")
+    parser.add_argument("--full", action="store_true", help="Ignore the export manifest and re-export every note")
+    add_profile_argument(parser)
+    add_import_time_argument(parser)
     args = parser.parse_args()
-    
-    deck_name = args.deck
 
-    client = AnkiConnectClient(config.ANKI_CONNECT_URL)
+    if args.import_time:
+        report_import_time(__file__)
+        return
+
+    with profiled(args.profile):
+        export(args)
+
+def export_layout(deck_names, all_decks=False):
+    """出力先のファイルの配置 (1つのデッキなら直下、複数デッキ・全デッキならデッキの階層をフォルダにする)"""
+    return "tree" if all_decks or len(set(deck_names)) > 1 else "flat"
+
+def find_deck_notes(client, deck_names, all_decks=False):
+    """
+    エクスポートするノートを検索し、({note id: 出力先のサブディレクトリ}, すべての検索が成功したか) を返す
+    デッキが1つだけならサブデッキも含めて出力先の直下に出す (従来どおり)
+    複数デッキ・全デッキの場合はサブデッキも含めてデッキごとに検索し、デッキの階層をフォルダにする
+    (1つのノートのカードが複数のデッキにある場合は、名前順で最初のデッキに出力する)
+    """
+    if not all_decks and len(deck_names) == 1:
+        print(f"🔍 デッキ '{deck_names[0]}' からカードを検索中...")
+        note_ids = client.invoke('findNotes', query=deck_query(deck_names[0]))
+        return {note_id: "" for note_id in note_ids or []}, note_ids is not None
+
+    existing_decks = client.invoke('deckNames') or []
+    if all_decks:
+        decks = sorted(existing_decks)
+    else:
+        decks = sorted(
+            deck for deck in existing_decks
+            if any(deck == name or deck.startswith(name + "::") for name in deck_names)
+        )
+    print(f"🔍 {len(decks)} 個のデッキからカードを検索中...")
+
+    # デッキごとの findNotes は multi でまとめて送る
+    batch = client.batch()
+    lookups = [(deck, batch.add('findNotes', query=deck_query(deck, include_subdecks=False))) for deck in decks]
+    batch.flush()
+
+    note_dirs = {}
+    complete = True
+    for deck, lookup in lookups:
+        if not lookup.ok:
+            print(f"⚠️ デッキ '{deck}' の検索に失敗しました: {lookup.error}")
+            complete = False
+            continue
+        directory = deck_directory(deck)
+        for note_id in lookup.result or []:
+            note_dirs.setdefault(note_id, directory)
+    return note_dirs, complete
+
+def export_scope(deck_names, all_decks=False):
+    """
+    マニフェストに記録するエクスポート範囲の識別子
+    同じ出力先に別のデッキをエクスポートした場合に、そのデッキにないノートを「消えた」とみなさないために使う
+    """
+    if all_decks:
+        return "all"
+    return "deck:" + "\n".join(sorted(set(deck_names)))
+
+def export(args):
+    """Anki のノートを Markdown ファイルにエクスポートする"""
+    deck_names = args.deck or [config.ANKI_DECK_NAME]
+    scope = export_scope(deck_names, args.all_decks)
+    layout = export_layout(deck_names, args.all_decks)
+
+    client = get_shared_client()
     obsidian = ObsidianClient(config.OUTPUT_DIR)
-    
+
     if not os.path.exists(config.OUTPUT_DIR):
         os.makedirs(config.OUTPUT_DIR)
         print(f"📁 フォルダを作成しました: {config.OUTPUT_DIR}")
 
+    # 配置の異なるエクスポートを同じ出力先に混ぜると、ファイルの移動を「ノートが消えた」と区別できないため受け付けない
+    manifest = ExportManifest.load(config.OUTPUT_DIR)
+    if manifest.layout is not None and manifest.layout != layout:
+        existing = "デッキごとのフォルダ" if manifest.layout == "tree" else "フォルダ分けなし"
+        print(f"❌ {config.OUTPUT_DIR} には別の配置 ({existing}) でエクスポート済みです。"
+              "単一デッキと複数デッキ (--all-decks) のエクスポートは別の出力先に出力してください。")
+        return
+
     # 1. デッキ確認
-    print(f"🔍 デッキ '{deck_name}' からカードを検索中...")
-    query = f'"deck:{deck_name}"'
-    note_ids = client.invoke('findNotes', query=query)
-    
+    note_dirs, complete = find_deck_notes(client, deck_names, args.all_decks)
+    note_ids = list(note_dirs)
+
     if not note_ids:
+        # デッキ名の誤りなどでマニフェストのファイルを消してしまわないよう、ここで終了する
         print("⚠️ カードが見つかりませんでした。")
         return
 
-    print(f"📋 {len(note_ids)} 件のカードが見つかりました。詳細を取得します...")
+    print(f"📋 {len(note_ids)} 件のカードが見つかりました。")
+
+    # 2. 前回のエクスポート結果 (マニフェスト) を読み込み、更新されたノートだけを対象にする
+    #    (--full でも他のデッキの記録は残すため、読み込んだ上で全件を対象にする)
+    manifest.layout = layout
+    if len(manifest) == 0:
+        # マニフェストがない場合 (初回・旧バージョンで出力済み) はファイル名から既存ファイルを拾う
+        existing_files = obsidian.get_existing_files(recursive=layout == "tree")
+    else:
+        existing_files = {note_id: entry["filename"] for note_id, entry in manifest.entries.items()}
 
-    # 2. ノート詳細取得
-    notes_info = client.invoke('notesInfo', notes=note_ids)
+    mods = {}
+    if len(manifest) > 0 and not args.full:
+        mod_times = client.invoke('notesModTime', notes=note_ids)
+        if mod_times:
+            mods = {m['noteId']: m['mod'] for m in mod_times}
 
-    # 3. 既存ファイル取得
-    existing_files = obsidian.get_existing_files()
+    # デッキを移動したノートはファイルの場所が変わるため、更新されていなくても対象にする
+    target_ids = [
+        nid for nid in note_ids
+        if not manifest.is_up_to_date(nid, mods.get(nid))
+        or os.path.dirname(manifest.get(nid)["filename"]) != note_dirs[nid]
+    ]
+    # 書き出さないノートも今回の範囲に含まれることを記録する (別のデッキから移動したノートなど)
+    for nid in note_ids:
+        manifest.add_scope(nid, scope)
+    unchanged_count = len(note_ids) - len(target_ids)
+    if unchanged_count:
+        print(f"⏭️ 前回から変更のない {unchanged_count} 件をスキップします。")
 
-    # 4. ファイル書き出し
+    # 3. ノート詳細の取得・変換・ファイル書き出しを重ねて行う
+    #    (notesInfo はチャンク分割して multi でまとめて取得し、次のチャンクは変換・書き出し中に先に取得する。
+    #     書き出しは一時ファイル経由で置き換え、スレッドプールで並行に行う)
     count = 0
     updated_count = 0
     renamed_count = 0
+    skipped_count = 0
+    deleted_count = 0
+    failed_count = 0
+    written_count = 0
+    created_dirs = set()
+
+    def on_done(operation):
+        # 書き込みが終わった順ではなく、追加した順に呼ばれる
+        nonlocal written_count, deleted_count, failed_count
+        if not operation.ok:
+            print(f"⚠️ ファイル{'書き込み' if operation.action == 'write' else '削除'}エラー: {operation.error}")
+            failed_count += 1
+            return
+        if operation.action == "remove":
+            manifest.remove(operation.key)
+            if operation.changed:
+                print(f"🗑️ 削除: '{os.path.basename(operation.path)}'")
+                deleted_count += 1
+            return
+
+        note_id, mod, filename, hash_ = operation.key
+        manifest.set(note_id, mod, filename, hash_, scope)
+        written_count += 1
+        if written_count % 10 == 0:
+            print(f"Processing... {written_count}/{len(target_ids)}")
+
+    with FileWriter(config.FILE_WRITER_WORKERS, on_done=on_done) as writer:
+        for notes_info in client.iter_notes_info(target_ids):
+            # 設定からフィールド名を渡す (フィールドの変換は件数に応じて並列に行われる)
+            contents = create_markdown_contents(notes_info, config.FIELD_FRONT, config.FIELD_BACK)
+
+            for note, (title, content) in zip(notes_info, contents):
+                note_id = note['noteId']
+
+                directory = note_dirs.get(note_id, "")
+                new_filename = f"{title}_{note_id}.md"
+                if directory:
+                    new_filename = f"{directory}/{new_filename}"
+                    if directory not in created_dirs:
+                        os.makedirs(os.path.join(config.OUTPUT_DIR, directory), exist_ok=True)
+                        created_dirs.add(directory)
+                new_filepath = os.path.join(config.OUTPUT_DIR, new_filename)
+                new_hash = content_hash(content)
+
+                old_filename = None
+                if note_id in existing_files:
+                    old_filename = existing_files[note_id]
+                    if old_filename != new_filename:
+                        print(f"🔄 リネーム: '{old_filename}' -> '{new_filename}'")
+                        renamed_count += 1
+                    else:
+                        old_filename = None
+                        entry = manifest.get(note_id)
+                        if not args.full and entry and entry.get("hash") == new_hash and os.path.exists(new_filepath):
+                            # Anki側で更新されたが、書き出す内容は変わらない場合 (学習履歴の更新など)
+                            skipped_count += 1
+                            manifest.set(note_id, note.get('mod'), new_filename, new_hash, scope)
+                            continue
+                        updated_count += 1
+                else:
+                    count += 1
+
+                # リネームの場合は新しいファイルを書き込んでから旧ファイルを消す (途中で落ちても内容が失われないように)
+                old_filepath = os.path.join(config.OUTPUT_DIR, old_filename) if old_filename else None
+                writer.write(new_filepath, content, key=(note_id, note.get('mod'), new_filename, new_hash), replaces=old_filepath)
+
+        # 4. 今回と同じ範囲で前回エクスポートしたノートのうち、デッキから消えたもののファイルを削除する
+        #    (別のデッキのエクスポートでも書き出したノートは、そちらの記録が残っている間は消さない)
+        #    (一部のデッキの検索に失敗した場合は、消えたかどうか分からないので削除しない)
+        current_ids = set(note_ids)
+        removed_ids = [nid for nid in manifest.note_ids_in_scope(scope) if nid not in current_ids]
+        if removed_ids and not complete:
+            print(f"⚠️ 検索に失敗したデッキがあるため、{len(removed_ids)} 件のファイルの削除を見送ります。")
+            removed_ids = []
+        for note_id in removed_ids:
+            if manifest.release(note_id, scope):
+                writer.remove(os.path.join(config.OUTPUT_DIR, manifest.get(note_id)["filename"]), key=note_id)
 
-    for note in notes_info:
-        note_id = note['noteId']
-        # 設定からフィールド名を渡す
-        title, content = create_markdown_content(note, config.FIELD_FRONT, config.FIELD_BACK)
-        
-        new_filename = f"{title}_{note_id}.md"
-        new_filepath = os.path.join(config.OUTPUT_DIR, new_filename)
-
-        if note_id in existing_files:
-            old_filename = existing_files[note_id]
-            if old_filename != new_filename:
-                old_filepath = os.path.join(config.OUTPUT_DIR, old_filename)
-                try:
-                    os.remove(old_filepath)
-                    print(f"🔄 リネーム: '{old_filename}' -> '{new_filename}'")
-                    renamed_count += 1
-                except OSError as e:
-                    print(f"⚠️ 旧ファイル削除エラー: {e}")
-            else:
-                updated_count += 1
-        else:
-            count += 1
-
-        with open(new_filepath, "w", encoding="utf-8") as f:
-            f.write(content)
-        
-        total_processed = count + updated_count + renamed_count
-        if (total_processed) % 10 == 0:
-            print(f"Processing... {total_processed}/{len(note_ids)}")
+    manifest.save()
 
     print(f"✅ 完了！")
     print(f"  - 新規作成: {count} 件")
     print(f"  - 更新: {updated_count} 件")
     print(f"  - リネーム(更新): {renamed_count} 件")
+    print(f"  - 変更なし: {unchanged_count + skipped_count} 件")
+    print(f"  - 削除: {deleted_count} 件")
+    if failed_count:
+        print(f"  - エラー: {failed_count} 件")
     print(f"  - 合計: {count + updated_count + renamed_count} 件")
 
 if __name__ == "__main__":
@@ -0,0 +1,110 @@
+import sys
+import os
+import argparse
+import asyncio
+import json
+
+# プロジェクトルートをパスに追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from instance import config
+from src.clients.anki_connect import get_shared_client
+from src.clients.gemini import get_gemini_client
+from src.core.converter import markdown_to_html
+from src.core.prompts import GENERATE_SCHEMA, build_generate_prompt
+from src.core.profiling import add_import_time_argument, add_profile_argument, profiled, report_import_time
+
+# addNotes の1アクションあたりのノート数
+ADD_CHUNK_SIZE = 100
+
+def load_topics(args):
+    topics = list(args.topics)
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            topics.extend(line.strip() for line in f if line.strip())
+    return topics
+
+def add_to_anki(cards, deck_name):
+    """生成したカードを addNotes でまとめてAnkiへ登録する"""
+    client = get_shared_client()
+    batch = client.batch()
+    notes = [
+        {
+            "deckName": deck_name,
+            "modelName": config.ANKI_MODEL_NAME,
+            "fields": {
+                config.FIELD_FRONT: markdown_to_html(card["front"]),
+                config.FIELD_BACK: markdown_to_html(card["back"])
+            },
+            "tags": [],
+        }
+        for card in cards
+    ]
+    adds = [batch.add("addNotes", notes=notes[i:i + ADD_CHUNK_SIZE]) for i in range(0, len(notes), ADD_CHUNK_SIZE)]
+    batch.flush()
+
+    added = 0
+    for add in adds:
+        if add.ok and add.result:
+            added += sum(1 for note_id in add.result if note_id)
+    print(f"✅ Ankiへ {added}/{len(notes)} 件登録しました。", file=sys.stderr)
+
+def main():
+    # 0. 設定
+    parser = argparse.ArgumentParser(description="Generate Anki cards from topics with Gemini")
+    parser.add_argument("topics", nargs="*", help="Topics to generate cards for")
+    parser.add_argument("--file", "-f", type=str, help="Text file with one topic per line")
+    parser.add_argument("--output", "-o", type=str, help="Write results as JSON to this file (default: stdout)")
+    parser.add_argument("--concurrency", "-c", type=int, default=config.GEMINI_MAX_CONCURRENCY, help="Maximum concurrent Gemini requests")
+    parser.add_argument("--add", action="store_true", help="Add the generated cards to Anki")
+    parser.add_argument("--deck", "-d", type=str, default=config.ANKI_DECK_NAME, help="Deck to add cards to (with --add)")
+    add_profile_argument(parser)
+    add_import_time_argument(parser)
+    args = parser.parse_args()
+
+    if args.import_time:
+        report_import_time(__file__)
+        return
+
+    with profiled(args.profile):
+        generate(args)
+
+def generate(args):
+    """トピックからカードを生成する"""
+    topics = load_topics(args)
+    if not topics:
+        print("エラー: トピックを指定してください。", file=sys.stderr)
+        return
+
+    # 1. 並行して生成 (レート制限・リトライは GeminiClient 側で行う)
+    print(f"🤖 {len(topics)} 件のトピックからカードを生成します...", file=sys.stderr)
+    client = get_gemini_client()
+    outputs = asyncio.run(client.generate_batch(
+        [build_generate_prompt(t) for t in topics], args.concurrency, response_schema=GENERATE_SCHEMA
+    ))
+
+    results = []
+    for topic, output in zip(topics, outputs):
+        if isinstance(output, Exception):
+            print(f"❌ エラー ({topic}): {output}", file=sys.stderr)
+            results.append({"topic": topic, "error": str(output)})
+        else:
+            results.append({"topic": topic, **output})
+
+    cards = [r for r in results if "error" not in r and r.get("front") and r.get("back")]
+    print(f"✅ 生成完了: {len(cards)}/{len(topics)} 件", file=sys.stderr)
+
+    # 2. 出力
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"💾 {args.output} に保存しました。", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.add and cards:
+        add_to_anki(cards, args.deck)
+
+if __name__ == "__main__":
+    main()
@@ -1,106 +1,326 @@
 import sys
 import os
 import argparse
-import glob
 
 # プロジェクトルートをパスに追加
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from instance import config
-from src.clients.anki_connect import AnkiConnectClient
+from src.clients.anki_connect import get_shared_client
 from src.clients.obsidian import ObsidianClient
-from src.core.converter import parse_anki_markdown, markdown_to_html
+from src.core.converter import markdown_to_html, parse_anki_markdown, read_frontmatter_value
+from src.core.note_diff import changed_note_fields, diff_tags, tag_operations
+from src.core.note_index import NoteIndex
+from src.core.processor import text_hash
+from src.core.profiling import add_import_time_argument, add_profile_argument, profiled, report_import_time
+from src.core.sync_state import SyncState
+from src.core.scanner import path_matches, scan_markdown
 
-def sync_file(file_path, client, obsidian):
-    print(f"Processing: {file_path}")
-    if not os.path.exists(file_path):
-        print(f"エラー: {file_path} が見つかりません。")
-        return
+# カードかどうかを判定するために先に読むファイル先頭の文字数
+FRONTMATTER_PEEK_SIZE = 4096
+# 1回の multi でまとめて送信するファイル数 (読み込んだ内容を保持する件数の上限)
+SYNC_CHUNK_SIZE = 500
+
+def load_file(file_path, state=None, stat=None, card_type=None):
+    """
+    Markdownファイルを読み込んでパースする。同期対象外・前回から変更がない場合は None を返す
+    card_type を指定すると、Frontmatter の type が一致するファイルだけを読み込む (まず先頭だけを読んで判定する)
+    戻り値: {"path", "data", "stat", "content"}
+    """
+    if stat is None:
+        if not os.path.exists(file_path):
+            print(f"エラー: {file_path} が見つかりません。")
+            return None
+        stat = os.stat(file_path)
+    if state is not None and state.is_unchanged(file_path, stat):
+        return None
 
     with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-    
+        if card_type:
+            content, is_card = read_card_file(f, card_type)
+            if not is_card:
+                # カード以外のノートは、変更されるまで読み込まない
+                if state is not None:
+                    state.record_file(file_path, stat, content)
+                return None
+        else:
+            content = f.read()
+
+    if state is not None:
+        entry = state.get(file_path)
+        if entry is not None and entry.get("hash") == text_hash(content):
+            # 更新時刻だけが変わった (保存し直しただけ) 場合
+            state.record_file(file_path, stat, content)
+            return None
+
+    print(f"Processing: {file_path}")
     data = parse_anki_markdown(content)
-    
+
     if not data["front"] or not data["back"]:
         print(f"⚠️ {file_path}: Question または Answer が見つかりませんでした。スキップします。")
-        return
+        if state is not None:
+            state.record_file(file_path, stat, content)
+        return None
+    return {"path": file_path, "data": data, "stat": stat, "content": content}
 
-    # 2. IDまたは内容で既存チェック
-    if data["id"] is None:
-        # 表面フィールドで検索
-        query = f'"note:{config.ANKI_MODEL_NAME}" "{data["front"]}"'
-        existing_ids = client.invoke('findNotes', query=query)
-        
-        if existing_ids:
-            print(f"⚠️ 既存のカードが見つかりました (ID: {existing_ids[0]})。IDをファイルに追記して更新します。")
-            data["id"] = existing_ids[0]
-            obsidian.update_file_id(file_path, data["id"])
+def read_card_file(f, card_type):
+    """
+    Frontmatter の type が card_type なら (ファイル全体, True)、違えば (読んだ先頭部分, False) を返す
+    カード以外のノートは先頭だけを読んで判定する
+    """
+    content = f.read(FRONTMATTER_PEEK_SIZE)
+    value = read_frontmatter_value(content, "type")
+    if value is None and content.startswith("---") and len(content) == FRONTMATTER_PEEK_SIZE:
+        # Frontmatter が先頭部分に収まっていない
+        content += f.read()
+        value = read_frontmatter_value(content, "type")
+    if value != card_type:
+        return content, False
+    return content + f.read(), True
 
-    # 3. 追加または更新
-    if data["id"] is None:
-        # 追加
-        print("🆕 新規カードとして登録します...")
-        note = {
-            "deckName": config.ANKI_DECK_NAME,
-            "modelName": config.ANKI_MODEL_NAME,
-            "fields": {
-                config.FIELD_FRONT: markdown_to_html(data["front"]),
-                config.FIELD_BACK: markdown_to_html(data["back"])
-            },
-            "tags": data["tags"]
-        }
-        new_id = client.invoke("addNote", note=note)
-        
-        if new_id:
-            print(f"✅ 登録成功！ Note ID: {new_id}")
-            obsidian.update_file_id(file_path, new_id)
-            
-    else:
-        # 更新
-        print(f"🔄 既存カード(ID: {data['id']}) を更新します...")
-        note = {
-            "id": data["id"],
-            "fields": {
-                config.FIELD_FRONT: markdown_to_html(data["front"]),
-                config.FIELD_BACK: markdown_to_html(data["back"])
-            },
+def write_file_id(entry, note_id, obsidian):
+    """ファイルにIDを書き込み、書き換え後のファイル情報を entry に反映する"""
+    entry["content"] = obsidian.update_file_id(entry["path"], note_id)
+    entry["stat"] = os.stat(entry["path"])
+
+def sync_files(files, client, obsidian, state=None, note_index=None, card_type=None):
+    """
+    複数のMarkdownファイルをまとめてAnkiへ同期する
+    files はパス (または scan_markdown の (パス, stat)) のイテラブルで、ジェネレーターでもよい
+    読み込んだファイルは SYNC_CHUNK_SIZE 件ずつ、追加・更新を multi アクションでまとめて送信する
+    state (SyncState) を渡すと、前回から変更のないファイル・フィールドは送信しない
+    note_index (NoteIndex) を省略すると、IDのないファイルがある場合に SYNC_BASE_DIR から読み込む
+    card_type を指定すると、Frontmatter の type が一致するファイルだけを同期する
+    戻り値: 処理したファイル数
+    """
+    index_ready = False
+
+    def get_note_index():
+        # IDのないファイルが見つかった時に読み込み、実行ごとに1回だけ更新する
+        nonlocal note_index, index_ready
+        if not index_ready:
+            if note_index is None:
+                note_index = NoteIndex.load(config.SYNC_BASE_DIR, config.ANKI_MODEL_NAME, config.FIELD_FRONT)
+            fetched = note_index.refresh(client)
+            if fetched:
+                print(f"🔍 既存ノートのインデックスを更新しました ({fetched} 件取得 / 全 {len(note_index)} 件)")
+            index_ready = True
+        return note_index
+
+    # 読み込み (前回から変更のないファイルは読み込まない) と送信を、SYNC_CHUNK_SIZE 件ごとに繰り返す
+    file_count = 0
+    loaded_count = 0
+    totals = [0, 0, 0] # 送信・新規登録・更新
+    entries = []
+    for item in files:
+        file_path, stat = item if isinstance(item, tuple) else (item, None)
+        file_count += 1
+        try:
+            entry = load_file(file_path, state, stat, card_type)
+        except Exception as e:
+            print(f"❌ エラー ({file_path}): {e}")
+            continue
+        if not entry:
+            continue
+        entries.append(entry)
+        loaded_count += 1
+        if len(entries) >= SYNC_CHUNK_SIZE:
+            totals = [a + b for a, b in zip(totals, sync_entries(entries, client, obsidian, state, get_note_index))]
+            entries = []
+    if entries:
+        totals = [a + b for a, b in zip(totals, sync_entries(entries, client, obsidian, state, get_note_index))]
+
+    unchanged_count = file_count - loaded_count
+    if unchanged_count and state is not None:
+        print(f"⏭️ 変更のない {unchanged_count} 件のファイルをスキップしました。")
+    if index_ready:
+        note_index.save()
+
+    sent_count, added_count, updated_count = totals
+    if loaded_count and not sent_count:
+        print("✅ Ankiへ送信が必要な変更はありませんでした。")
+    elif sent_count:
+        print(f"✅ 完了！ 新規登録: {added_count} 件 / 更新: {updated_count} 件")
+    return file_count
+
+def sync_entries(entries, client, obsidian, state, get_note_index):
+    """
+    読み込み済みのファイル (load_file の戻り値) をAnkiへ送信する
+    戻り値: (送信したカード数, 新規登録数, 更新数)
+    """
+    batch = client.batch()
+    for entry in entries:
+        entry["fields"] = {
+            config.FIELD_FRONT: markdown_to_html(entry["data"]["front"]),
+            config.FIELD_BACK: markdown_to_html(entry["data"]["back"])
         }
-        # 注意: タグの更新ロジックはAnkiConnectでは別になっている (addTags/removeTags/updateNoteTags)
-        # 現時点では、オリジナルのスクリプトのロジックに従い、フィールドのみを更新する
-        result = client.invoke("updateNoteFields", note=note)
-        if result is None: 
-            print("✅ 更新成功！")
+
+    # 1. IDがないファイルは既存ノートの表面フィールドのインデックスで重複チェック
+    #    (ファイルごとの問い合わせはしない)
+    note_index = None
+    if any(entry["data"]["id"] is None for entry in entries):
+        note_index = get_note_index()
+        for entry in entries:
+            if entry["data"]["id"] is not None:
+                continue
+            existing_id = note_index.find(entry["fields"][config.FIELD_FRONT])
+            if existing_id is not None:
+                print(f"⚠️ {entry['path']}: 既存のカードが見つかりました (ID: {existing_id})。IDをファイルに追記して更新します。")
+                entry["data"]["id"] = existing_id
+                write_file_id(entry, existing_id, obsidian)
+
+    # 2. 既存ノートのうちタグが前回の同期から変わった (または記録がない) ものは、
+    #    現在のタグ・フィールドを取得して差分だけを送る
+    check_ids = [
+        entry["data"]["id"] for entry in entries
+        if entry["data"]["id"] is not None
+        and (state is None or state.tags_changed(entry["path"], entry["data"]["id"], entry["data"]["tags"]))
+    ]
+    current_notes = {}
+    if check_ids:
+        current_notes = {note["noteId"]: note for note in client.notes_info(check_ids) if note}
+
+    # 3. 追加または更新
+    operations = []
+    for entry in entries:
+        data = entry["data"]
+        fields = entry["fields"]
+        if data["id"] is None:
+            # 追加
+            note = {
+                "deckName": config.ANKI_DECK_NAME,
+                "modelName": config.ANKI_MODEL_NAME,
+                "fields": fields,
+                "tags": data["tags"]
+            }
+            operations.append((entry, fields, [batch.add("addNote", note=note)]))
+            continue
+
+        # 更新 (前回送信した内容・Ankiの現在の値から変わったフィールドとタグの差分のみ送る)
+        note_id = data["id"]
+        if state is not None:
+            fields = state.changed_fields(entry["path"], note_id, fields)
+        tag_ops = []
+        current = current_notes.get(note_id)
+        if current is not None:
+            fields = changed_note_fields(current, fields)
+            tag_ops = tag_operations(note_id, *diff_tags(current.get("tags", []), data["tags"]))
+
+        if not fields and not tag_ops:
+            if state is not None:
+                state.record_push(entry["path"], note_id, {}, data["tags"] if current is not None else None)
+                state.record_file(entry["path"], entry["stat"], entry["content"])
+            continue
+
+        ops = []
+        if fields:
+            ops.append(batch.add("updateNoteFields", note={"id": note_id, "fields": fields}))
+        ops.extend(batch.add(action, **params) for action, params in tag_ops)
+        operations.append((entry, fields, ops))
+
+    if not operations:
+        return 0, 0, 0
+
+    print(f"📤 {len(operations)} 件のカードをAnkiへ送信します...")
+    batch.flush()
+
+    added_count = 0
+    updated_count = 0
+    for entry, fields, ops in operations:
+        file_path = entry["path"]
+        failed = [op for op in ops if not op.ok]
+        if failed:
+            print(f"❌ エラー ({file_path}): {failed[0].error}")
+            continue
+
+        if ops[0].action == "addNote":
+            if not ops[0].result:
+                continue
+            print(f"✅ 登録成功！ {file_path} -> Note ID: {ops[0].result}")
+            write_file_id(entry, ops[0].result, obsidian)
+            note_id = ops[0].result
+            note_index.add(note_id, fields[config.FIELD_FRONT])
+            added_count += 1
+        else:
+            note_id = entry["data"]["id"]
+            updated_count += 1
+
+        if state is not None:
+            state.record_push(file_path, note_id, fields, entry["data"]["tags"])
+            state.record_file(file_path, entry["stat"], entry["content"])
+
+    return len(operations), added_count, updated_count
+
+def sync_file(file_path, client, obsidian, state=None, note_index=None):
+    sync_files([file_path], client, obsidian, state, note_index)
 
 def main():
     # 0. 設定
     parser = argparse.ArgumentParser(description="Sync Markdown files to Anki")
-    parser.add_argument("--dir", "-d", type=str, help="Subdirectory to sync (relative to SYNC_BASE_DIR)")
+    parser.add_argument("--dir", "-d", type=str, help="Subdirectory to sync recursively (relative to SYNC_BASE_DIR)")
+    parser.add_argument("--all", "-a", action="store_true", help="Sync every card under SYNC_BASE_DIR recursively")
+    parser.add_argument("--include", action="append", metavar="GLOB", help="Only sync files matching this glob (relative path, repeatable)")
+    parser.add_argument("--exclude", action="append", metavar="GLOB", help="Skip files and directories matching this glob (relative path, repeatable)")
     parser.add_argument("--file", "-f", type=str, help="Specific file to sync")
+    parser.add_argument("--force", action="store_true", help="Ignore the sync state and push every file")
+    parser.add_argument("--watch", "-w", action="store_true", help="Watch SYNC_BASE_DIR (or --dir) and sync files as they change")
+    parser.add_argument("--poll", action="store_true", help="Use polling instead of native file system events in --watch mode")
+    add_profile_argument(parser)
+    add_import_time_argument(parser)
     args = parser.parse_args()
 
-    client = AnkiConnectClient(config.ANKI_CONNECT_URL)
+    if args.import_time:
+        report_import_time(__file__)
+        return
+
+    with profiled(args.profile):
+        sync(args)
+
+def sync(args):
+    """Markdown ファイルを Anki に同期する"""
+    client = get_shared_client()
     obsidian = ObsidianClient(config.OUTPUT_DIR) # update_file_idメカニズムに使用される。
     # 注意: get_existing_filesを使用する場合、ObsidianClientはファイルの検索にconfig.OUTPUT_DIRに依存する可能性があるが、
     # update_file_idは渡された特定のファイルパスを使用するため問題ない。
 
     files_to_sync = []
     base_dir = config.SYNC_BASE_DIR
+    state = SyncState.load(base_dir)
+    if args.force:
+        state.files.clear()
+
+    if args.watch:
+        watch_dir = os.path.join(base_dir, args.dir) if args.dir else base_dir
+        if not os.path.isdir(watch_dir):
+            print(f"エラー: ディレクトリ '{watch_dir}' が見つかりません。")
+            return
+
+        from src.core.watcher import watch # watchdog は --watch の時だけ読み込む
+
+        def on_change(paths):
+            # 保存が続いた場合もまとめて1回の multi で送信する
+            paths = [p for p in paths if path_matches(os.path.relpath(p, watch_dir), args.include, args.exclude)]
+            sync_files(paths, client, obsidian, state, card_type=config.SYNC_CARD_TYPE)
+            state.save()
+
+        watch(watch_dir, on_change, use_polling=args.poll)
+        return
 
-    if args.dir:
-        target_dir = os.path.join(base_dir, args.dir)
-        if not os.path.exists(target_dir):
+    if args.dir or args.all:
+        target_dir = os.path.join(base_dir, args.dir) if args.dir else base_dir
+        if not os.path.isdir(target_dir):
             print(f"エラー: ディレクトリ '{target_dir}' が見つかりません。")
             return
-        
-        # ディレクトリ内のすべての.mdファイルを同期する
-        files_to_sync = glob.glob(os.path.join(target_dir, "*.md"))
-        if not files_to_sync:
+
+        # ディレクトリ以下の .md ファイルを再帰的に走査し、カード (type: SYNC_CARD_TYPE) だけを同期する
+        print(f"📁 ディレクトリ同期: '{target_dir}' 以下のファイルを処理します。")
+        files = scan_markdown(target_dir, args.include, args.exclude)
+        if not sync_files(files, client, obsidian, state, card_type=config.SYNC_CARD_TYPE):
             print(f"⚠️ '{target_dir}' にMarkdownファイルが見つかりませんでした。")
-            return
-        print(f"📁 ディレクトリ同期: '{target_dir}' から {len(files_to_sync)} 個のファイルを処理します。")
+        state.save()
+        return
 
-    elif args.file:
+    if args.file:
         files_to_sync = [args.file]
     
     else:
@@ -112,11 +332,9 @@ def main():
             return
 
     # Process files
-    for file_path in files_to_sync:
-        try:
-            sync_file(file_path, client, obsidian)
-        except Exception as e:
-            print(f"❌ エラー ({file_path}): {e}")
+    # 前回の同期状態 (SYNC_BASE_DIR に保存) を使い、変更のあったファイルだけを送信する
+    sync_files(files_to_sync, client, obsidian, state)
+    state.save()
 
 if __name__ == "__main__":
     main()
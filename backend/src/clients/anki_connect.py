@@ -1,26 +1,250 @@
 import json
-import urllib.request
 import sys
 import os
+import threading
+from collections import Counter
+
+from src.clients.connection_pool import HTTPConnectionPool
+from src.core import metrics
 
 # 必要に応じてインポートを解決するためにプロジェクトルートを sys.path に追加する、
 # ただし、通常はモジュールとして実行するか PYTHONPATH を設定する方が良い。
 # 現時点では、インポートが機能するコンテキストから実行されるか、相対インポートを使用すると仮定する。
 
+# multi 1リクエストあたりに詰めるアクション数の上限
+DEFAULT_MAX_BATCH_SIZE = 100
+# notesInfo 1アクションあたりのノート数 (レスポンスサイズを抑えるため)
+NOTES_INFO_CHUNK_SIZE = 500
+# iter_notes_info で1回に取得するノート数
+NOTES_INFO_BATCH_SIZE = 2000
+# Anki を変更しないアクション (接続が切れた場合に送り直しても安全)
+READ_ONLY_ACTIONS = frozenset({
+    "version", "deckNames", "deckNamesAndIds", "modelNames", "modelFieldNames",
+    "findNotes", "findCards", "notesInfo", "notesModTime", "cardsInfo", "getTags", "canAddNotes",
+})
+
+
+class AnkiConnectError(Exception):
+    """AnkiConnect がエラーを返した場合の例外"""
+
+
+class BatchResult:
+    """
+    バッチに積んだ1アクション分の結果
+    flush() 後に result / error が設定される
+    """
+    def __init__(self, action, params):
+        self.action = action
+        self.params = params
+        self.result = None
+        self.error = None
+        self.done = False
+
+    @property
+    def ok(self):
+        return self.done and self.error is None
+
+    def __repr__(self):
+        return f"BatchResult(action={self.action!r}, ok={self.ok}, error={self.error!r})"
+
+
+class AnkiConnectBatch:
+    """
+    アクションをキューに積み、flush() で AnkiConnect の multi アクションとしてまとめて送信する
+    max_batch_size を超える分は複数の multi リクエストに分割される
+    """
+    def __init__(self, client, max_batch_size=None):
+        self.client = client
+        self.max_batch_size = max_batch_size or client.max_batch_size
+        self._pending = []
+
+    def add(self, action, **params):
+        """アクションを積む。戻り値の BatchResult は flush() 後に結果が入る"""
+        item = BatchResult(action, params)
+        self._pending.append(item)
+        return item
+
+    def flush(self):
+        """積んだアクションを送信し、積んだ順に BatchResult のリストを返す"""
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.max_batch_size):
+            self.client._run_multi(pending[start:start + self.max_batch_size])
+        return pending
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
 class AnkiConnectClient:
-    def __init__(self, url="http://localhost:8765"):
+    def __init__(self, url="http://localhost:8765", max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 pool_size=4, connect_timeout=3.0, read_timeout=60.0, retries=3):
         self.url = url
+        self.max_batch_size = max_batch_size
+        # Keep-Alive 接続を使い回す (リクエストごとの TCP 接続を避ける)
+        self.pool = HTTPConnectionPool(
+            url,
+            pool_size=pool_size,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries=retries,
+        )
+
+    def _post(self, payload):
+        requestJson = json.dumps(payload).encode('utf-8')
+        return json.loads(self.pool.post(requestJson, idempotent=is_read_only(payload)))
+
+    def close(self):
+        self.pool.close()
 
     def invoke(self, action, **params):
-        requestJson = json.dumps({'action': action, 'params': params, 'version': 6}).encode('utf-8')
+        metrics.inc("anki_connect_actions_total", action=action)
         try:
-            req = urllib.request.Request(self.url, requestJson)
-            with urllib.request.urlopen(req) as response:
-                resp = json.load(response)
-                
+            with metrics.timed("anki_connect_request_duration_seconds", "anki", action=action):
+                resp = self._post({'action': action, 'params': params, 'version': 6})
+
             if resp.get('error') is not None:
-                raise Exception(resp['error'])
+                raise AnkiConnectError(resp['error'])
             return resp['result']
         except Exception as e:
+            metrics.inc("anki_connect_errors_total", action=action)
             print(f"❌ AnkiConnect Error: {e}")
             return None
+
+    def batch(self, max_batch_size=None):
+        """multi アクションでまとめて送信するためのバッチを作成する"""
+        return AnkiConnectBatch(self, max_batch_size)
+
+    def invoke_multi(self, actions):
+        """
+        (action, params) のリストをまとめて実行する
+        戻り値: 各アクションの BatchResult のリスト (入力と同じ順序)
+        """
+        batch = self.batch()
+        for action, params in actions:
+            batch.add(action, **params)
+        return batch.flush()
+
+    def notes_info(self, note_ids, chunk_size=NOTES_INFO_CHUNK_SIZE):
+        """notesInfo をチャンクに分割し、multi でまとめて取得する (削除済みなどで見つからないノートは除く)"""
+        batch = self.batch()
+        chunks = [batch.add('notesInfo', notes=ids) for ids in chunk_ids(note_ids, chunk_size)]
+        batch.flush()
+
+        notes = []
+        for chunk in chunks:
+            if chunk.ok and chunk.result:
+                notes.extend(note for note in chunk.result if note)
+        return notes
+
+    def iter_notes_info(self, note_ids, batch_size=NOTES_INFO_BATCH_SIZE):
+        """
+        notes_info を batch_size 件ずつ取得して返すジェネレーター
+        呼び出し側が1つ前の分を処理している間に、次の分を別スレッドで取得しておく
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        batches = chunk_ids(note_ids, batch_size)
+        if not batches:
+            return
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="forAnki-prefetch") as executor:
+            pending = executor.submit(self.notes_info, batches[0])
+            for next_ids in batches[1:]:
+                notes = pending.result()
+                pending = executor.submit(self.notes_info, next_ids)
+                yield notes
+            yield pending.result()
+
+    def _run_multi(self, items):
+        """BatchResult のリストを1回の multi リクエストで実行し、結果を各要素に書き込む"""
+        label = record_multi_actions(items)
+        try:
+            with metrics.timed("anki_connect_request_duration_seconds", "anki", action=label):
+                resp = self._post(build_multi_payload(items))
+            if resp.get('error') is not None:
+                raise AnkiConnectError(resp['error'])
+            results = resp['result']
+        except Exception as e:
+            metrics.inc("anki_connect_errors_total", action=label)
+            print(f"❌ AnkiConnect Error (multi): {e}")
+            set_multi_error(items, e)
+            return
+
+        set_multi_results(items, results)
+
+
+def is_read_only(payload):
+    """リクエスト (multi の場合は含まれるすべてのアクション) が Anki を変更しなければ True"""
+    if payload['action'] == 'multi':
+        return all(is_read_only(action) for action in payload['params']['actions'])
+    return payload['action'] in READ_ONLY_ACTIONS
+
+def build_multi_payload(items):
+    """BatchResult のリストから multi アクションのリクエストを組み立てる"""
+    actions = [{'action': item.action, 'params': item.params, 'version': 6} for item in items]
+    return {'action': 'multi', 'params': {'actions': actions}, 'version': 6}
+
+def record_multi_actions(items):
+    """multi に含まれるアクションを数え、計測用のラベル (multi:notesInfo など) を返す"""
+    counts = Counter(item.action for item in items)
+    for action, count in counts.items():
+        metrics.inc("anki_connect_actions_total", count, action=action)
+    return f"multi:{next(iter(counts))}" if len(counts) == 1 else "multi"
+
+def set_multi_results(items, results):
+    """multi のレスポンスを各 BatchResult に書き込む"""
+    for item, res in zip(items, results):
+        # version 6 を指定したアクションは {"result": ..., "error": ...} 形式で返る
+        if isinstance(res, dict) and set(res.keys()) == {'result', 'error'}:
+            item.result = res['result']
+            item.error = res['error']
+        else:
+            item.result = res
+        item.done = True
+
+def set_multi_error(items, error):
+    """multi リクエスト自体が失敗した場合、全アクションをエラーにする"""
+    for item in items:
+        item.error = str(error)
+        item.done = True
+
+def chunk_ids(note_ids, chunk_size=NOTES_INFO_CHUNK_SIZE):
+    note_ids = list(note_ids)
+    return [note_ids[i:i + chunk_size] for i in range(0, len(note_ids), chunk_size)]
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_shared_client():
+    """
+    config の設定で作成した AnkiConnectClient をプロセス内で共有して返す
+    (サーバーとスクリプトで接続プールを使い回すため)
+    """
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                from instance import config
+                _shared_client = AnkiConnectClient(
+                    config.ANKI_CONNECT_URL or "http://localhost:8765",
+                    max_batch_size=config.ANKI_CONNECT_BATCH_SIZE,
+                    pool_size=config.ANKI_CONNECT_POOL_SIZE,
+                    connect_timeout=config.ANKI_CONNECT_CONNECT_TIMEOUT,
+                    read_timeout=config.ANKI_CONNECT_READ_TIMEOUT,
+                    retries=config.ANKI_CONNECT_RETRIES,
+                )
+    return _shared_client
+
+def close_shared_client():
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
@@ -0,0 +1,133 @@
+import json
+
+import httpx
+
+from src.core import metrics
+from src.clients.anki_connect import (
+    DEFAULT_MAX_BATCH_SIZE,
+    NOTES_INFO_CHUNK_SIZE,
+    AnkiConnectBatch,
+    AnkiConnectError,
+    build_multi_payload,
+    chunk_ids,
+    record_multi_actions,
+    set_multi_error,
+    set_multi_results,
+)
+
+
+class AsyncAnkiConnectBatch(AnkiConnectBatch):
+    """
+    AnkiConnectBatch の非同期版
+    max_batch_size ごとに分割した multi リクエストは、同期版と同じく積んだ順に1つずつ送信する
+    (追加してからタグを付ける、など前のアクションの結果に依存する操作があるため)
+    """
+    async def flush(self):
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.max_batch_size):
+            await self.client._run_multi(pending[start:start + self.max_batch_size])
+        return pending
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' for AsyncAnkiConnectBatch")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.flush()
+
+
+class AsyncAnkiConnectClient:
+    """
+    AnkiConnectClient の非同期版 (invoke / batch / notes_info の使い方は同じで、await して呼び出す)
+    イベントループをブロックしないため、FastAPI の async エンドポイントから利用する
+    """
+    def __init__(self, url="http://localhost:8765", max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 pool_size=4, connect_timeout=3.0, read_timeout=60.0, retries=3):
+        self.url = url
+        self.max_batch_size = max_batch_size
+        # 接続数の上限を超えたリクエストはスレッドを使わずに空き接続を待つ (pool=None でタイムアウトなし)
+        transport = httpx.AsyncHTTPTransport(
+            retries=retries,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self._http = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=None),
+        )
+
+    async def _post(self, payload):
+        requestJson = json.dumps(payload).encode('utf-8')
+        response = await self._http.post(self.url, content=requestJson)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def invoke(self, action, **params):
+        metrics.inc("anki_connect_actions_total", action=action)
+        try:
+            with metrics.timed("anki_connect_request_duration_seconds", "anki", action=action):
+                resp = await self._post({'action': action, 'params': params, 'version': 6})
+
+            if resp.get('error') is not None:
+                raise AnkiConnectError(resp['error'])
+            return resp['result']
+        except Exception as e:
+            metrics.inc("anki_connect_errors_total", action=action)
+            print(f"❌ AnkiConnect Error: {e}")
+            return None
+
+    def batch(self, max_batch_size=None):
+        """multi アクションでまとめて送信するためのバッチを作成する (flush は await する)"""
+        return AsyncAnkiConnectBatch(self, max_batch_size)
+
+    async def invoke_multi(self, actions):
+        batch = self.batch()
+        for action, params in actions:
+            batch.add(action, **params)
+        return await batch.flush()
+
+    async def notes_info(self, note_ids, chunk_size=NOTES_INFO_CHUNK_SIZE):
+        """notesInfo をチャンクに分割し、multi でまとめて取得する (削除済みなどで見つからないノートは除く)"""
+        batch = self.batch()
+        chunks = [batch.add('notesInfo', notes=ids) for ids in chunk_ids(note_ids, chunk_size)]
+        await batch.flush()
+
+        notes = []
+        for chunk in chunks:
+            if chunk.ok and chunk.result:
+                notes.extend(note for note in chunk.result if note)
+        return notes
+
+    async def _run_multi(self, items):
+        label = record_multi_actions(items)
+        try:
+            with metrics.timed("anki_connect_request_duration_seconds", "anki", action=label):
+                resp = await self._post(build_multi_payload(items))
+            if resp.get('error') is not None:
+                raise AnkiConnectError(resp['error'])
+            results = resp['result']
+        except Exception as e:
+            metrics.inc("anki_connect_errors_total", action=label)
+            print(f"❌ AnkiConnect Error (multi): {e}")
+            set_multi_error(items, e)
+            return
+
+        set_multi_results(items, results)
+
+
+def create_async_client():
+    """config の設定で AsyncAnkiConnectClient を作成する"""
+    from instance import config
+    return AsyncAnkiConnectClient(
+        config.ANKI_CONNECT_URL or "http://localhost:8765",
+        max_batch_size=config.ANKI_CONNECT_BATCH_SIZE,
+        pool_size=config.ANKI_CONNECT_POOL_SIZE,
+        connect_timeout=config.ANKI_CONNECT_CONNECT_TIMEOUT,
+        read_timeout=config.ANKI_CONNECT_READ_TIMEOUT,
+        retries=config.ANKI_CONNECT_RETRIES,
+    )
@@ -0,0 +1,144 @@
+import http.client
+import queue
+import select
+import threading
+import time
+import urllib.parse
+
+# 再利用中の接続がサーバー側で閉じられていた場合に発生する例外
+# (送信前・読み取りのみのリクエストの場合は新しい接続でやり直す)
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+
+def _is_dropped(conn):
+    """
+    待機中の接続がサーバー側で閉じられていれば True
+    (待機中に読み込めるデータがあるのは、切断 (EOF) か予期しないデータのどちらか)
+    """
+    if conn.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+class HTTPConnectionPool:
+    """
+    Keep-Alive の HTTP 接続を使い回すスレッドセーフな接続プール
+    同時接続数は pool_size までに制限され、接続拒否 (Anki 未起動・起動中など) の場合は
+    指数バックオフでリトライする
+    """
+    def __init__(self, url, pool_size=4, connect_timeout=3.0, read_timeout=60.0,
+                 retries=3, backoff=0.2):
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port
+        self.path = parsed.path or "/"
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._closed = False
+
+    def _new_connection(self):
+        conn_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        conn = conn_class(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        # 接続確立後は読み込み用のタイムアウトに切り替える
+        conn.sock.settimeout(self.read_timeout)
+        return conn
+
+    def _get_idle(self):
+        """待機中の接続を返す (サーバー側で閉じられた接続は捨てる)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if not _is_dropped(conn):
+                return conn
+            conn.close()
+
+    def post(self, body, content_type="application/json", idempotent=False):
+        """
+        body を POST してレスポンスボディ (bytes) を返す
+        再利用した接続が切れていた場合、送信中の失敗なら新しい接続でやり直す
+        送信後 (レスポンス待ち) に切れた場合はサーバーが実行済みの可能性があるため、
+        idempotent=True (読み取りのみのリクエスト) の場合だけやり直す
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive",
+        }
+
+        with self._slots:
+            attempt = 0
+            while True:
+                conn = self._get_idle()
+                reused = conn is not None
+                sent = False
+                try:
+                    if conn is None:
+                        conn = self._new_connection()
+                    conn.request("POST", self.path, body=body, headers=headers)
+                    sent = True
+                    response = conn.getresponse()
+                    data = response.read()
+                except STALE_CONNECTION_ERRORS:
+                    if conn is not None:
+                        conn.close()
+                    if reused and (not sent or idempotent):
+                        # 古い接続だっただけなので、バックオフせずに新しい接続でやり直す
+                        continue
+                    raise
+                except ConnectionRefusedError:
+                    if conn is not None:
+                        conn.close()
+                    if attempt >= self.retries:
+                        raise
+                    time.sleep(self.backoff * (2 ** attempt))
+                    attempt += 1
+                    continue
+                except Exception:
+                    if conn is not None:
+                        conn.close()
+                    raise
+
+                if response.will_close or self._closed:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+
+                if response.status >= 400:
+                    raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+                return data
+
+    def close(self):
+        """待機中の接続をすべて閉じる"""
+        self._closed = True
+        while True:
+            conn = self._get_idle()
+            if conn is None:
+                break
+            conn.close()
@@ -1,19 +1,243 @@
-import google.generativeai as genai
+import asyncio
+import json
+import threading
+import time
+
 from instance import config
+from src.core import metrics
+from src.core.prompts import build_repair_prompt, parse_json_response
+from src.core.rate_limit import AsyncTokenBucket
+from src.core.response_cache import ResponseCache
+
+# リトライ対象とするエラーの HTTP ステータス (クォータ超過・一時的な過負荷)
+RETRYABLE_STATUS_CODES = (429, 503)
+
+
+def is_retryable_error(error):
+    """クォータ超過などリトライすれば成功しうるエラーかどうか"""
+    cause = error.__cause__ or error
+    code = getattr(cause, "code", None)
+    if code in RETRYABLE_STATUS_CODES:
+        return True
+    # google.api_core.exceptions.ResourceExhausted / ServiceUnavailable
+    return type(cause).__name__ in ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable")
+
+
+def _genai():
+    """google.generativeai は読み込みに時間がかかるため、初めて使う時に import する"""
+    import google.generativeai as genai
+    return genai
+
+
+def chunk_text(chunk):
+    """
+    ストリーミングのチャンクのテキスト (テキストがなければ空文字)
+    セーフティでブロックされたチャンクや終了理由だけのチャンクでは chunk.text が ValueError になるため、parts を直接読む
+    """
+    candidates = getattr(chunk, "candidates", None)
+    if not candidates:
+        return ""
+    parts = getattr(getattr(candidates[0], "content", None), "parts", None) or []
+    return "".join(getattr(part, "text", "") or "" for part in parts)
+
+
+def generation_config(response_schema=None):
+    """response_schema を指定した場合は JSON モード (スキーマに沿った出力) にする"""
+    if response_schema is None:
+        return None
+    return _genai().GenerationConfig(response_mime_type="application/json", response_schema=response_schema)
+
 
 class GeminiClient:
     def __init__(self, api_key: str = None):
         self.api_key = api_key or config.GEMINI_API_KEY
         if self.api_key:
+            genai = _genai()
             genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel(config.GEMINI_MODEL_NAME)
+        # 非同期呼び出しで共有するレートリミッター (1分あたりのリクエスト数)
+        self.rate_limiter = AsyncTokenBucket.per_minute(
+            config.GEMINI_REQUESTS_PER_MINUTE,
+            capacity=config.GEMINI_MAX_CONCURRENCY,
+        )
+        # 同じモデル・同じプロンプトのレスポンスを再利用するキャッシュ
+        self.cache = None
+        if config.GEMINI_CACHE_ENABLED:
+            self.cache = ResponseCache(
+                config.GEMINI_CACHE_PATH,
+                ttl=config.GEMINI_CACHE_TTL,
+                max_entries=config.GEMINI_CACHE_MAX_ENTRIES,
+            )
+
+    def _cache_key(self, prompt, use_cache, response_schema=None):
+        if self.cache is None or not use_cache:
+            return None
+        if response_schema is not None:
+            prompt = f"{prompt}\0{json.dumps(response_schema, sort_keys=True)}"
+        return ResponseCache.make_key(config.GEMINI_MODEL_NAME, prompt)
+
+    def _cached(self, key):
+        value = self.cache.get(key)
+        metrics.inc("gemini_cache_requests_total", result="miss" if value is None else "hit")
+        return value
+
+    async def _cached_async(self, key):
+        value = await self.cache.get_async(key)
+        metrics.inc("gemini_cache_requests_total", result="miss" if value is None else "hit")
+        return value
+
+    def generate_content(self, prompt: str, use_cache: bool = True, response_schema=None) -> str:
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY is not set. Please check your .env file.")
+
+        key = self._cache_key(prompt, use_cache, response_schema)
+        if key and (cached := self._cached(key)) is not None:
+            return cached
+
+        try:
+            with metrics.timed("gemini_request_duration_seconds", "gemini", method="generate_content"):
+                response = self.model.generate_content(prompt, generation_config=generation_config(response_schema))
+            text = response.text
+        except Exception as e:
+            raise RuntimeError(f"Gemini API Error: {str(e)}") from e
+
+        if key:
+            self.cache.set(key, text)
+        return text
+
+    async def generate_content_async(self, prompt: str, use_cache: bool = True, response_schema=None) -> str:
+        """generate_content の非同期版 (イベントループをブロックしない)"""
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY is not set. Please check your .env file.")
+
+        # キャッシュにあればAPIを呼ばない (レート制限のトークンも消費しない)
+        key = self._cache_key(prompt, use_cache, response_schema)
+        if key and (cached := await self._cached_async(key)) is not None:
+            return cached
+
+        await self.rate_limiter.acquire()
+        try:
+            with metrics.timed("gemini_request_duration_seconds", "gemini", method="generate_content_async"):
+                response = await self.model.generate_content_async(
+                    prompt, generation_config=generation_config(response_schema)
+                )
+            text = response.text
+        except Exception as e:
+            raise RuntimeError(f"Gemini API Error: {str(e)}") from e
 
-    def generate_content(self, prompt: str) -> str:
+        if key:
+            await self.cache.set_async(key, text)
+        return text
+
+    async def stream_content_async(self, prompt: str, use_cache: bool = True, response_schema=None):
+        """生成されたテキストを届いた順に少しずつ返す (キャッシュにあれば全体を一度に返す)"""
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY is not set. Please check your .env file.")
 
+        key = self._cache_key(prompt, use_cache, response_schema)
+        if key and (cached := await self._cached_async(key)) is not None:
+            yield cached
+            return
+
+        await self.rate_limiter.acquire()
+        parts = []
+        # ストリーミングは最初のチャンクが届くまでの時間を記録する
+        start = time.perf_counter()
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            response = await self.model.generate_content_async(
+                prompt, generation_config=generation_config(response_schema), stream=True
+            )
+            async for chunk in response:
+                text = chunk_text(chunk)
+                if not text:
+                    continue
+                if not parts:
+                    metrics.observe("gemini_request_duration_seconds", time.perf_counter() - start,
+                                    "gemini", method="stream_first_chunk")
+                parts.append(text)
+                yield text
         except Exception as e:
-            raise RuntimeError(f"Gemini API Error: {str(e)}")
+            raise RuntimeError(f"Gemini API Error: {str(e)}") from e
+
+        if key:
+            await self.cache.set_async(key, "".join(parts))
+
+    async def parse_json_or_repair(self, prompt, content, response_schema, use_cache: bool = True):
+        """
+        prompt に対する出力 content を JSON として解析する
+        解析できなければ、生成し直す代わりに一度だけ修復を依頼する
+        (修復結果はキャッシュに入れ直す)。それでも駄目なら ValueError
+        """
+        keys = response_schema["required"]
+        try:
+            return parse_json_response(content, keys)
+        except ValueError as e:
+            error = e
+
+        key = self._cache_key(prompt, use_cache, response_schema)
+        if key:
+            await self.cache.delete_async(key)
+        repaired = await self.generate_content_async(
+            build_repair_prompt(content, error, keys), use_cache=False, response_schema=response_schema
+        )
+        data = parse_json_response(repaired, keys)
+        if key:
+            await self.cache.set_async(key, json.dumps(data, ensure_ascii=False))
+        return data
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache else None
+
+    async def generate_with_retry(self, prompt: str, max_retries=None, backoff=None, use_cache: bool = True,
+                                  response_schema=None) -> str:
+        """クォータ超過などの一時的なエラーの場合、指数バックオフでリトライする"""
+        max_retries = config.GEMINI_MAX_RETRIES if max_retries is None else max_retries
+        backoff = config.GEMINI_RETRY_BACKOFF if backoff is None else backoff
+        attempt = 0
+        while True:
+            try:
+                return await self.generate_content_async(prompt, use_cache, response_schema)
+            except RuntimeError as e:
+                if attempt >= max_retries or not is_retryable_error(e):
+                    raise
+                await asyncio.sleep(backoff * (2 ** attempt))
+                attempt += 1
+
+    async def generate_batch(self, prompts, max_concurrency=None, use_cache: bool = True, response_schema=None):
+        """
+        複数のプロンプトを並行して生成する
+        同時実行数は max_concurrency まで、リクエスト頻度はレートリミッターで制限する
+        戻り値: プロンプトと同じ順序のリスト (成功時は文字列、失敗時は例外オブジェクト)
+        response_schema を指定した場合は JSON として解析した dict を返す (解析できなければ修復を1回試す)
+        """
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY is not set. Please check your .env file.")
+
+        semaphore = asyncio.Semaphore(max_concurrency or config.GEMINI_MAX_CONCURRENCY)
+
+        async def run(prompt):
+            async with semaphore:
+                try:
+                    content = await self.generate_with_retry(
+                        prompt, use_cache=use_cache, response_schema=response_schema
+                    )
+                    if response_schema is None:
+                        return content
+                    return await self.parse_json_or_repair(prompt, content, response_schema, use_cache)
+                except Exception as e:
+                    return e
+
+        return await asyncio.gather(*(run(prompt) for prompt in prompts))
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_gemini_client():
+    """GeminiClient をプロセス内で共有して返す (genai.configure / モデルの作成は初回のみ)"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = GeminiClient()
+    return _shared_client
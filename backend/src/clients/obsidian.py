@@ -1,14 +1,18 @@
 import os
 import re
 
+from src.core.file_writer import write_text_atomic
+from src.core.scanner import scan_markdown
+
 class ObsidianClient:
     def __init__(self, output_dir):
         self.output_dir = output_dir
 
-    def get_existing_files(self):
+    def get_existing_files(self, recursive=False):
         """
         出力ディレクトリ内のファイルをスキャンし、Note ID とファイルパスの対応マップを作成する
-        戻り値: { note_id (int): filename (str) }
+        recursive=True ならサブディレクトリも含める (デッキごとのフォルダに出力した場合)
+        戻り値: { note_id (int): filename (str、出力ディレクトリからの相対パス) }
         """
         existing_files = {}
         if not os.path.exists(self.output_dir):
@@ -16,6 +20,13 @@ class ObsidianClient:
 
         pattern = re.compile(r'_(\d+)\.md$')
 
+        if recursive:
+            for path, _ in scan_markdown(self.output_dir):
+                match = pattern.search(path)
+                if match:
+                    existing_files[int(match.group(1))] = os.path.relpath(path, self.output_dir).replace(os.sep, "/")
+            return existing_files
+
         for filename in os.listdir(self.output_dir):
             if not filename.endswith(".md"):
                 continue
@@ -28,7 +39,7 @@ class ObsidianClient:
         return existing_files
 
     def update_file_id(self, filepath, new_id):
-        """Obsidianファイルの id: 部分を書き換える"""
+        """Obsidianファイルの id: 部分を書き換え、書き換え後の内容を返す"""
         with open(filepath, "r", encoding="utf-8") as f:
             content = f.read()
         
@@ -41,6 +52,6 @@ class ObsidianClient:
             flags=re.MULTILINE
         )
         
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(new_content)
+        write_text_atomic(filepath, new_content)
         print(f"💾 ファイルを更新しました: ID {new_id} を書き込みました")
+        return new_content
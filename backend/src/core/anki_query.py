@@ -0,0 +1,41 @@
+import math
+import time
+
+# Anki の検索構文で特別な意味を持つ文字 (ワイルドカード・エスケープ・引用符)
+_SPECIAL_CHARS = ('\\', '"', '*', '_')
+
+
+def escape_search_value(text, escape_colon=False):
+    """Anki の検索語として使えるように特殊文字をエスケープする"""
+    for ch in _SPECIAL_CHARS + ((':',) if escape_colon else ()):
+        text = text.replace(ch, '\\' + ch)
+    return text
+
+def deck_query(deck, include_subdecks=True):
+    """デッキのノートを検索するクエリ (include_subdecks=False ならサブデッキのノートを除く)"""
+    query = f'"deck:{escape_search_value(deck)}"'
+    if not include_subdecks:
+        query += f' -"deck:{escape_search_value(deck)}::*"'
+    return query
+
+def edited_days_since(timestamp, now=None):
+    """timestamp (epoch秒) 以降の編集を含む edited:N の N を返す (日付の区切りを考慮して1日余裕を持たせる)"""
+    now = now or time.time()
+    return max(1, math.ceil((now - timestamp) / 86400) + 1)
+
+def build_query(deck=None, tags=(), text=None, edited_days=None):
+    """
+    findNotes 用の検索クエリを組み立てる
+    deck / tags / text はエスケープした上でダブルクォートで囲む
+    """
+    terms = []
+    if deck:
+        terms.append(f'"deck:{escape_search_value(deck)}"')
+    for tag in tags or ():
+        terms.append(f'"tag:{escape_search_value(tag)}"')
+    if text:
+        # フィールド指定 (field:value) と解釈されないよう ":" もエスケープする
+        terms.append(f'"{escape_search_value(text, escape_colon=True)}"')
+    if edited_days:
+        terms.append(f'edited:{int(edited_days)}')
+    return " ".join(terms)
@@ -1,41 +1,87 @@
 import re
 import datetime
 import html
-import markdown
-import markdownify
+import threading
+from functools import lru_cache
+from src.core.metrics import timed_function
 from src.core.processor import sanitize_filename
 
-def html_to_markdown(html_content):
-    """
-    HTMLタグをMarkdownに変換する (markdownifyを使用)
-    Anki特有のクセなどを吸収するための前処理/後処理を含む
-    """
-    if not html_content:
-        return ""
-    
+# 拡張機能:
+# - nl2br: 改行を <br> に変換 (Ankiのデフォルト挙動に合わせる)
+# - fences: コードブロック対応
+# - tables: 表組み対応
+# - sane_lists: リストの挙動を標準的にする
+MARKDOWN_EXTENSIONS = ['nl2br', 'fenced_code', 'tables', 'sane_lists']
+
+# 変換結果をキャッシュする件数 (変換方向ごと)
+CONVERSION_CACHE_SIZE = 8192
+
+# 一括変換: この件数未満はプロセスプールを使わずにその場で変換する
+PARALLEL_THRESHOLD = 1000
+# 一括変換: ワーカーに渡す1チャンクあたりの件数
+BULK_CHUNK_SIZE = 250
+
+_BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+
+# Markdown / MarkdownConverter のインスタンスはスレッドごとに1つ作って使い回す
+# (Markdown は変換中に内部状態を持つため、スレッド間では共有しない)
+# markdown / markdownify (bs4) は読み込みに時間がかかるため、初めて変換する時に import する
+_local = threading.local()
+
+def _get_markdown():
+    md = getattr(_local, "markdown", None)
+    if md is None:
+        import markdown
+        md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        _local.markdown = md
+    return md
+
+def _get_markdownify():
+    converter = getattr(_local, "markdownify", None)
+    if converter is None:
+        import markdownify
+        # heading_style="atx": # ではなく <h1> に変換されるのを防ぐ (## 形式にする)
+        converter = markdownify.MarkdownConverter(heading_style="atx")
+        _local.markdownify = converter
+    return converter
+
+@lru_cache(maxsize=CONVERSION_CACHE_SIZE)
+def _html_to_markdown(html_content):
     # Anki特有の挙動への対応:
     # <div>...</div> は改行として扱いたいが、markdownifyはブロックとして扱うため、
     # 場合によっては意図しない空行が入る可能性がある。
     # ここではライブラリの標準挙動を信頼しつつ、よくあるゴミを除去する。
 
     # markdownify で変換
-    # heading_style="atx": # ではなく <h1> に変換されるのを防ぐ (## 形式にする)
-    text = markdownify.markdownify(html_content, heading_style="atx")
-    
+    text = _get_markdownify().convert(html_content)
+
     # 後処理:
     # 連続する空行を整理 (3つ以上 -> 2つに)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
+    text = _BLANK_LINES_PATTERN.sub('\n\n', text)
+
     # 前後の空白削除
     return text.strip()
 
+@lru_cache(maxsize=CONVERSION_CACHE_SIZE)
+def _markdown_to_html(text):
+    # 前回の変換で残った状態 (脚注・参照など) をリセットしてから変換する
+    return _get_markdown().reset().convert(text)
+
+@timed_function("convert_duration_seconds", "convert", func="html_to_markdown")
+def html_to_markdown(html_content):
+    """
+    HTMLタグをMarkdownに変換する (markdownifyを使用)
+    Anki特有のクセなどを吸収するための前処理/後処理を含む
+    同じ内容の変換結果はキャッシュから返す
+    """
+    if not html_content:
+        return ""
+    return _html_to_markdown(html_content)
+
 def create_markdown_content(note, field_front, field_back):
     """
     AnkiのノートデータからMarkdownテキストを生成して、.mdファイルとして保存できるようにする。
     """
-    note_id = note['noteId']
-    tags = note['tags']
-    
     # フィールド取得 (存在しない場合は空文字)
     front_html = note['fields'].get(field_front, {}).get('value', '')
     back_html = note['fields'].get(field_back, {}).get('value', '')
@@ -44,6 +90,18 @@ def create_markdown_content(note, field_front, field_back):
     front = html_to_markdown(front_html)
     back = html_to_markdown(back_html)
 
+    return render_markdown_content(note, front, back)
+
+def create_markdown_contents(notes, field_front, field_back):
+    """create_markdown_content の一括版。フィールドの変換は bulk_html_to_markdown で並列に行う"""
+    converted = notes_to_markdown(notes, field_front, field_back)
+    return [render_markdown_content(note, front, back) for note, (front, back) in zip(notes, converted)]
+
+def render_markdown_content(note, front, back):
+    """Markdown に変換済みの表面・裏面からファイル内容を組み立てる"""
+    note_id = note['noteId']
+    tags = note['tags']
+
     # タイトル生成（表面の最初の行などを利用）
     title = sanitize_filename(front)
     if not title:
@@ -76,60 +134,210 @@ id: {note_id}
 """
     return title, content
 
+# 見出し行 (## Question / ## Answer)。先頭のリテラルで検索し、行頭かどうかは別に確認する
+_SECTION_PATTERN = re.compile(r'## (Question|Answer)[ \t\r]*$', re.MULTILINE)
+# tags: に続く "  - タグ" の行
+_TAG_LINE_PATTERN = re.compile(r'[ \t]*-[ \t]+')
+_PLACEHOLDER_IDS = ("id番号", "新規カード") # IDなしとみなす値
+
 def parse_anki_markdown(content):
     """
     Markdownからデータを抽出
-    JSON形式でID、タグ、表面、裏面を返してAnkiへの登録/更新に利用する
+    JSON形式でID、type、タグ、表面、裏面を返してAnkiへの登録/更新に利用する
+    Frontmatter・Question・Answer は先頭から1回だけ走査して読み取る
     """
-    data = {"id": None, "tags": [], "front": "", "back": ""}
-    
+    data = {"id": None, "type": None, "tags": [], "front": "", "back": ""}
+
     # YAML Frontmatter
-    yaml_match = re.search(r'^---\s*\n(.*?)\n---', content, re.DOTALL)
-    if yaml_match:
-        yaml_text = yaml_match.group(1)
-        # ID
-        id_match = re.search(r'^id:\s*(.+)$', yaml_text, re.MULTILINE)
-        if id_match:
-            raw_id = id_match.group(1).strip()
-            if raw_id and raw_id not in ["id番号", "新規カード"]: # "id番号", "新規カード" はIDなしとみなす
-                try:
-                    data["id"] = int(raw_id)
-                except ValueError:
-                    print(f"⚠️ Warning: Invalid ID format '{raw_id}'. Treating as new card.")
-                    data["id"] = None
-        # Tags
-        tags_match = re.search(r'^tags:\s*\n((?:\s*-\s+.*\n?)+)', yaml_text, re.MULTILINE)
-        if tags_match:
+    lines, body_start = split_frontmatter(content)
+    seen = set()
+    i = 0
+    while i < len(lines):
+        key, sep, value = lines[i].partition(":")
+        i += 1
+        if not sep or key in seen:
+            continue
+        seen.add(key)
+        value = value.strip()
+        if key == "id":
+            data["id"] = _parse_note_id(value)
+        elif key == "type":
+            data["type"] = value
+        elif key == "tags" and not value:
             # "- " を除去してリスト化し、Obsidian形式 (/) から Anki形式 (::) に戻す
-            data["tags"] = [
-                line.strip().replace("- ", "").replace("/", "::") 
-                for line in tags_match.group(1).strip().split('\n')
-            ]
-
-    # Body
-    body_text = content[yaml_match.end():] if yaml_match else content
-    q_match = re.search(r'## Question\s*\n(.*?)\n## Answer', body_text, re.DOTALL)
-    if q_match: data["front"] = q_match.group(1).strip()
-    a_match = re.search(r'## Answer\s*\n(.*)', body_text, re.DOTALL)
-    if a_match: data["back"] = a_match.group(1).strip()
+            while i < len(lines) and _TAG_LINE_PATTERN.match(lines[i]):
+                data["tags"].append(lines[i].strip().replace("- ", "").replace("/", "::"))
+                i += 1
+
+    # Body (最初の Question から Answer までが表面、Answer 以降が裏面)
+    front_start = None
+    for match in _SECTION_PATTERN.finditer(content, body_start):
+        if match.start() > 0 and content[match.start() - 1] != "\n":
+            continue
+        if match.group(1) == "Question":
+            if front_start is None:
+                front_start = match.end()
+            continue
+        if front_start is not None:
+            data["front"] = content[front_start:match.start()].strip()
+        data["back"] = content[match.end():].strip()
+        break
 
     return data
 
+def split_frontmatter(content):
+    """(Frontmatter の行のリスト, 本文の開始位置) を返す。Frontmatter がなければ ([], 0)"""
+    if not content.startswith("---"):
+        return [], 0
+    first_newline = content.find("\n", 3)
+    if first_newline == -1 or content[3:first_newline].strip():
+        return [], 0
+    end = content.find("\n---", first_newline + 1)
+    if end == -1:
+        return [], 0
+    return content[first_newline + 1:end].split("\n"), end + 4
+
+def read_frontmatter_value(content, key):
+    """Frontmatter の key の値を返す (なければ None)。ファイルの先頭部分だけを渡してもよい"""
+    lines, _ = split_frontmatter(content)
+    for line in lines:
+        name, sep, value = line.partition(":")
+        if sep and name == key:
+            return value.strip()
+    return None
+
+def _parse_note_id(raw_id):
+    if not raw_id or raw_id in _PLACEHOLDER_IDS:
+        return None
+    try:
+        return int(raw_id)
+    except ValueError:
+        print(f"⚠️ Warning: Invalid ID format '{raw_id}'. Treating as new card.")
+        return None
+
+@timed_function("convert_duration_seconds", "convert", func="markdown_to_html")
 def markdown_to_html(text):
     """
     Markdownライブラリを使用した変換
     Anki向けに改行(nl2br)やテーブル(tables)などの拡張を有効化
+    同じ内容の変換結果はキャッシュから返す
     """
     if not text:
         return ""
-    
-    # 拡張機能:
-    # - nl2br: 改行を <br> に変換 (Ankiのデフォルト挙動に合わせる)
-    # - fences: コードブロック対応
-    # - tables: 表組み対応
-    # - sane_lists: リストの挙動を標準的にする
-    extensions = ['nl2br', 'fenced_code', 'tables', 'sane_lists']
-    
-    html_content = markdown.markdown(text, extensions=extensions)
-    
-    return html_content
+    return _markdown_to_html(text)
+
+def conversion_cache_stats():
+    """変換キャッシュのヒット数・ミス数などを返す"""
+    stats = {}
+    for name, func in (("html_to_markdown", _html_to_markdown), ("markdown_to_html", _markdown_to_html)):
+        info = func.cache_info()
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+        }
+    return stats
+
+def clear_conversion_cache():
+    _html_to_markdown.cache_clear()
+    _markdown_to_html.cache_clear()
+
+def _convert_html_chunk(html_list):
+    # ワーカープロセスで実行される (プロセスごとに変換器とキャッシュを持つ)
+    return [html_to_markdown(h) for h in html_list]
+
+def _convert_markdown_chunk(texts):
+    # ワーカープロセスで実行される
+    return [markdown_to_html(t) for t in texts]
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def get_process_pool():
+    """一括変換用のプロセスプールを (初回のみ) 作成して返す"""
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # スレッドを持つプロセス (サーバーなど) から fork しないよう spawn を使う
+                _process_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    return _process_pool
+
+def shutdown_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown()
+            _process_pool = None
+
+def _split_chunks(items, chunk_size):
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+def _bulk_convert(convert_chunk, items):
+    items = list(items)
+    if len(items) < PARALLEL_THRESHOLD:
+        return convert_chunk(items)
+
+    results = get_process_pool().map(convert_chunk, _split_chunks(items, BULK_CHUNK_SIZE))
+    return [converted for chunk in results for converted in chunk]
+
+async def _bulk_convert_async(convert_chunk, items):
+    import asyncio
+    items = list(items)
+    if not items:
+        return []
+    if len(items) < PARALLEL_THRESHOLD:
+        # 件数が少なくても変換は CPU を使うため、イベントループをブロックしないようスレッドで実行する
+        return await asyncio.to_thread(convert_chunk, items)
+
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, convert_chunk, chunk)
+        for chunk in _split_chunks(items, BULK_CHUNK_SIZE)
+    ))
+    return [converted for chunk in results for converted in chunk]
+
+@timed_function("convert_duration_seconds", "convert_bulk", func="bulk_html_to_markdown")
+def bulk_html_to_markdown(html_list):
+    """
+    HTMLのリストをまとめてMarkdownに変換する (順序は入力と同じ)
+    件数が多い場合はチャンクに分けてプロセスプールで並列に変換する
+    """
+    return _bulk_convert(_convert_html_chunk, html_list)
+
+@timed_function("convert_duration_seconds", "convert_bulk", func="bulk_html_to_markdown")
+async def bulk_html_to_markdown_async(html_list):
+    """bulk_html_to_markdown の非同期版 (並列変換の完了をイベントループをブロックせずに待つ)"""
+    return await _bulk_convert_async(_convert_html_chunk, html_list)
+
+@timed_function("convert_duration_seconds", "convert_bulk", func="bulk_markdown_to_html")
+def bulk_markdown_to_html(texts):
+    """Markdownのリストをまとめて HTML に変換する (bulk_html_to_markdown の逆方向)"""
+    return _bulk_convert(_convert_markdown_chunk, texts)
+
+@timed_function("convert_duration_seconds", "convert_bulk", func="bulk_markdown_to_html")
+async def bulk_markdown_to_html_async(texts):
+    """bulk_markdown_to_html の非同期版"""
+    return await _bulk_convert_async(_convert_markdown_chunk, texts)
+
+def _note_fields_html(notes, field_front, field_back):
+    # 表面・裏面を交互に並べた1つのリストにして、まとめて変換できるようにする
+    html_list = []
+    for note in notes:
+        html_list.append(note['fields'].get(field_front, {}).get('value', ''))
+        html_list.append(note['fields'].get(field_back, {}).get('value', ''))
+    return html_list
+
+def notes_to_markdown(notes, field_front, field_back):
+    """notesInfo のリストを (表面, 裏面) のMarkdownのリストに一括変換する"""
+    converted = bulk_html_to_markdown(_note_fields_html(notes, field_front, field_back))
+    return list(zip(converted[0::2], converted[1::2]))
+
+async def notes_to_markdown_async(notes, field_front, field_back):
+    """notes_to_markdown の非同期版"""
+    converted = await bulk_html_to_markdown_async(_note_fields_html(notes, field_front, field_back))
+    return list(zip(converted[0::2], converted[1::2]))
@@ -0,0 +1,112 @@
+import json
+import os
+import re
+
+from src.core.processor import text_hash, write_json_atomic
+
+# 出力ディレクトリに保存するマニフェストのファイル名
+MANIFEST_FILENAME = ".forAnki_export.json"
+MANIFEST_VERSION = 2
+# scopes を記録していない古いマニフェストも読み込む (そのノートはどのエクスポートからも削除しない)
+_COMPATIBLE_VERSIONS = (1, MANIFEST_VERSION)
+
+# エクスポート日 (date: 行) は実行日で変わるため、内容の比較からは除外する
+_DATE_LINE_PATTERN = re.compile(r'^date:.*$', re.MULTILINE)
+
+
+def content_hash(content):
+    """ファイル内容のハッシュ (date: 行を除く)"""
+    return text_hash(_DATE_LINE_PATTERN.sub('', content, count=1))
+
+
+class ExportManifest:
+    """
+    前回のエクスポート結果を記録するマニフェスト
+    note id -> {"mod": Ankiの更新時刻, "filename": ファイル名, "hash": 内容のハッシュ, "scopes": [エクスポート範囲]}
+    エクスポート範囲 (scope) はデッキの指定ごとの識別子で、同じ出力先に別のデッキをエクスポートしても
+    そのデッキのノートとしては扱わない (ファイルを削除するのは、記録したすべての範囲から消えた場合のみ)
+    layout は出力先のファイルの配置 ("flat": 直下 / "tree": デッキの階層をフォルダにする)
+    """
+    def __init__(self, output_dir, entries=None, layout=None):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.entries = entries or {}
+        self.layout = layout
+
+    @classmethod
+    def load(cls, output_dir):
+        """マニフェストを読み込む。存在しない・壊れている場合は空のマニフェストを返す"""
+        path = os.path.join(output_dir, MANIFEST_FILENAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(output_dir)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ マニフェストを読み込めませんでした ({e})。全件をエクスポートします。")
+            return cls(output_dir)
+
+        if data.get("version") not in _COMPATIBLE_VERSIONS:
+            return cls(output_dir)
+        entries = {int(note_id): entry for note_id, entry in data.get("notes", {}).items()}
+        for entry in entries.values():
+            entry.setdefault("scopes", [])
+        layout = data.get("layout")
+        if layout is None and entries:
+            # layout を記録していないマニフェストはファイル名から判断する
+            layout = "tree" if any("/" in entry["filename"] for entry in entries.values()) else "flat"
+        return cls(output_dir, entries, layout)
+
+    def save(self):
+        write_json_atomic(self.path, {
+            "version": MANIFEST_VERSION,
+            "layout": self.layout,
+            "notes": {str(note_id): entry for note_id, entry in sorted(self.entries.items())},
+        })
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, note_id):
+        return note_id in self.entries
+
+    def get(self, note_id):
+        return self.entries.get(note_id)
+
+    def set(self, note_id, mod, filename, hash_, scope):
+        """書き出したノートを記録する (scope は記録済みの範囲に追加する)"""
+        scopes = self.entries.get(note_id, {}).get("scopes", [])
+        self.entries[note_id] = {"mod": mod, "filename": filename, "hash": hash_, "scopes": scopes}
+        self.add_scope(note_id, scope)
+
+    def add_scope(self, note_id, scope):
+        """記録済みのノートが scope にも含まれることを記録する (書き出さなかったノート用)"""
+        entry = self.entries.get(note_id)
+        if entry is not None and scope not in entry["scopes"]:
+            entry["scopes"] = sorted(entry["scopes"] + [scope])
+
+    def remove(self, note_id):
+        return self.entries.pop(note_id, None)
+
+    def note_ids_in_scope(self, scope):
+        return [note_id for note_id, entry in self.entries.items() if scope in entry["scopes"]]
+
+    def release(self, note_id, scope):
+        """
+        ノートが scope から消えたことを記録する
+        他の範囲のエクスポートでも書き出したノートなら記録から scope を外して False、
+        どの範囲にも残っていなければ (ファイルを削除してよいので) True を返す
+        """
+        entry = self.entries[note_id]
+        remaining = [s for s in entry["scopes"] if s != scope]
+        if remaining:
+            entry["scopes"] = remaining
+            return False
+        return True
+
+    def is_up_to_date(self, note_id, mod):
+        """Ankiの更新時刻が前回と同じで、ファイルも残っていれば True"""
+        entry = self.entries.get(note_id)
+        if entry is None or mod is None or entry.get("mod") != mod:
+            return False
+        return os.path.exists(os.path.join(self.output_dir, entry["filename"]))
@@ -0,0 +1,154 @@
+import os
+import stat
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# 完了待ちにできる書き込みの数 (ワーカー数に対する倍率)。内容をメモリに溜め込みすぎないようにする
+PENDING_PER_WORKER = 4
+
+
+def _current_umask():
+    # os.umask は設定と取得を同時にしか行えないため、スレッドを使い始める前 (import 時) に1回だけ読む
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+# 新しく作るファイルのパーミッション (open() で作った場合と同じ 0o666 & ~umask)
+NEW_FILE_MODE = 0o666 & ~_current_umask()
+
+
+def write_bytes_atomic(path, data):
+    """
+    一時ファイルに書いてから os.replace で置き換える (途中で落ちても元のファイルは壊れない)
+    パーミッションは既存のファイルと同じ (新規なら umask に従う) にし、置き換える前に fsync する
+    内容が同じ場合は書き込まずに False を返す
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        mode = NEW_FILE_MODE
+    else:
+        mode = stat.S_IMODE(st.st_mode)
+        if st.st_size == len(data):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return False
+
+    directory = os.path.dirname(path) or "."
+    # mkstemp は 0600 で作るため、置き換える前に元のパーミッションに合わせる
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return True
+
+
+def write_text_atomic(path, text):
+    return write_bytes_atomic(path, text.encode("utf-8"))
+
+
+def replace_file(path, text, old_path):
+    """path に書き込んでから old_path を削除する (リネーム用。書き込みが終わるまで旧ファイルは残る)"""
+    changed = write_text_atomic(path, text)
+    try:
+        # 大文字・小文字を区別しないファイルシステムでは同じファイルを指すことがある
+        if not os.path.samefile(path, old_path):
+            os.remove(old_path)
+    except FileNotFoundError:
+        pass
+    return changed
+
+
+def remove_file(path):
+    """ファイルを削除する。存在しなければ False を返す"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+class FileOperation:
+    """FileWriter に渡した書き込み・削除の結果"""
+    def __init__(self, action, path, key=None):
+        self.action = action
+        self.path = path
+        self.key = key
+        self.changed = False
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return f"FileOperation({self.action}, {self.path!r}, changed={self.changed}, error={self.error!r})"
+
+
+class FileWriter:
+    """
+    ファイルの書き込み・削除をスレッドプールで並行に行う
+    結果は追加した順に on_done(FileOperation) でメインスレッドに通知する (進捗表示・マニフェスト更新用)
+    完了待ちの操作が上限に達すると、先頭の操作が終わるまで追加を待つ
+
+        with FileWriter(on_done=report) as writer:
+            writer.write(path, content, key=note_id)
+    """
+    def __init__(self, max_workers=8, on_done=None):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = self.max_workers * PENDING_PER_WORKER
+        self.on_done = on_done
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="forAnki-writer")
+        self._pending = deque()
+
+    def write(self, path, text, key=None, replaces=None):
+        """path に書き込む (replaces を指定すると、書き込み後にそのファイルを削除する)"""
+        if replaces is not None and replaces != path:
+            return self._submit(FileOperation("write", path, key), replace_file, path, text, replaces)
+        return self._submit(FileOperation("write", path, key), write_text_atomic, path, text)
+
+    def remove(self, path, key=None):
+        return self._submit(FileOperation("remove", path, key), remove_file, path)
+
+    def _submit(self, operation, func, *args):
+        while len(self._pending) >= self.max_pending:
+            self._complete(self._pending.popleft())
+        self._pending.append((operation, self._executor.submit(func, *args)))
+        return operation
+
+    def _complete(self, item):
+        operation, future = item
+        try:
+            operation.changed = future.result()
+        except OSError as e:
+            operation.error = e
+        if self.on_done:
+            self.on_done(operation)
+
+    def flush(self):
+        """追加済みの操作がすべて終わるまで待つ"""
+        while self._pending:
+            self._complete(self._pending.popleft())
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
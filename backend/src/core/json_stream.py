@@ -0,0 +1,70 @@
+import json
+
+
+class IncrementalJSONExtractor:
+    """
+    ストリーミングで届く JSON オブジェクトを少しずつ読み、
+    トップレベルの文字列フィールドが閉じた時点で (key, value) を返す
+    例: '{"chat": "こんに' -> [] / 'ちは", "front": ' -> [("chat", "こんにちは")]
+    先頭の ```json などオブジェクト開始前の文字は読み飛ばす
+    """
+    def __init__(self, keys=None):
+        self.keys = set(keys) if keys else None
+        self.fields = {}
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buf = []
+        self._expect_key = True
+        self._is_key = False
+        self._key = None
+
+    def feed(self, text):
+        """受け取ったテキストを読み進め、新しく完成したフィールドのリストを返す"""
+        completed = []
+        for ch in text:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._buf.append(ch)
+                elif ch == "\\":
+                    self._escape = True
+                    self._buf.append(ch)
+                elif ch == '"':
+                    self._in_string = False
+                    self._close_string(completed)
+                elif self._depth == 1:
+                    self._buf.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._is_key = self._depth == 1 and self._expect_key
+                self._buf = []
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+            elif ch in "}]":
+                self._depth = max(0, self._depth - 1)
+            elif self._depth == 1:
+                if ch == ":":
+                    self._expect_key = False
+                elif ch == ",":
+                    self._expect_key = True
+                    self._key = None
+        return completed
+
+    def _close_string(self, completed):
+        if self._depth != 1:
+            return
+        try:
+            value = json.loads('"' + "".join(self._buf) + '"')
+        except ValueError:
+            value = "".join(self._buf)
+        if self._is_key:
+            self._key = value
+        elif self._key is not None and (self.keys is None or self._key in self.keys):
+            self.fields[self._key] = value
+            completed.append((self._key, value))
+            self._key = None
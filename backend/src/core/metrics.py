@@ -0,0 +1,189 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+# 所要時間のヒストグラムのバケット (秒)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = "forAnki_"
+
+# リクエスト単位の計測結果 (Server-Timing ヘッダー用)。計測中のリクエストがなければ None
+_request_timings = contextvars.ContextVar("forAnki_request_timings", default=None)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """
+    カウンターとヒストグラムを保持し、Prometheus のテキスト形式で出力する (スレッドセーフ)
+    メトリクスは (名前, ラベル) ごとに集計する
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def summary(self):
+        """ヒストグラムごとの {"name", "labels", "count", "total", "mean"} のリスト (合計時間の多い順)"""
+        with self._lock:
+            items = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": h.count,
+                    "total": h.sum,
+                    "mean": h.sum / h.count if h.count else 0.0,
+                }
+                for (name, labels), h in self._histograms.items()
+            ]
+        return sorted(items, key=lambda item: item["total"], reverse=True)
+
+    def render_prometheus(self):
+        """Prometheus のテキスト形式 (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, series in _group(self._counters).items():
+                full_name = METRIC_PREFIX + name
+                lines.extend(self._header(name, full_name, "counter"))
+                for labels, value in series:
+                    lines.append(f"{full_name}{_format_labels(labels)} {value}")
+            for name, series in _group(self._histograms).items():
+                full_name = METRIC_PREFIX + name
+                lines.extend(self._header(name, full_name, "histogram"))
+                for labels, h in series:
+                    for bound, count in zip(h.buckets, h.counts):
+                        lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {count}")
+                    lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {h.count}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {h.sum}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name, full_name, kind):
+        lines = []
+        if name in self._help:
+            lines.append(f"# HELP {full_name} {self._help[name]}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        return lines
+
+
+def _group(metrics):
+    grouped = {}
+    for (name, labels), value in sorted(metrics.items(), key=lambda item: item[0]):
+        grouped.setdefault(name, []).append((labels, value))
+    return grouped
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels) + "}"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("http_request_duration_seconds", "Time spent handling HTTP requests")
+REGISTRY.describe("anki_connect_request_duration_seconds", "Round-trip time of AnkiConnect requests by action")
+REGISTRY.describe("anki_connect_actions_total", "AnkiConnect actions sent (including those inside multi)")
+REGISTRY.describe("anki_connect_errors_total", "AnkiConnect requests that failed")
+REGISTRY.describe("convert_duration_seconds", "Time spent converting between Markdown and HTML")
+REGISTRY.describe("gemini_request_duration_seconds", "Time spent waiting for Gemini responses")
+REGISTRY.describe("gemini_cache_requests_total", "Gemini response cache lookups")
+
+
+def inc(name, value=1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name, seconds, timing=None, **labels):
+    """ヒストグラムに記録し、計測中のリクエストがあれば Server-Timing にも加算する"""
+    REGISTRY.observe(name, seconds, **labels)
+    timings = _request_timings.get()
+    if timings is not None and timing:
+        timings[timing] = timings.get(timing, 0.0) + seconds
+
+
+@contextmanager
+def timed(name, timing=None, **labels):
+    """with ブロックの所要時間を記録する (timing は Server-Timing に出す名前)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, timing, **labels)
+
+
+def timed_function(name, timing=None, **labels):
+    """関数 (async 関数も可) の所要時間を記録するデコレーター"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(name, timing, **labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name, timing, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_request_timings():
+    """リクエスト単位の計測を開始する。戻り値を format_server_timing / reset_request_timings に渡す"""
+    timings = {}
+    return timings, _request_timings.set(timings)
+
+
+def reset_request_timings(token):
+    _request_timings.reset(token)
+
+
+def format_server_timing(timings, total=None):
+    """{"anki": 0.012, ...} -> 'anki;dur=12.0, ...' (ミリ秒)"""
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
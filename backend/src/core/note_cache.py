@@ -0,0 +1,95 @@
+import time
+
+from src.clients.anki_connect import NOTES_INFO_CHUNK_SIZE, chunk_ids
+from src.core.anki_query import edited_days_since
+
+
+class NoteCache:
+    """
+    変換済みカードのキャッシュ
+    note id -> (Anki の mod タイムスタンプ, 変換済みカード) を保持し、
+    mod が変わったノートだけ notesInfo で取り直して再変換する
+    """
+    def __init__(self, convert_many):
+        # convert_many: notesInfo のリストを受け取り、APIレスポンス用の dict のリストを返す async 関数
+        self.convert_many = convert_many
+        self._entries = {}
+        # クエリごとの最終チェック時刻 (edited:N の N を決めるのに使う)
+        self._checked_at = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def invalidate(self, note_id):
+        """カードの作成・更新時に呼び、次回の取得で必ず取り直すようにする"""
+        self._entries.pop(note_id, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._checked_at.clear()
+
+    def _edited_query(self, query, now):
+        checked_at = self._checked_at.get(query)
+        if checked_at is None:
+            return None
+        return f'{query} edited:{edited_days_since(checked_at, now)}'
+
+    async def resolve(self, client, query):
+        """
+        query に一致するノートIDを昇順で返し、更新されたノートをキャッシュから外す
+        1. findNotes で現在のノート一覧と、前回チェック以降に編集されたノートを1回の multi で取得
+        2. 編集されたキャッシュ済みノートのみ notesModTime で mod を確認
+        3. mod が変わったノートは invalidate し、iter_chunks で取り直されるようにする
+        """
+        now = time.time()
+        edited_query = self._edited_query(query, now)
+
+        batch = client.batch()
+        found = batch.add('findNotes', query=query)
+        edited = batch.add('findNotes', query=edited_query) if edited_query else None
+        await batch.flush()
+
+        if not found.ok or not found.result:
+            return []
+        note_ids = sorted(found.result)
+
+        if edited is not None and edited.ok:
+            cached = [nid for nid in (edited.result or []) if nid in self._entries]
+        else:
+            cached = [nid for nid in note_ids if nid in self._entries]
+
+        if cached:
+            mod_times = await client.invoke('notesModTime', notes=cached)
+            if mod_times:
+                mods = {m['noteId']: m['mod'] for m in mod_times}
+                stale = [nid for nid in cached if self._entries[nid][0] != mods.get(nid)]
+            else:
+                # notesModTime 非対応の AnkiConnect では全件取り直す
+                stale = cached
+            for nid in stale:
+                self.invalidate(nid)
+
+        self._checked_at[query] = now
+        return note_ids
+
+    async def iter_chunks(self, client, note_ids, chunk_size=NOTES_INFO_CHUNK_SIZE):
+        """
+        note_ids をチャンクごとに (mod, card) のリストとして返す
+        キャッシュにないノートはチャンク単位で notesInfo を取得して変換する
+        """
+        for ids in chunk_ids(note_ids, chunk_size):
+            missing = [nid for nid in ids if nid not in self._entries]
+            if missing:
+                notes = await client.notes_info(missing)
+                cards = await self.convert_many(notes)
+                for note, card in zip(notes, cards):
+                    self._entries[note['noteId']] = (note.get('mod'), card)
+            yield [self._entries[nid] for nid in ids if nid in self._entries]
+
+    async def get_cards(self, client, query):
+        """query に一致するカードをすべて返す"""
+        note_ids = await self.resolve(client, query)
+        cards = []
+        async for entries in self.iter_chunks(client, note_ids):
+            cards.extend(card for _, card in entries)
+        return cards
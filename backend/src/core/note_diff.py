@@ -0,0 +1,29 @@
+def diff_tags(current, requested):
+    """
+    現在のタグと指定されたタグの差分を (追加するタグ, 削除するタグ) で返す
+    Anki のタグは大文字・小文字を区別しないため、比較も区別しない
+    """
+    current = list(current or ())
+    requested = list(dict.fromkeys(requested or ()))
+    current_keys = {tag.lower() for tag in current}
+    requested_keys = {tag.lower() for tag in requested}
+    to_add = [tag for tag in requested if tag.lower() not in current_keys]
+    to_remove = [tag for tag in current if tag.lower() not in requested_keys]
+    return to_add, to_remove
+
+def changed_note_fields(note, fields):
+    """notesInfo のノートと比べて、値が変わるフィールドだけを返す"""
+    current = note.get("fields", {})
+    return {
+        name: value for name, value in fields.items()
+        if current.get(name, {}).get("value") != value
+    }
+
+def tag_operations(note_id, to_add, to_remove):
+    """タグの差分を反映するための (action, params) のリスト (removeTags / addTags はスペース区切りで渡す)"""
+    operations = []
+    if to_remove:
+        operations.append(("removeTags", {"notes": [note_id], "tags": " ".join(to_remove)}))
+    if to_add:
+        operations.append(("addTags", {"notes": [note_id], "tags": " ".join(to_add)}))
+    return operations
@@ -0,0 +1,111 @@
+import html
+import json
+import os
+import re
+import unicodedata
+
+from src.core.processor import text_hash, write_json_atomic
+
+# 同期ベースディレクトリに保存するインデックスのファイル名
+NOTE_INDEX_FILENAME = ".forAnki_note_index.json"
+NOTE_INDEX_VERSION = 1
+
+_TAG_PATTERN = re.compile(r"<[^>]*>")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_front(value):
+    """
+    重複判定用に表面フィールドのHTMLを正規化する
+    (Anki の重複チェックと同じく HTML タグを除き、実体参照・空白の違いを無視する)
+    """
+    text = html.unescape(_TAG_PATTERN.sub("", value))
+    text = unicodedata.normalize("NFC", text)
+    return _SPACE_PATTERN.sub(" ", text).strip()
+
+
+def front_hash(value):
+    return text_hash(normalize_front(value))
+
+
+class NoteIndex:
+    """
+    既存ノートの表面フィールドのハッシュのインデックス (IDのないファイルの重複チェック用)
+    note id -> {"mod": Ankiの更新時刻, "front": 正規化した表面フィールドのハッシュ}
+    前回の内容をディスクに保存し、更新されたノートだけを notesInfo で取得し直す
+    """
+    def __init__(self, path, model_name, field_name, notes=None):
+        self.path = path
+        self.model_name = model_name
+        self.field_name = field_name
+        self.notes = notes or {}
+        self._by_hash = None
+
+    @classmethod
+    def load(cls, base_dir, model_name, field_name):
+        path = os.path.join(base_dir, NOTE_INDEX_FILENAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(path, model_name, field_name)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ ノートのインデックスを読み込めませんでした ({e})。作り直します。")
+            return cls(path, model_name, field_name)
+
+        # ノートタイプ・フィールドが変わった場合は作り直す
+        if (data.get("version") != NOTE_INDEX_VERSION
+                or data.get("model") != model_name or data.get("field") != field_name):
+            return cls(path, model_name, field_name)
+        notes = {int(note_id): entry for note_id, entry in data.get("notes", {}).items()}
+        return cls(path, model_name, field_name, notes)
+
+    def save(self):
+        write_json_atomic(self.path, {
+            "version": NOTE_INDEX_VERSION,
+            "model": self.model_name,
+            "field": self.field_name,
+            "notes": {str(note_id): entry for note_id, entry in sorted(self.notes.items())},
+        })
+
+    def __len__(self):
+        return len(self.notes)
+
+    def refresh(self, client):
+        """
+        Anki の現在の状態に合わせる
+        findNotes と notesModTime で更新・追加されたノートを調べ、それらだけを notesInfo (multi) で取得する
+        """
+        note_ids = client.invoke("findNotes", query=f'"note:{self.model_name}"') or []
+        current_ids = set(note_ids)
+        for note_id in [nid for nid in self.notes if nid not in current_ids]:
+            del self.notes[note_id]
+
+        mods = {}
+        if self.notes:
+            mod_times = client.invoke("notesModTime", notes=note_ids) or []
+            mods = {m["noteId"]: m["mod"] for m in mod_times}
+
+        stale_ids = [
+            nid for nid in note_ids
+            if nid not in self.notes or mods.get(nid) is None or self.notes[nid].get("mod") != mods[nid]
+        ]
+        for note in client.notes_info(stale_ids) if stale_ids else []:
+            value = note.get("fields", {}).get(self.field_name, {}).get("value", "")
+            self.notes[note["noteId"]] = {"mod": note.get("mod"), "front": front_hash(value)}
+        self._by_hash = None
+        return len(stale_ids)
+
+    def add(self, note_id, front_html, mod=None):
+        """登録したノートを追加する (mod が分からない場合は次回の refresh で取得し直す)"""
+        self.notes[note_id] = {"mod": mod, "front": front_hash(front_html)}
+        if self._by_hash is not None:
+            self._by_hash.setdefault(self.notes[note_id]["front"], note_id)
+
+    def find(self, front_html):
+        """表面フィールドが同じ既存ノートのIDを返す (なければ None)"""
+        if self._by_hash is None:
+            self._by_hash = {}
+            for note_id, entry in sorted(self.notes.items()):
+                self._by_hash.setdefault(entry["front"], note_id)
+        return self._by_hash.get(front_hash(front_html))
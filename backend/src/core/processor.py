@@ -1,7 +1,22 @@
+import hashlib
+import json
 import re
 
+from src.core.file_writer import write_text_atomic
+
 def sanitize_filename(text):
     """ファイル名に使えない文字を置換し、長さを制限する"""
     text = re.sub(r'[\\/*?:"<>|]', "", text) # 禁止文字を除去
     text = text.replace("\n", " ")           # 改行をスペースに
     return text[:50].strip()                 # 50文字制限
+
+def deck_directory(deck_name):
+    """デッキ名 (Parent::Child) を出力先のサブディレクトリ (Parent/Child) に変換する"""
+    return "/".join(sanitize_filename(part) or "_" for part in deck_name.split("::"))
+
+def write_json_atomic(path, data):
+    """一時ファイルに書いてから置き換える (途中で落ちてもファイルが壊れないように)"""
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, indent=1))
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
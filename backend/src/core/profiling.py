@@ -0,0 +1,120 @@
+import sys
+import time
+from contextlib import contextmanager
+
+from src.core import metrics
+
+# cProfile / pstats / subprocess は --profile・--import-time を指定した時だけ読み込む (起動を速くするため)
+
+# レポートに表示する関数の数と並び順
+PROFILE_LIMIT = 30
+PROFILE_SORT = "cumulative"
+# import の所要時間レポートに表示するモジュールの数
+IMPORT_TIME_LIMIT = 15
+
+
+def add_profile_argument(parser):
+    """スクリプトに --profile [FILE] オプションを追加する"""
+    parser.add_argument(
+        "--profile", nargs="?", const="", default=None, metavar="FILE",
+        help="Profile the run with cProfile and print a report to stderr (raw stats are saved to FILE if given)",
+    )
+
+
+def add_import_time_argument(parser):
+    """スクリプトに --import-time オプションを追加する"""
+    parser.add_argument(
+        "--import-time", action="store_true",
+        help="Report how long importing this script takes (python -X importtime breakdown) and exit",
+    )
+
+
+@contextmanager
+def profiled(target):
+    """
+    target が None なら何もしない
+    それ以外は with ブロックを cProfile で計測し、終了時にレポートを stderr に表示する
+    (target が空でなければ pstats 形式で保存する。snakeviz などで開ける)
+    """
+    if target is None:
+        yield
+        return
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        print_report(profiler, target)
+
+
+def print_report(profiler, target=""):
+    import io
+    import pstats
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(PROFILE_SORT).print_stats(PROFILE_LIMIT)
+    print(out.getvalue(), file=sys.stderr)
+
+    summary = metrics.REGISTRY.summary()
+    if summary:
+        print("⏱️ 計測値 (合計時間の多い順)", file=sys.stderr)
+        for item in summary:
+            labels = ",".join(f"{k}={v}" for k, v in item["labels"].items())
+            print(
+                f"  {item['name']}{{{labels}}}: {item['count']} 回, 合計 {item['total']:.3f} 秒, 平均 {item['mean'] * 1000:.2f} ms",
+                file=sys.stderr,
+            )
+
+    if target:
+        profiler.dump_stats(target)
+        print(f"📁 プロファイルを保存しました: {target}", file=sys.stderr)
+
+
+def measure_import_time(path):
+    """
+    path のファイルを別プロセスで python -X importtime 付きで読み込み (main は実行しない)、
+    (所要時間 (秒), [(モジュール名, 自身の時間 (秒), 累計 (秒), 階層)]) を返す
+    インタプリタ自体の起動で読み込まれるモジュールは含まない
+    """
+    import subprocess
+    code = f"import runpy; runpy.run_path({path!r})"
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    elapsed = time.perf_counter() - start
+
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        imports.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+
+    # runpy より前に読み込まれたもの (インタプリタの起動時) は除く
+    for i, (name, *_) in enumerate(imports):
+        if name == "runpy":
+            imports = imports[i + 1:]
+            break
+    return elapsed, imports
+
+
+def report_import_time(path, limit=IMPORT_TIME_LIMIT):
+    """measure_import_time の結果を、直接 import しているモジュールの累計時間と自身の時間の多い順に表示する"""
+    elapsed, imports = measure_import_time(path)
+    top_level = sorted((item for item in imports if item[3] == 0), key=lambda item: item[2], reverse=True)
+    total = sum(item[2] for item in top_level)
+
+    print(f"⏱️ import の所要時間: {total * 1000:.1f} ms (プロセスの起動を含む全体: {elapsed * 1000:.1f} ms)")
+    print("  直接 import しているモジュール (累計):")
+    for name, _, cumulative, _ in top_level[:limit]:
+        print(f"    {cumulative * 1000:8.1f} ms  {name}")
+    print("  自身の時間が長いモジュール:")
+    for name, self_time, _, _ in sorted(imports, key=lambda item: item[1], reverse=True)[:limit]:
+        print(f"    {self_time * 1000:8.1f} ms  {name}")
+    return elapsed, total
@@ -0,0 +1,125 @@
+import json
+import re
+
+from src.core.json_stream import IncrementalJSONExtractor
+
+# 生成結果の JSON のキー (フロントエンドが期待する形)
+GENERATE_KEYS = ("chat", "front", "back")
+MODIFY_KEYS = ("front", "back")
+
+_TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+
+
+def json_schema(keys):
+    """文字列フィールドだけのオブジェクトの response_schema (Gemini の JSON モード用)"""
+    return {
+        "type": "object",
+        "properties": {key: {"type": "string"} for key in keys},
+        "required": list(keys),
+    }
+
+GENERATE_SCHEMA = json_schema(GENERATE_KEYS)
+MODIFY_SCHEMA = json_schema(MODIFY_KEYS)
+
+
+def build_generate_prompt(user_input):
+    """カード生成用のプロンプト (ユーザーの入力をラップして、構造化されたJSONレスポンスを要求する)"""
+    return f"""
+    You are an expert Anki card creator.
+    The user will provide a topic or text.
+    Your goal is to create a high-quality Anki card (Front and Back) and provide a brief explanation or chat response.
+
+    User Input:
+    {user_input}
+
+    Output Requirement:
+    Return a valid JSON object with the following keys:
+    - "chat": A brief explanation, friendly response, or advice about the generated card.
+    - "front": The content for the Front of the card (Markdown allowed).
+    - "back": The content for the Back of the card (Markdown allowed).
+
+    Format:
+    {{
+        "chat": "Here is a card regarding...",
+        "front": "...",
+        "back": "..."
+    }}
+    
+    Do not include markdown code block markers (like ```json). Return only the raw JSON string.
+    """
+
+def build_modify_prompt(front, back, instruction):
+    """既存カード修正用のプロンプト"""
+    return f"""
+    You are an assistant editing Anki flashcards.
+
+    Original Front:
+    {front}
+
+    Original Back:
+    {back}
+
+    Instruction:
+    {instruction}
+
+    Please provide the modified Front and Back based on the instruction.
+    Output MUST be a valid JSON object with detailed keys "front" and "back".
+    Do not include markdown code block markers (```json). Just the raw JSON string.
+    """
+
+def build_repair_prompt(content, error, keys):
+    """解析できなかった出力を JSON に直してもらうためのプロンプト"""
+    return f"""
+    The following text was supposed to be a single JSON object with the string keys {", ".join(keys)},
+    but it could not be parsed ({error}).
+
+    Text:
+    {content}
+
+    Return only the corrected JSON object with the same content. Do not add or remove information.
+    """
+
+def clean_json_response(content):
+    # Markdownのコードブロックが含まれている場合の除去処理
+    return content.replace("```json", "").replace("```", "").strip()
+
+def parse_json_response(content, keys=None):
+    """
+    JSON のレスポンスを寛容に解析する (コードブロック・前後の文章・末尾のカンマを許容)
+    それでも解析できない場合 (途中で切れた出力など) は、閉じている文字列フィールドだけを取り出し、
+    keys が全て揃っていればそれを返す。どれにも当てはまらなければ ValueError
+    """
+    text = clean_json_response(content)
+    candidates = [text]
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        candidates.append(text[start:end + 1])
+
+    for candidate in candidates:
+        for attempt in (candidate, _TRAILING_COMMA_PATTERN.sub(r"\1", candidate)):
+            try:
+                data = json.loads(attempt)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(data, dict):
+                return data
+
+    extractor = IncrementalJSONExtractor(keys)
+    extractor.feed(text)
+    if extractor.fields and all(key in extractor.fields for key in keys or ()):
+        return extractor.fields
+    raise ValueError("Failed to parse AI response as JSON")
+
+def parse_generate_response(content):
+    """
+    カード生成のレスポンスを {"chat", "front", "back"} に変換する
+    JSON解析失敗時は、全体をchatとして扱い、cardは空にするフォールバック
+    """
+    try:
+        return parse_json_response(content, GENERATE_KEYS)
+    except ValueError:
+        return {
+            "chat": content,
+            "front": "",
+            "back": ""
+        }
@@ -0,0 +1,50 @@
+import fnmatch
+import os
+
+
+def is_markdown(path):
+    name = os.path.basename(path)
+    return name.endswith(".md") and not name.startswith(".")
+
+
+def path_matches(rel_path, include=None, exclude=None):
+    """
+    ディレクトリからの相対パスが include のいずれかに一致し、exclude のどれにも一致しなければ True
+    パターンは fnmatch 形式 (区切りは "/"、"*" は "/" にも一致する)。include を省略するとすべて対象
+    """
+    rel_path = rel_path.replace(os.sep, "/")
+    if exclude and any(fnmatch.fnmatch(rel_path, pattern) for pattern in exclude):
+        return False
+    return not include or any(fnmatch.fnmatch(rel_path, pattern) for pattern in include)
+
+
+def scan_markdown(directory, include=None, exclude=None):
+    """
+    directory 以下の Markdown ファイルを os.scandir で再帰的に走査し、(パス, stat) を順に返すジェネレーター
+    隠しファイル・隠しディレクトリ (.obsidian など) と exclude に一致するディレクトリの中は見ない
+    """
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            rel_path = os.path.relpath(entry.path, directory)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not path_matches(rel_path, exclude=exclude):
+                        continue
+                    subdirs.append(entry.path)
+                elif is_markdown(entry.name) and path_matches(rel_path, include, exclude):
+                    yield entry.path, entry.stat()
+            except OSError:
+                continue
+        # 名前順に辿るため、逆順に積む
+        stack.extend(reversed(subdirs))
@@ -0,0 +1,267 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from src.clients.anki_connect import NOTES_INFO_CHUNK_SIZE, chunk_ids
+from src.core.anki_query import edited_days_since
+
+# trigram は日本語 (単語の区切りがない文章) でも部分一致で検索できる (SQLite 3.34 以降)
+_TRIGRAM_MIN_LENGTH = 3
+# スニペットに含めるトークン数
+SNIPPET_TOKENS = 12
+SNIPPET_MARKERS = ("<mark>", "</mark>")
+
+
+def _has_trigram(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(x, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("DROP TABLE temp.trigram_probe")
+    return True
+
+
+def _quote_term(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like_pattern(term):
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class CardSearchIndex:
+    """
+    カードの表面・裏面 (Markdown) とタグの全文検索インデックス (SQLite FTS5)
+    検索対象のデッキ (scope) ごとに、前回の更新以降に Anki で編集・追加・削除されたノートだけを取り込む
+    API でのカードの作成・更新時は upsert で直接反映する
+    SQLite の読み書きはブロックするため、async のコードからは *_async のメソッド (スレッドで実行) を使う
+    """
+    def __init__(self, path, convert_many, refresh_interval=30.0):
+        # convert_many: notesInfo のリストを受け取り、{"id", "front", "back", "tags"} の dict のリストを返す async 関数
+        self.path = path
+        self.convert_many = convert_many
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refresh_locks = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self.trigram = _has_trigram(self._conn)
+        tokenizer = "trigram" if self.trigram else "unicode61"
+        self._conn.executescript(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS cards USING fts5(front, back, tags, tokenize='{tokenizer}');"
+            "CREATE TABLE IF NOT EXISTS notes (note_id INTEGER PRIMARY KEY, mod INTEGER);"
+            "CREATE TABLE IF NOT EXISTS scopes ("
+            " scope TEXT NOT NULL, note_id INTEGER NOT NULL, PRIMARY KEY (scope, note_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS scopes_note_id ON scopes (note_id);"
+            "CREATE TABLE IF NOT EXISTS checked (scope TEXT PRIMARY KEY, checked_at REAL NOT NULL);"
+        )
+        self._conn.commit()
+        # 前回 Anki と照合した時刻 (プロセス内。間隔が短ければ照合を省く)
+        self._refreshed_at = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    # --- 書き込み ---
+
+    def upsert(self, note_id, front, back, tags, deck_name=None, mod=None):
+        """
+        カードを追加・更新する (API で作成・更新した時に呼ぶ)
+        deck_name を指定すると、そのデッキ (と親デッキ) を対象にした既存の scope にも追加する
+        mod が分からない場合は None にしておくと、次回の照合で Anki から取り直す
+        """
+        with self._lock:
+            self._upsert([(note_id, front, back, tags, mod)])
+            if deck_name:
+                # Anki のデッキ名は大文字・小文字を区別しない
+                deck_key = deck_name.lower()
+                scopes = [
+                    scope for (scope,) in self._conn.execute("SELECT scope FROM checked")
+                    if deck_key == scope.lower() or deck_key.startswith(scope.lower() + "::")
+                ]
+                self._add_scopes(scopes, [note_id])
+            self._conn.commit()
+
+    async def upsert_async(self, note_id, front, back, tags, deck_name=None, mod=None):
+        await asyncio.to_thread(self.upsert, note_id, front, back, tags, deck_name, mod)
+
+    def _upsert(self, rows):
+        ids = [(row[0],) for row in rows]
+        self._conn.executemany("DELETE FROM cards WHERE rowid = ?", ids)
+        self._conn.executemany(
+            "INSERT INTO cards (rowid, front, back, tags) VALUES (?, ?, ?, ?)",
+            [(note_id, front, back, " ".join(tags or ())) for note_id, front, back, tags, _ in rows],
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO notes (note_id, mod) VALUES (?, ?)",
+            [(note_id, mod) for note_id, _, _, _, mod in rows],
+        )
+
+    def _add_scopes(self, scopes, note_ids):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO scopes (scope, note_id) VALUES (?, ?)",
+            [(scope, note_id) for scope in scopes for note_id in note_ids],
+        )
+
+    def _remove_from_scope(self, scope, note_ids):
+        self._conn.executemany(
+            "DELETE FROM scopes WHERE scope = ? AND note_id = ?", [(scope, nid) for nid in note_ids]
+        )
+        # どの scope にも属さなくなったノートは削除する
+        orphans = [
+            (nid,) for nid in note_ids
+            if self._conn.execute("SELECT 1 FROM scopes WHERE note_id = ? LIMIT 1", (nid,)).fetchone() is None
+        ]
+        self._conn.executemany("DELETE FROM cards WHERE rowid = ?", orphans)
+        self._conn.executemany("DELETE FROM notes WHERE note_id = ?", orphans)
+
+    # --- Anki との照合 ---
+
+    async def refresh(self, client, scope, query, force=False):
+        """
+        scope (query に一致するノート) を Anki の現在の状態に合わせる。戻り値は取り込んだノート数
+        1. findNotes で現在のノート一覧と、前回の照合以降に編集されたノートを1回の multi で取得
+        2. 編集されたノートのうちインデックス済みのものは notesModTime で mod を確認
+        3. 新しいノート・mod が変わったノートだけ notesInfo で取得して変換し、消えたノートは削除する
+        refresh_interval 秒以内に照合済みなら何もしない (force=True で必ず照合する)
+        """
+        lock = self._refresh_locks.setdefault(scope, asyncio.Lock())
+        async with lock:
+            now = time.time()
+            refreshed_at = self._refreshed_at.get(scope)
+            if not force and refreshed_at is not None and now - refreshed_at < self.refresh_interval:
+                return 0
+
+            checked_at, indexed, known_mods = await asyncio.to_thread(self._scope_state, scope)
+
+            batch = client.batch()
+            found = batch.add('findNotes', query=query)
+            edited = None
+            if checked_at is not None:
+                edited = batch.add('findNotes', query=f'{query} edited:{edited_days_since(checked_at, now)}')
+            await batch.flush()
+            if not found.ok:
+                raise RuntimeError(f"findNotes failed: {found.error}")
+
+            note_ids = set(found.result or [])
+            removed = indexed - note_ids
+            if edited is not None and edited.ok:
+                candidates = [nid for nid in (edited.result or []) if nid in known_mods]
+            else:
+                candidates = [nid for nid in note_ids if nid in known_mods]
+
+            stale = [nid for nid in note_ids if nid not in known_mods]
+            if candidates:
+                mod_times = await client.invoke('notesModTime', notes=candidates)
+                mods = {m['noteId']: m['mod'] for m in mod_times or []}
+                stale.extend(nid for nid in candidates if mods.get(nid) is None or known_mods[nid] != mods[nid])
+
+            for ids in chunk_ids(sorted(stale), NOTES_INFO_CHUNK_SIZE):
+                notes = await client.notes_info(ids)
+                cards = await self.convert_many(notes)
+                rows = [
+                    (note['noteId'], card['front'], card['back'], card.get('tags') or [], note.get('mod'))
+                    for note, card in zip(notes, cards)
+                ]
+                await asyncio.to_thread(self._store_rows, rows)
+
+            await asyncio.to_thread(self._finish_refresh, scope, sorted(note_ids - indexed), sorted(removed), now)
+            self._refreshed_at[scope] = now
+            return len(stale)
+
+    def _scope_state(self, scope):
+        """(前回の照合時刻, scope のノートID, 全ノートの mod) を返す"""
+        with self._lock:
+            row = self._conn.execute("SELECT checked_at FROM checked WHERE scope = ?", (scope,)).fetchone()
+            indexed = {nid for (nid,) in self._conn.execute("SELECT note_id FROM scopes WHERE scope = ?", (scope,))}
+            known_mods = dict(self._conn.execute("SELECT note_id, mod FROM notes"))
+        return (row[0] if row else None), indexed, known_mods
+
+    def _store_rows(self, rows):
+        with self._lock:
+            self._upsert(rows)
+            self._conn.commit()
+
+    def _finish_refresh(self, scope, added, removed, now):
+        with self._lock:
+            self._add_scopes([scope], added)
+            self._remove_from_scope(scope, removed)
+            self._conn.execute("INSERT OR REPLACE INTO checked (scope, checked_at) VALUES (?, ?)", (scope, now))
+            self._conn.commit()
+
+    # --- 検索 ---
+
+    def _match(self, text):
+        """
+        検索語 (空白区切りで AND) を FTS5 の MATCH 式と、MATCH で扱えない短い語の LIKE 条件に分ける
+        trigram では3文字未満の語は MATCH できないため LIKE で絞り込む
+        """
+        terms = text.split()
+        if not self.trigram:
+            return " ".join(_quote_term(t) for t in terms), []
+        long_terms = [t for t in terms if len(t) >= _TRIGRAM_MIN_LENGTH]
+        short_terms = [t for t in terms if len(t) < _TRIGRAM_MIN_LENGTH]
+        return " ".join(_quote_term(t) for t in long_terms), short_terms
+
+    async def search_async(self, scope, text, offset=0, limit=20):
+        return await asyncio.to_thread(self.search, scope, text, offset, limit)
+
+    def search(self, scope, text, offset=0, limit=20):
+        """
+        scope 内のカードを検索し、(総件数, [{"id", "front", "back", "tags", "snippet", "score"}]) を返す
+        一致度 (bm25、表面の一致を重く評価) の高い順。snippet は一致箇所を <mark> で囲んだ抜粋
+        """
+        match, short_terms = self._match(text)
+        where = ["s.scope = ?"]
+        params = [scope]
+        if match:
+            where.append("cards MATCH ?")
+            params.append(match)
+        for term in short_terms:
+            where.append("(cards.front LIKE ? ESCAPE '\\' OR cards.back LIKE ? ESCAPE '\\' OR cards.tags LIKE ? ESCAPE '\\')")
+            params.extend([_like_pattern(term)] * 3)
+        if not match and not short_terms:
+            return 0, []
+
+        start, end = SNIPPET_MARKERS
+        if match:
+            select = f"bm25(cards, 4.0, 1.0, 2.0) AS score, snippet(cards, -1, ?, ?, '…', {SNIPPET_TOKENS})"
+            select_params = [start, end]
+            order = "score, cards.rowid"
+        else:
+            select = "0.0 AS score, NULL"
+            select_params = []
+            order = "cards.rowid"
+
+        # CROSS JOIN で FTS の検索を外側に固定する (scopes を外側にすると、行ごとに全文検索をやり直してしまう)
+        from_clause = f"FROM cards CROSS JOIN scopes s ON s.note_id = cards.rowid WHERE {' AND '.join(where)}"
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) {from_clause}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT cards.rowid, cards.front, cards.back, cards.tags, {select} {from_clause}"
+                f" ORDER BY {order} LIMIT ? OFFSET ?",
+                select_params + params + [limit, offset],
+            ).fetchall()
+
+        hits = []
+        for note_id, front, back, tags, score, snippet in rows:
+            hits.append({
+                "id": note_id,
+                "front": front,
+                "back": back,
+                "tags": tags.split() if tags else [],
+                "snippet": snippet if snippet is not None else front[:80],
+                # bm25 は小さいほど一致度が高いので、符号を反転して返す
+                "score": -score,
+            })
+        return total, hits
@@ -0,0 +1,97 @@
+import json
+import os
+
+from src.core.processor import text_hash, write_json_atomic
+
+# 同期ベースディレクトリに保存する状態ファイルのファイル名
+SYNC_STATE_FILENAME = ".forAnki_sync_state.json"
+SYNC_STATE_VERSION = 1
+
+
+class SyncState:
+    """
+    前回の同期結果を記録するインデックス
+    ファイルパス -> {
+        "size", "mtime_ns": 前回確認時のファイル情報 (変わっていなければ読み込み自体を省く),
+        "hash": ファイル内容のハッシュ,
+        "note_id": 対応する Anki のノートID,
+        "fields": {フィールド名: 最後に送信したHTMLのハッシュ},
+    }
+    """
+    def __init__(self, path, files=None):
+        self.path = path
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, base_dir):
+        path = os.path.join(base_dir, SYNC_STATE_FILENAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 同期状態を読み込めませんでした ({e})。全ファイルを同期します。")
+            return cls(path)
+
+        if data.get("version") != SYNC_STATE_VERSION:
+            return cls(path)
+        return cls(path, data.get("files", {}))
+
+    def save(self):
+        write_json_atomic(self.path, {"version": SYNC_STATE_VERSION, "files": self.files})
+
+    @staticmethod
+    def key(file_path):
+        return os.path.abspath(file_path)
+
+    def get(self, file_path):
+        return self.files.get(self.key(file_path))
+
+    def is_unchanged(self, file_path, stat):
+        """サイズと更新時刻が前回と同じなら True (ファイルを読まずに判定できる)"""
+        entry = self.get(file_path)
+        return (
+            entry is not None
+            and entry.get("size") == stat.st_size
+            and entry.get("mtime_ns") == stat.st_mtime_ns
+        )
+
+    def record_file(self, file_path, stat, content):
+        """ファイルの状態を記録する (ノートとの対応・送信済みフィールドは保持する)"""
+        entry = self.files.setdefault(self.key(file_path), {"note_id": None, "fields": {}})
+        entry["size"] = stat.st_size
+        entry["mtime_ns"] = stat.st_mtime_ns
+        entry["hash"] = text_hash(content)
+        return entry
+
+    def record_push(self, file_path, note_id, fields, tags=None):
+        """Anki へ送信した内容を記録する (fields: フィールド名 -> 送信したHTML、tags: 反映済みのタグ)"""
+        entry = self.files.setdefault(self.key(file_path), {"note_id": None, "fields": {}})
+        if entry.get("note_id") != note_id:
+            entry["fields"] = {}
+            entry.pop("tags", None)
+        entry["note_id"] = note_id
+        entry["fields"].update({name: text_hash(value) for name, value in fields.items()})
+        if tags is not None:
+            entry["tags"] = _tags_hash(tags)
+
+    def tags_changed(self, file_path, note_id, tags):
+        """前回 Anki に反映したタグから変わっていれば (記録がなければ) True"""
+        entry = self.get(file_path)
+        if entry is None or entry.get("note_id") != note_id:
+            return True
+        return entry.get("tags") != _tags_hash(tags)
+
+    def changed_fields(self, file_path, note_id, fields):
+        """前回送信した内容から変わったフィールドだけを返す"""
+        entry = self.get(file_path)
+        if entry is None or entry.get("note_id") != note_id:
+            return dict(fields)
+        pushed = entry.get("fields", {})
+        return {name: value for name, value in fields.items() if pushed.get(name) != text_hash(value)}
+
+
+def _tags_hash(tags):
+    # Anki のタグは順序・大文字小文字を区別しない
+    return text_hash(" ".join(sorted({tag.lower() for tag in tags})))
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+
+from src.core.scanner import is_markdown, scan_markdown
+
+# watchdog (inotify / FSEvents など) がインストールされていれば使い、なければポーリングで監視する
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+# 最後の変更からこの秒数だけ変更がなければまとめて処理する (連続保存をまとめるため)
+DEFAULT_DEBOUNCE = 0.3
+# 変更が続いていても、最初の変更からこの秒数が経ったら処理する
+DEFAULT_MAX_DELAY = 1.0
+# ポーリング時のスキャン間隔 (秒)
+DEFAULT_POLL_INTERVAL = 0.5
+
+
+class ChangeCollector:
+    """変更されたファイルパスを溜めておき、debounce / max_delay に従って取り出す (スレッドセーフ)"""
+    def __init__(self, debounce=DEFAULT_DEBOUNCE, max_delay=DEFAULT_MAX_DELAY):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._paths = set()
+        self._first_at = None
+        self._last_at = None
+        self._lock = threading.Lock()
+
+    def add(self, path):
+        now = time.monotonic()
+        with self._lock:
+            self._paths.add(os.path.abspath(path))
+            if self._first_at is None:
+                self._first_at = now
+            self._last_at = now
+
+    def pop_ready(self):
+        """処理してよい変更があればパスのリストを返し、なければ空リストを返す"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._paths:
+                return []
+            if now - self._last_at < self.debounce and now - self._first_at < self.max_delay:
+                return []
+            paths = sorted(self._paths)
+            self._paths.clear()
+            self._first_at = self._last_at = None
+            return paths
+
+
+class _MarkdownEventHandler(FileSystemEventHandler):
+    def __init__(self, collector):
+        self.collector = collector
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type == "deleted":
+            return
+        # リネーム (エディタの一時ファイル -> 本体への置き換え) は移動先を見る
+        path = getattr(event, "dest_path", None) or event.src_path
+        if is_markdown(path):
+            self.collector.add(path)
+
+
+def snapshot(directory):
+    """ディレクトリ以下の Markdown ファイルの (mtime_ns, size) を再帰的に取得する"""
+    return {
+        os.path.abspath(path): (stat.st_mtime_ns, stat.st_size)
+        for path, stat in scan_markdown(directory)
+    }
+
+
+def watch(directory, on_change, debounce=DEFAULT_DEBOUNCE, max_delay=DEFAULT_MAX_DELAY,
+          poll_interval=DEFAULT_POLL_INTERVAL, use_polling=False, stop_event=None):
+    """
+    directory 以下の Markdown ファイルを監視し、変更があれば on_change(paths) を呼ぶ
+    短時間の連続した変更はまとめて1回の呼び出しにする。stop_event がセットされるか Ctrl+C で終了する
+    """
+    collector = ChangeCollector(debounce, max_delay)
+    stop_event = stop_event or threading.Event()
+
+    observer = None
+    if Observer is not None and not use_polling:
+        observer = Observer()
+        observer.schedule(_MarkdownEventHandler(collector), directory, recursive=True)
+        observer.start()
+        print(f"👀 監視を開始しました (watchdog): {directory}")
+    else:
+        print(f"👀 監視を開始しました (ポーリング {poll_interval} 秒間隔): {directory}")
+
+    previous = snapshot(directory) if observer is None else None
+    last_poll = time.monotonic()
+    # イベント待ちの間隔 (debounce より十分短くする)
+    tick = min(0.05, debounce / 2)
+
+    try:
+        while not stop_event.is_set():
+            if observer is None and time.monotonic() - last_poll >= poll_interval:
+                current = snapshot(directory)
+                for path, signature in current.items():
+                    if previous.get(path) != signature:
+                        collector.add(path)
+                previous = current
+                last_poll = time.monotonic()
+
+            paths = collector.pop_ready()
+            if paths:
+                try:
+                    on_change(paths)
+                except Exception as e:
+                    print(f"❌ 同期エラー: {e}")
+            stop_event.wait(tick)
+    except KeyboardInterrupt:
+        print("\n🛑 監視を終了します。")
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
@@ -1,19 +1,58 @@
 import sys
 import os
+import json
+import time
+from bisect import bisect_right
+from contextlib import asynccontextmanager
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 # プロジェクトルートへのパス設定
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from instance import config
-from src.clients.anki_connect import AnkiConnectClient
-from src.clients.gemini import GeminiClient
-from src.core.converter import markdown_to_html, html_to_markdown
-
-app = FastAPI(title="forAnki API", version="1.0.0")
+from src.clients.async_anki_connect import AsyncAnkiConnectClient, create_async_client
+from src.clients.gemini import get_gemini_client
+from src.core import metrics
+from src.core.anki_query import build_query, deck_query, edited_days_since
+from src.core.converter import (
+    bulk_html_to_markdown_async,
+    bulk_markdown_to_html_async,
+    notes_to_markdown_async,
+    shutdown_process_pool,
+)
+from src.core.json_stream import IncrementalJSONExtractor
+from src.core.note_cache import NoteCache
+from src.core.note_diff import changed_note_fields, diff_tags, tag_operations
+from src.core.note_index import normalize_front
+from src.core.prompts import (
+    GENERATE_SCHEMA,
+    MODIFY_SCHEMA,
+    build_generate_prompt,
+    build_modify_prompt,
+    parse_generate_response,
+)
+from src.core.search_index import CardSearchIndex
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # AsyncAnkiConnectClient (接続プール) はアプリ起動中ずっと使い回す
+    app.state.anki_client = create_async_client()
+    # 変換済みカードのキャッシュ (GET /cards 用)
+    app.state.note_cache = NoteCache(notes_to_cards)
+    # カードの全文検索インデックス (GET /cards/search 用)
+    app.state.search_index = CardSearchIndex(
+        config.SEARCH_INDEX_PATH, notes_to_cards, refresh_interval=config.SEARCH_INDEX_REFRESH_INTERVAL,
+    )
+    yield
+    await app.state.anki_client.aclose()
+    app.state.search_index.close()
+    shutdown_process_pool()
+
+app = FastAPI(title="forAnki API", version="1.0.0", lifespan=lifespan)
 
 # CORS設定 (Reactからのアクセスを許可)
 app.add_middleware(
@@ -22,11 +61,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],  # ページング用ヘッダーをフロントから参照できるようにする
 )
 
-# クライアント初期化
-def get_client():
-    return AnkiConnectClient(config.ANKI_CONNECT_URL)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    リクエストごとの所要時間を記録する
+    SERVER_TIMING_ENABLED の場合は内訳 (AnkiConnect・変換・Gemini・合計) を Server-Timing ヘッダーで返す
+    """
+    timings, token = metrics.start_request_timings()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.reset_request_timings(token)
+    elapsed = time.perf_counter() - start
+
+    # パスはルートのテンプレート (/cards/{note_id}) で集計する
+    route = request.scope.get("route")
+    metrics.observe(
+        "http_request_duration_seconds", elapsed,
+        method=request.method, path=route.path if route else "unmatched", status=response.status_code,
+    )
+    if config.SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = metrics.format_server_timing(timings, elapsed)
+    return response
+
+# クライアント取得 (アプリ全体で共有している接続プール付きのクライアントを返す)
+def get_client(request: Request) -> AsyncAnkiConnectClient:
+    return request.app.state.anki_client
+
+def get_note_cache(request: Request) -> NoteCache:
+    return request.app.state.note_cache
+
+def get_search_index(request: Request) -> CardSearchIndex:
+    return request.app.state.search_index
 
 # リクエスト/レスポンス用モデル
 class CardRequest(BaseModel):
@@ -42,13 +112,44 @@ class CardResponse(BaseModel):
     tags: List[str]
     deckName: str
 
+class BulkCardRequest(BaseModel):
+    cards: List[CardRequest]
+
+class BulkCardResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkCardResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkCardResult]
+
 class GenerateRequest(BaseModel):
     prompt: str
+    no_cache: bool = False  # True の場合はキャッシュを使わずに生成し直す
+    stream: bool = False  # True の場合は Server-Sent Events で少しずつ返す
+
+class GenerateBatchRequest(BaseModel):
+    prompts: List[str]
+    no_cache: bool = False
+
+class GenerateBatchItem(BaseModel):
+    index: int
+    chat: str = ""
+    front: str = ""
+    back: str = ""
+    error: Optional[str] = None
+
+class GenerateBatchResponse(BaseModel):
+    results: List[GenerateBatchItem]
 
 class ModifyRequest(BaseModel):
     front: str
     back: str
     instruction: str
+    no_cache: bool = False
+    stream: bool = False
 
 class ModifyResponse(BaseModel):
     front: str
@@ -60,209 +161,473 @@ class ModifyResponse(BaseModel):
 def read_root():
     return {"status": "ok", "service": "forAnki API"}
 
+@app.get("/metrics")
+def get_metrics():
+    """リクエスト・AnkiConnect・変換・Gemini の計測値を Prometheus のテキスト形式で返します。"""
+    return Response(metrics.REGISTRY.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+def sse_event(event, data):
+    """Server-Sent Events の1イベント分の文字列"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_generation(prompt, use_cache, response_schema, fallback=None):
+    """
+    Gemini の生成結果 (JSON モード) を Server-Sent Events で返す
+    - field: JSON のフィールドが完成するたびに {"key", "value"}
+    - done: 生成完了後、解析したオブジェクト全体
+    - error: 失敗時に {"detail"}
+    解析できない場合は修復を1回試し、それでも駄目なら fallback(全文) を返す (なければ error)
+    """
+    client = get_gemini_client()
+    keys = response_schema["required"]
+
+    async def events():
+        extractor = IncrementalJSONExtractor(keys)
+        parts = []
+        try:
+            async for text in client.stream_content_async(prompt, use_cache, response_schema):
+                parts.append(text)
+                for key, value in extractor.feed(text):
+                    yield sse_event("field", {"key": key, "value": value})
+            content = "".join(parts)
+            try:
+                data = await client.parse_json_or_repair(prompt, content, response_schema, use_cache)
+            except ValueError:
+                if fallback is None:
+                    raise
+                data = fallback(content)
+            yield sse_event("done", {key: data.get(key, "") for key in keys})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+
+    # プロキシにバッファリングさせない
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
 @app.post("/generate")
-def generate_content(request: GenerateRequest):
+async def generate_content(request: GenerateRequest):
     """
     Gemini APIを使用してコンテンツを生成します。
+    stream=true の場合は chat / front / back を完成した順に Server-Sent Events で返します。
     """
-    client = GeminiClient()
-    
-    # ユーザーの入力をラップして、構造化されたJSONレスポンスを要求する
-    system_prompt = f"""
-    You are an expert Anki card creator.
-    The user will provide a topic or text.
-    Your goal is to create a high-quality Anki card (Front and Back) and provide a brief explanation or chat response.
-
-    User Input:
-    {request.prompt}
-
-    Output Requirement:
-    Return a valid JSON object with the following keys:
-    - "chat": A brief explanation, friendly response, or advice about the generated card.
-    - "front": The content for the Front of the card (Markdown allowed).
-    - "back": The content for the Back of the card (Markdown allowed).
-
-    Format:
-    {{
-        "chat": "Here is a card regarding...",
-        "front": "...",
-        "back": "..."
-    }}
-    
-    Do not include markdown code block markers (like ```json). Return only the raw JSON string.
-    """
+    client = get_gemini_client()
+    system_prompt = build_generate_prompt(request.prompt)
+
+    use_cache = not request.no_cache
+    if request.stream:
+        return stream_generation(system_prompt, use_cache, GENERATE_SCHEMA, parse_generate_response)
 
     try:
-        content = client.generate_content(system_prompt)
-        
-        # クリーニング (万が一Markdownブロックが含まれていた場合)
-        cleaned_content = content.replace("```json", "").replace("```", "").strip()
-        
+        # JSON モードで {"chat": ..., "front": ..., "back": ...} の形を指定して生成する
+        content = await client.generate_content_async(system_prompt, use_cache, GENERATE_SCHEMA)
         try:
-            import json
-            data = json.loads(cleaned_content)
-            # フロントエンドが期待している形に合わせて返す
-            # 既存は {"content": string} だったが、
-            # これからは {"chat": ..., "front": ..., "back": ...} を返したい
-            # しかし他のクライアントへの互換性を保つため、contentキーに全部入れるのではなく分離する？
-            # ひとまず辞書をそのまま返す (FastAPIがJSON化してくれる)
-            return data
-        except json.JSONDecodeError:
-            # JSON解析失敗時は、全体をchatとして扱い、cardは空にするなどのフォールバック
-            return {
-                "chat": content,
-                "front": "",
-                "back": ""
-            }
+            return await client.parse_json_or_repair(system_prompt, content, GENERATE_SCHEMA, use_cache)
+        except ValueError:
+            # 修復もできなかった場合は全体を chat として返す
+            return parse_generate_response(content)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/generate/modify", response_model=ModifyResponse)
-def modify_content(request: ModifyRequest):
-    """
-    Gemini APIを使用して既存のカード内容を修正します。
-    """
-    client = GeminiClient()
-    prompt = f"""
-    You are an assistant editing Anki flashcards.
-
-    Original Front:
-    {request.front}
-
-    Original Back:
-    {request.back}
+# POST /generate/batch で一度に受け付ける最大件数
+MAX_BATCH_PROMPTS = 500
 
-    Instruction:
-    {request.instruction}
-
-    Please provide the modified Front and Back based on the instruction.
-    Output MUST be a valid JSON object with detailed keys "front" and "back".
-    Do not include markdown code block markers (```json). Just the raw JSON string.
+@app.post("/generate/batch", response_model=GenerateBatchResponse)
+async def generate_batch(request: GenerateBatchRequest):
+    """
+    複数のトピックからまとめてカードを生成します。
+    共有の GeminiClient で並行に実行し、レート制限・同時実行数の上限・クォータエラー時のリトライを適用します。
+    結果はリクエストの順に返し、失敗したトピックは error に理由を入れます。
     """
+    if len(request.prompts) > MAX_BATCH_PROMPTS:
+        raise HTTPException(status_code=400, detail=f"Too many prompts (max {MAX_BATCH_PROMPTS})")
 
+    client = get_gemini_client()
     try:
-        # 構造化されたデータを期待するため、プロンプトでJSONを強制する
-        # (Gemini 2.0 FlashはJSON modeがあるが、ここでは簡易的にプロンプトで指示)
-        content = client.generate_content(prompt)
-
-        # Markdownのコードブロックが含まれている場合の除去処理
-        cleaned_content = content.replace("```json", "").replace("```", "").strip()
-
-        import json
-        data = json.loads(cleaned_content)
-        return ModifyResponse(front=data.get("front", ""), back=data.get("back", ""))
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Failed to parse AI response as JSON")
+        outputs = await client.generate_batch(
+            [build_generate_prompt(p) for p in request.prompts],
+            use_cache=not request.no_cache,
+            response_schema=GENERATE_SCHEMA,
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/cards", response_model=List[dict])
-def get_cards(deck: Optional[str] = None):
+    results = []
+    for i, output in enumerate(outputs):
+        if isinstance(output, Exception):
+            results.append(GenerateBatchItem(index=i, error=str(output)))
+        else:
+            data = output
+            results.append(GenerateBatchItem(
+                index=i,
+                chat=data.get("chat", ""),
+                front=data.get("front", ""),
+                back=data.get("back", ""),
+            ))
+    return GenerateBatchResponse(results=results)
+
+@app.post("/generate/modify", response_model=ModifyResponse)
+async def modify_content(request: ModifyRequest):
     """
-    指定したデッキ（デフォルトはconfig設定）のカード一覧を取得します。
+    Gemini APIを使用して既存のカード内容を修正します。
+    stream=true の場合は front / back を完成した順に Server-Sent Events で返します。
     """
-    client = get_client()
-    target_deck = deck or config.ANKI_DECK_NAME
+    client = get_gemini_client()
+    prompt = build_modify_prompt(request.front, request.back, request.instruction)
 
-    # 1. ノートIDを検索
-    query = f'"deck:{target_deck}"'
-    note_ids = client.invoke('findNotes', query=query)
+    use_cache = not request.no_cache
+    if request.stream:
+        return stream_generation(prompt, use_cache, MODIFY_SCHEMA)
 
-    if not note_ids:
-        return []
-
-    # 2. 詳細情報を取得
-    notes_info = client.invoke('notesInfo', notes=note_ids)
+    try:
+        # JSON モードで {"front": ..., "back": ...} の形を指定して生成する
+        content = await client.generate_content_async(prompt, use_cache, MODIFY_SCHEMA)
+        data = await client.parse_json_or_repair(prompt, content, MODIFY_SCHEMA, use_cache)
+        return ModifyResponse(front=data.get("front", ""), back=data.get("back", ""))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    # 3. シンプルな形式に整形して返す
-    cards = []
-    for note in notes_info:
-        # フィールド名はconfig依存だが、APIレスポンスとしては固定キー(front, back)で返すとReactが楽
-        front_html = note['fields'].get(config.FIELD_FRONT, {}).get('value', '')
-        back_html = note['fields'].get(config.FIELD_BACK, {}).get('value', '')
+@app.get("/generate/cache")
+def get_generate_cache_stats():
+    """Gemini レスポンスキャッシュのヒット率などを返します。"""
+    return {"enabled": config.GEMINI_CACHE_ENABLED, "stats": get_gemini_client().cache_stats()}
 
-        # HTML -> Markdown 変換
-        front = html_to_markdown(front_html)
-        back = html_to_markdown(back_html)
+async def notes_to_cards(notes):
+    """notesInfo のリストをAPIレスポンス用の形式に変換する (件数が多い場合は並列に変換)"""
+    # フィールド名はconfig依存だが、APIレスポンスとしては固定キー(front, back)で返すとReactが楽
+    converted = await notes_to_markdown_async(notes, config.FIELD_FRONT, config.FIELD_BACK)
 
-        cards.append({
+    return [
+        {
             "id": note['noteId'],
             "front": front,
             "back": back,
             "tags": note['tags'],
             "deckName": note['modelName'] # 注: notesInfoにはdeckNameが含まれない場合があるためmodelName等で代用か、別途取得が必要
-        })
+        }
+        for note, (front, back) in zip(notes, converted)
+    ]
+
+# GET /cards のレスポンスに含められるキー
+CARD_FIELDS = ("id", "front", "back", "tags", "deckName")
+MAX_PAGE_SIZE = 1000
+# ストリーミング時に notesInfo を取得・変換する単位 (小さいほど最初のカードが早く届く)
+STREAM_CHUNK_SIZE = 100
+
+def parse_fields(fields: Optional[str]):
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in CARD_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+def select_cards(entries, projection):
+    """(mod, card) のリストにフィールド射影を適用する"""
+    return [{k: card[k] for k in projection} if projection else card for _, card in entries]
+
+async def filter_modified_since(client, note_ids, modified_since: int):
+    """
+    edited:N は日単位なので、notesModTime で秒単位に絞り込む (昇順のまま返す)
+    総件数・ページング・カーソルが返すカードと一致するよう、ページに分ける前に呼ぶ
+    """
+    if not note_ids:
+        return note_ids
+    mod_times = await client.invoke('notesModTime', notes=note_ids)
+    if mod_times is None:
+        raise HTTPException(status_code=502, detail="Failed to get note modification times from Anki")
+    mods = {m['noteId']: m['mod'] for m in mod_times}
+    return [nid for nid in note_ids if mods.get(nid, -1) >= modified_since]
 
+@app.get("/cards", response_model=List[dict])
+async def get_cards(
+    response: Response,
+    deck: Optional[str] = None,
+    tag: List[str] = Query(default=[], description="指定したタグをすべて持つカードに絞り込む"),
+    q: Optional[str] = Query(None, description="全フィールドを対象にしたテキスト検索"),
+    modified_since: Optional[int] = Query(None, description="この時刻 (epoch秒) 以降に更新されたカードに絞り込む"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="前のページの X-Next-Cursor (最後のノートID)"),
+    fields: Optional[str] = Query(None, description="返すキーをカンマ区切りで指定 (例: id,front,tags)"),
+    stream: bool = Query(False, description="NDJSON で1件ずつストリーミングする"),
+    client: AsyncAnkiConnectClient = Depends(get_client),
+    cache: NoteCache = Depends(get_note_cache),
+):
+    """
+    指定したデッキ（デフォルトはconfig設定）のカード一覧を取得します。
+    変換済みのカードはキャッシュし、Anki側で更新(mod)されたノートだけを取り直します。
+    タグ・テキスト・更新日時の絞り込みはAnkiの検索クエリとして実行し (更新日時は notesModTime で秒単位に絞り込む)、
+    ページング (offset/limit または cursor) は notesInfo の取得前に適用します。
+    総件数は X-Total-Count、次ページのカーソルは X-Next-Cursor ヘッダーで返します。
+    """
+    projection = parse_fields(fields)
+    query = build_query(
+        deck=deck or config.ANKI_DECK_NAME,
+        tags=tag,
+        text=q,
+        edited_days=edited_days_since(modified_since) if modified_since is not None else None,
+    )
+
+    # ノートIDは昇順で返るので、カーソルは「このID より後ろ」として扱う
+    note_ids = await cache.resolve(client, query)
+    if modified_since is not None:
+        note_ids = await filter_modified_since(client, note_ids, modified_since)
+    total = len(note_ids)
+    if cursor is not None:
+        note_ids = note_ids[bisect_right(note_ids, cursor):]
+    end = offset + limit if limit else None
+    page_ids = note_ids[offset:end]
+
+    headers = {"X-Total-Count": str(total)}
+    if end is not None and end < len(note_ids) and page_ids:
+        headers["X-Next-Cursor"] = str(page_ids[-1])
+
+    if stream:
+        async def generate():
+            async for entries in cache.iter_chunks(client, page_ids, chunk_size=STREAM_CHUNK_SIZE):
+                for card in select_cards(entries, projection):
+                    yield json.dumps(card, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson", headers=headers)
+
+    cards = []
+    async for entries in cache.iter_chunks(client, page_ids):
+        cards.extend(select_cards(entries, projection))
+
+    response.headers.update(headers)
     return cards
 
+@app.get("/cards/search", response_model=List[dict])
+async def search_cards(
+    response: Response,
+    q: str = Query(..., min_length=1, description="検索語 (空白区切りですべてを含むカード)"),
+    deck: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    client: AsyncAnkiConnectClient = Depends(get_client),
+    index: CardSearchIndex = Depends(get_search_index),
+):
+    """
+    カードの表面・裏面 (Markdown) とタグを全文検索し、一致度の高い順に返します。
+    ローカルの SQLite FTS5 インデックスを検索し、Anki 側で追加・更新・削除されたノートだけを取り込みます。
+    各カードには一致箇所を <mark> で囲んだ snippet と score を含め、総件数は X-Total-Count ヘッダーで返します。
+    """
+    scope = deck or config.ANKI_DECK_NAME
+    try:
+        await index.refresh(client, scope, deck_query(scope))
+    except Exception as e:
+        # Anki に接続できない場合は、インデックス済みの内容から検索する
+        print(f"⚠️ Failed to refresh search index: {e}")
+
+    total, hits = await index.search_async(scope, q, offset=offset, limit=limit)
+    response.headers["X-Total-Count"] = str(total)
+    return hits
+
+async def index_cards(index, entries):
+    """
+    (ノートID, 表面HTML, 裏面HTML, タグ, デッキ名) のリストを検索インデックスに反映する
+    refresh (notes_to_cards) と同じく Anki に送った HTML を Markdown に戻したものを登録する
+    """
+    if not entries:
+        return
+    markdown = await bulk_html_to_markdown_async([html for entry in entries for html in entry[1:3]])
+    for i, (note_id, _, _, tags, deck_name) in enumerate(entries):
+        await index.upsert_async(note_id, markdown[i * 2], markdown[i * 2 + 1], tags, deck_name=deck_name)
+
 @app.post("/cards")
-def create_card(card: CardRequest):
+async def create_card(
+    card: CardRequest,
+    client: AsyncAnkiConnectClient = Depends(get_client),
+    cache: NoteCache = Depends(get_note_cache),
+    index: CardSearchIndex = Depends(get_search_index),
+):
     """
     新規カードをAnkiに登録します。
     Markdown形式のテキストを受け取り、HTMLに変換して登録します。
     """
-    client = get_client()
     target_deck = card.deck_name or config.ANKI_DECK_NAME
+    # 変換はスレッドで行う (イベントループをブロックしない)
+    front_html, back_html = await bulk_markdown_to_html_async([card.front, card.back])
 
     note = {
         "deckName": target_deck,
         "modelName": config.ANKI_MODEL_NAME,
         "fields": {
-            config.FIELD_FRONT: markdown_to_html(card.front),
-            config.FIELD_BACK: markdown_to_html(card.back)
+            config.FIELD_FRONT: front_html,
+            config.FIELD_BACK: back_html
         },
         "tags": card.tags
     }
 
-    new_id = client.invoke("addNote", note=note)
+    new_id = await client.invoke("addNote", note=note)
 
     if not new_id:
         raise HTTPException(status_code=500, detail="Failed to create card in Anki")
 
+    cache.invalidate(new_id)
+    await index_cards(index, [(new_id, front_html, back_html, card.tags, target_deck)])
+
     return {"id": new_id, "message": "Card created successfully"}
 
+# POST /cards/bulk で一度に受け付ける最大件数
+MAX_BULK_CARDS = 1000
+# canAddNotes / addNotes の1アクションあたりのノート数
+BULK_ADD_CHUNK_SIZE = 100
+
+@app.post("/cards/bulk", response_model=BulkCardResponse)
+async def create_cards_bulk(
+    request: BulkCardRequest,
+    client: AsyncAnkiConnectClient = Depends(get_client),
+    cache: NoteCache = Depends(get_note_cache),
+    index: CardSearchIndex = Depends(get_search_index),
+):
+    """
+    複数のカードをまとめてAnkiに登録します。
+    Markdownの変換は一括で行い、重複チェック (canAddNotes) と登録 (addNotes) は
+    チャンクに分けた multi でまとめて実行します。結果はリクエストの順に、カードごとのIDまたはエラーで返します。
+    """
+    cards = request.cards
+    if len(cards) > MAX_BULK_CARDS:
+        raise HTTPException(status_code=400, detail=f"Too many cards (max {MAX_BULK_CARDS})")
+
+    # 1. Markdown -> HTML (表面・裏面を交互に並べて一括変換)
+    texts = [text for card in cards for text in (card.front, card.back)]
+    converted = await bulk_markdown_to_html_async(texts)
+    notes = [
+        {
+            "deckName": card.deck_name or config.ANKI_DECK_NAME,
+            "modelName": config.ANKI_MODEL_NAME,
+            "fields": {
+                config.FIELD_FRONT: converted[i * 2],
+                config.FIELD_BACK: converted[i * 2 + 1],
+            },
+            "tags": card.tags,
+        }
+        for i, card in enumerate(cards)
+    ]
+    results = [BulkCardResult(index=i) for i in range(len(notes))]
+
+    # canAddNotes は既存のノートとしか比べず、addNotes は1件でも重複するとチャンク全体が失敗するため、
+    # リクエスト内で表面が同じカードは先に出てきたものだけを登録する
+    first_index = {}
+    candidates = []
+    for i, note in enumerate(notes):
+        key = normalize_front(note["fields"][config.FIELD_FRONT])
+        if key in first_index:
+            results[i].error = f"Duplicate of card {first_index[key]} in this request"
+        else:
+            first_index[key] = i
+            candidates.append(i)
+    chunks = [candidates[i:i + BULK_ADD_CHUNK_SIZE] for i in range(0, len(candidates), BULK_ADD_CHUNK_SIZE)]
+
+    # 2. 重複・不正なノートを事前チェック
+    batch = client.batch()
+    checks = [(indexes, batch.add("canAddNotes", notes=[notes[i] for i in indexes])) for indexes in chunks]
+    await batch.flush()
+
+    addable = []
+    for indexes, check in checks:
+        if not check.ok:
+            for i in indexes:
+                results[i].error = f"canAddNotes failed: {check.error}"
+            continue
+        for i, can_add in zip(indexes, check.result):
+            if can_add:
+                addable.append(i)
+            else:
+                results[i].error = "Duplicate or invalid note"
+
+    # 3. 登録可能なノートのみ addNotes
+    adds = []
+    for start in range(0, len(addable), BULK_ADD_CHUNK_SIZE):
+        indexes = addable[start:start + BULK_ADD_CHUNK_SIZE]
+        adds.append((indexes, batch.add("addNotes", notes=[notes[i] for i in indexes])))
+    await batch.flush()
+
+    added = []
+    for indexes, add in adds:
+        if not add.ok:
+            for i in indexes:
+                results[i].error = f"addNotes failed: {add.error}"
+            continue
+        for i, new_id in zip(indexes, add.result):
+            if new_id:
+                results[i].id = new_id
+                cache.invalidate(new_id)
+                added.append((new_id, converted[i * 2], converted[i * 2 + 1], cards[i].tags, notes[i]["deckName"]))
+            else:
+                # 古い AnkiConnect は失敗したノートを null で返す
+                results[i].error = "Failed to add note"
+    await index_cards(index, added)
+
+    created = sum(1 for r in results if r.id is not None)
+    return BulkCardResponse(created=created, failed=len(results) - created, results=results)
+
 @app.put("/cards/{note_id}")
-def update_card(note_id: int, card: CardRequest):
+async def update_card(
+    note_id: int,
+    card: CardRequest,
+    client: AsyncAnkiConnectClient = Depends(get_client),
+    cache: NoteCache = Depends(get_note_cache),
+    index: CardSearchIndex = Depends(get_search_index),
+):
     """
     既存のカードを更新します。
-    フィールドの更新とタグの更新を行います。
+    現在のノートと比べて変わったフィールド・タグだけを1回の multi で送信します
+    (何も変わっていなければ Anki のノートは更新しません)。
     """
-    client = get_client()
-
-    # 1. フィールド更新
-    note_fields = {
+    # 1. 現在のフィールドとタグを取得して差分を求める
+    current = await client.invoke("notesInfo", notes=[note_id])
+    if not current or not current[0]:
+        raise HTTPException(status_code=404, detail=f"Note {note_id} not found")
+    note = current[0]
+
+    front_html, back_html = await bulk_markdown_to_html_async([card.front, card.back])
+    fields = changed_note_fields(note, {
+        config.FIELD_FRONT: front_html,
+        config.FIELD_BACK: back_html
+    })
+    tags_to_add, tags_to_remove = diff_tags(note.get("tags", []), card.tags)
+
+    # 2. 必要な操作だけをまとめて送信する (multi 内のアクションは順番に実行される)
+    batch = client.batch()
+    update = batch.add("updateNoteFields", note={"id": note_id, "fields": fields}) if fields else None
+    tag_results = [
+        batch.add(action, **params)
+        for action, params in tag_operations(note_id, tags_to_add, tags_to_remove)
+    ]
+    result = {
         "id": note_id,
-        "fields": {
-            config.FIELD_FRONT: markdown_to_html(card.front),
-            config.FIELD_BACK: markdown_to_html(card.back)
-        },
+        "message": "Card updated successfully",
+        "updated_fields": list(fields),
+        "added_tags": tags_to_add,
+        "removed_tags": tags_to_remove,
     }
-    client.invoke("updateNoteFields", note=note_fields)
-
-    # 2. タグ更新 (現在のタグを取得 -> 全削除 -> 新規追加)
-    # AnkiConnectには 'updateNoteTags' が存在しないか動作が不明確な場合が多いため
-    # removeTags で全て消してから addTags するのが確実
-
-    current_info_list = client.invoke("notesInfo", notes=[note_id])
-    if current_info_list and len(current_info_list) > 0:
-        current_tags = current_info_list[0].get('tags', [])
-        # string space separated tags or list of strings?
-        # notesInfo returns list of strings for tags usually.
-
-        # 全削除 (スペース区切りの文字列で渡す必要がある場合もあるが、invokeの実装次第。
-        # AnkiConnect docs says removeTags takes 'tags' as a space-separated string or maybe list?)
-        # Let's try passing space-separated string of current tags
-        if current_tags:
-            client.invoke("removeTags", notes=[note_id], tags=" ".join(current_tags))
-
-        # 新規追加
-        if card.tags:
-            client.invoke("addTags", notes=[note_id], tags=" ".join(card.tags))
-
-    # 確認のため再度Infoを取得 (簡易的な成功チェック)
-    return {"id": note_id, "message": "Card updated successfully"}
+    if len(batch) == 0:
+        # 変更がなければ Anki もキャッシュもそのまま
+        return dict(result, message="Card is already up to date")
+    await batch.flush()
+
+    cache.invalidate(note_id)
+    if update is not None and not update.ok:
+        raise HTTPException(status_code=500, detail=f"Failed to update card in Anki: {update.error}")
+    failed = [r for r in tag_results if not r.ok]
+    if failed:
+        raise HTTPException(status_code=500, detail=f"Failed to update tags in Anki: {failed[0].error}")
+    await index_cards(index, [(note_id, front_html, back_html, card.tags, None)])
+    return result
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import argparse
+    from src.core.profiling import add_import_time_argument, report_import_time
+
+    parser = argparse.ArgumentParser(description="Run the forAnki API server")
+    add_import_time_argument(parser)
+    args = parser.parse_args()
+    if args.import_time:
+        report_import_time(__file__)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8000)
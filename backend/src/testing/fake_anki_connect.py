@@ -0,0 +1,428 @@
+"""
+Anki を起動せずにクライアント・サーバー・スクリプトを動かすための AnkiConnect の代わり
+ノートはメモリ上に持ち、よく使うアクションだけを本物と同じ形式で返す
+
+    with FakeAnkiConnectServer(FakeAnkiStore.populated(100_000), latency=0.002) as server:
+        client = AnkiConnectClient(server.url)
+
+コマンドラインからも起動できる: python -m src.testing.fake_anki_connect --notes 100000 --port 8765
+"""
+import argparse
+import json
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from instance import config
+
+DEFAULT_DECK_NAME = "Default"
+DEFAULT_MODEL_NAME = "基本"
+# Anki のノートIDはミリ秒のタイムスタンプ
+FIRST_NOTE_ID = 1_600_000_000_000
+
+# 検索語: -? (key:)? ("..." | 空白以外)
+_TERM_PATTERN = re.compile(r'(-?)"((?:[^"\\]|\\.)*)"|(-?)(\S+)')
+_KEY_PATTERN = re.compile(r'^(\w+):(.*)$', re.DOTALL)
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+class FakeAnkiError(Exception):
+    """AnkiConnect の error として返すエラー"""
+
+
+def _pattern(value, exact):
+    """Anki の検索値 (* と _ がワイルドカード、\\ でエスケープ) を正規表現にする"""
+    parts = []
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch == "\\" and i + 1 < len(value):
+            parts.append(re.escape(value[i + 1]))
+            i += 2
+            continue
+        parts.append(".*" if ch == "*" else "." if ch == "_" else re.escape(ch))
+        i += 1
+    body = "".join(parts)
+    return re.compile(f"^{body}$" if exact else body, re.IGNORECASE | re.DOTALL)
+
+
+class FakeAnkiStore:
+    """メモリ上のノートストア (スレッドセーフ)"""
+    def __init__(self, model_name=None, fields=None):
+        self.model_name = model_name or config.ANKI_MODEL_NAME or DEFAULT_MODEL_NAME
+        self.fields = list(fields or (config.FIELD_FRONT, config.FIELD_BACK))
+        self.decks = {DEFAULT_DECK_NAME}
+        self.notes = {}
+        # 重複チェック用: (ノートタイプ, 最初のフィールド) -> ノート数
+        # (本物の Anki と同じく、重複はデッキではなくノートタイプごとに判定する)
+        self._first_fields = Counter()
+        self._next_id = FIRST_NOTE_ID
+        self._lock = threading.RLock()
+
+    @classmethod
+    def populated(cls, note_count, deck_name=None, tag_count=10, seed=0, **kwargs):
+        """note_count 件のノートを deck_name に作成したストア"""
+        store = cls(**kwargs)
+        deck_name = deck_name or config.ANKI_DECK_NAME or DEFAULT_DECK_NAME
+        rng = random.Random(seed)
+        now = int(time.time())
+        store.decks.add(deck_name)
+        for i in range(note_count):
+            front, back = store.fields[0], store.fields[1]
+            store._insert(
+                deck_name,
+                {front: f"<b>Question {i}</b>", back: f"<div>Answer {i}</div><ul><li>item {i}</li></ul>"},
+                [f"tag{i % tag_count}"] if tag_count else [],
+                mod=now - rng.randrange(0, 365 * 86400),
+            )
+        return store
+
+    def _insert(self, deck_name, fields, tags, mod=None):
+        note_id = self._next_id
+        self._next_id += 1
+        self.notes[note_id] = {
+            "noteId": note_id,
+            "deckName": deck_name,
+            "modelName": self.model_name,
+            "tags": list(tags),
+            "fields": {
+                name: {"value": fields.get(name, ""), "order": order}
+                for order, name in enumerate(self.fields)
+            },
+            "mod": int(time.time()) if mod is None else mod,
+            "cards": [note_id + 1],
+        }
+        self._first_fields[self._first_key(self.notes[note_id])] += 1
+        return note_id
+
+    def _first_key(self, note):
+        return (note["modelName"], _first_field_key(note["fields"][self.fields[0]]["value"]))
+
+    def _note(self, note_id):
+        note = self.notes.get(note_id)
+        if note is None:
+            raise FakeAnkiError(f"note was not found: {note_id}")
+        return note
+
+    def _touch(self, note):
+        note["mod"] = max(note["mod"] + 1, int(time.time()))
+
+    # --- 検索 ---
+
+    def _matcher(self, term):
+        match = _KEY_PATTERN.match(term)
+        key, value = (match.group(1).lower(), match.group(2)) if match else (None, term)
+        if term == "*":
+            return lambda note: True
+        if key == "deck":
+            if value == "*":
+                return lambda note: True
+            pattern = _pattern(value, exact=True)
+            return lambda note: any(
+                pattern.match(name) for name in _hierarchy(note["deckName"])
+            )
+        if key == "tag":
+            pattern = _pattern(value, exact=True)
+            return lambda note: any(
+                pattern.match(part) for tag in note["tags"] for part in _hierarchy(tag)
+            )
+        if key == "note":
+            pattern = _pattern(value, exact=True)
+            return lambda note: bool(pattern.match(note["modelName"]))
+        if key == "nid":
+            ids = {int(i) for i in value.split(",") if i}
+            return lambda note: note["noteId"] in ids
+        if key == "edited":
+            cutoff = time.time() - int(value) * 86400
+            return lambda note: note["mod"] >= cutoff
+        if key in {name.lower() for name in self.fields}:
+            field = next(name for name in self.fields if name.lower() == key)
+            pattern = _pattern(value, exact=True)
+            return lambda note: bool(pattern.match(note["fields"][field]["value"]))
+
+        # 通常の検索語はいずれかのフィールドの部分一致 (HTML タグは無視)
+        pattern = _pattern(term, exact=False)
+        return lambda note: any(
+            pattern.search(_TAG_PATTERN.sub("", field["value"])) for field in note["fields"].values()
+        )
+
+    def find_notes(self, query):
+        matchers = []
+        for negate_quoted, quoted, negate, bare in _TERM_PATTERN.findall(query or ""):
+            term = quoted if quoted or negate_quoted else bare
+            negated = bool(negate_quoted or negate)
+            matcher = self._matcher(term)
+            matchers.append((lambda note, m=matcher: not m(note)) if negated else matcher)
+        with self._lock:
+            return [
+                note_id for note_id, note in self.notes.items()
+                if all(m(note) for m in matchers)
+            ]
+
+    # --- アクション ---
+
+    def handle(self, action, params):
+        method = getattr(self, f"_action_{action}", None)
+        if method is None:
+            raise FakeAnkiError("unsupported action")
+        with self._lock:
+            return method(**params)
+
+    def _action_version(self):
+        return 6
+
+    def _action_deckNames(self):
+        return sorted(self.decks)
+
+    def _action_createDeck(self, deck):
+        self.decks.add(deck)
+        return 1
+
+    def _action_findNotes(self, query):
+        return self.find_notes(query)
+
+    def _action_notesInfo(self, notes):
+        # 存在しないIDには空のオブジェクトを返す (本物と同じ)
+        # deckName は本物の notesInfo には含まれないため返さない (デッキは findNotes の deck: で調べる)
+        result = []
+        for i in notes:
+            note = self.notes.get(i)
+            if note is None:
+                result.append({})
+                continue
+            info = {key: value for key, value in note.items() if key != "deckName"}
+            info["tags"] = list(note["tags"])
+            info["fields"] = {name: dict(field) for name, field in note["fields"].items()}
+            result.append(info)
+        return result
+
+    def _action_notesModTime(self, notes):
+        return [{"noteId": i, "mod": self.notes[i]["mod"]} for i in notes if i in self.notes]
+
+    def _check_note(self, note):
+        if note.get("deckName") not in self.decks:
+            raise FakeAnkiError("deck was not found: {}".format(note.get("deckName")))
+        if note.get("modelName") != self.model_name:
+            raise FakeAnkiError("model was not found: {}".format(note.get("modelName")))
+        fields = note.get("fields", {})
+        first = fields.get(self.fields[0], "")
+        if not first.strip():
+            raise FakeAnkiError("cannot create note because it is empty")
+        options = note.get("options", {})
+        if not options.get("allowDuplicate", False) and self._is_duplicate(note["deckName"], first, options):
+            raise FakeAnkiError("cannot create note because it is a duplicate")
+
+    def _is_duplicate(self, deck_name, first, options):
+        key = (self.model_name, _first_field_key(first))
+        if options.get("duplicateScope") != "deck":
+            return self._first_fields[key] > 0
+        # duplicateScope: "deck" の場合は同じデッキ (サブデッキを含む) の中だけで判定する
+        return any(
+            self._first_key(other) == key and deck_name in _hierarchy(other["deckName"])
+            for other in self.notes.values()
+        )
+
+    def _action_addNote(self, note):
+        self._check_note(note)
+        return self._insert(note["deckName"], note.get("fields", {}), note.get("tags", []))
+
+    def _action_addNotes(self, notes):
+        # 本物の AnkiConnect と同じく、1件でも失敗するとエラー一覧で全体が失敗する
+        # (失敗したノート以外は追加されたまま)
+        result = []
+        errors = []
+        for note in notes:
+            try:
+                result.append(self._action_addNote(note))
+            except FakeAnkiError as e:
+                errors.append(str(e))
+        if errors:
+            raise FakeAnkiError(str(errors))
+        return result
+
+    def _action_canAddNotes(self, notes):
+        result = []
+        for note in notes:
+            try:
+                self._check_note(note)
+                result.append(True)
+            except FakeAnkiError:
+                result.append(False)
+        return result
+
+    def _action_updateNoteFields(self, note):
+        target = self._note(note["id"])
+        self._first_fields[self._first_key(target)] -= 1
+        for name, value in note.get("fields", {}).items():
+            if name in target["fields"]:
+                target["fields"][name]["value"] = value
+        if "tags" in note:
+            target["tags"] = list(note["tags"])
+        self._first_fields[self._first_key(target)] += 1
+        self._touch(target)
+        return None
+
+    def _action_addTags(self, notes, tags):
+        for note_id in notes:
+            note = self._note(note_id)
+            for tag in tags.split():
+                if tag not in note["tags"]:
+                    note["tags"].append(tag)
+            self._touch(note)
+        return None
+
+    def _action_removeTags(self, notes, tags):
+        removed = {tag.lower() for tag in tags.split()}
+        for note_id in notes:
+            note = self._note(note_id)
+            note["tags"] = [tag for tag in note["tags"] if tag.lower() not in removed]
+            self._touch(note)
+        return None
+
+    def _action_deleteNotes(self, notes):
+        for note_id in notes:
+            note = self.notes.pop(note_id, None)
+            if note is not None:
+                self._first_fields[self._first_key(note)] -= 1
+        return None
+
+    def _action_multi(self, actions):
+        return [self.invoke(a.get("action"), a.get("params", {})) for a in actions]
+
+    def invoke(self, action, params=None):
+        """1アクションを実行し、AnkiConnect のレスポンス形式 ({"result", "error"}) で返す"""
+        try:
+            return {"result": self.handle(action, params or {}), "error": None}
+        except FakeAnkiError as e:
+            return {"result": None, "error": str(e)}
+        except (KeyError, TypeError) as e:
+            return {"result": None, "error": f"invalid params: {e}"}
+
+
+def _first_field_key(value):
+    """重複判定に使う最初のフィールドの値 (Anki と同じく HTML タグと前後の空白を無視する)"""
+    return _TAG_PATTERN.sub("", value).strip()
+
+def _hierarchy(name):
+    """"A::B::C" -> ["A::B::C", "A::B", "A"] (デッキ・タグは親の指定でも一致する)"""
+    parts = name.split("::")
+    return ["::".join(parts[:i]) for i in range(len(parts), 0, -1)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # ヘッダーと本文を別々に送るため、Nagle で遅延しないようにする
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server.fake
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            action = request.get("action")
+            server.record(action, request.get("params", {}))
+            if server.latency:
+                time.sleep(server.latency)
+            response = server.store.invoke(action, request.get("params", {}))
+        except ValueError as e:
+            response = {"result": None, "error": f"invalid request: {e}"}
+
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeAnkiConnectServer:
+    """
+    FakeAnkiStore を HTTP で公開する AnkiConnect 互換サーバー (別スレッドで動く)
+    latency: 1リクエストごとに待つ秒数 (本物の Anki の応答時間を模擬する)
+    """
+    def __init__(self, store=None, host="127.0.0.1", port=0, latency=0.0):
+        self.store = store or FakeAnkiStore()
+        self.latency = latency
+        self.requests = 0
+        # 実行されたアクションの回数 (multi の中身も数える)
+        self.actions = Counter()
+        self._stats_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, action, params):
+        with self._stats_lock:
+            self.requests += 1
+            self.actions[action] += 1
+            if action == "multi":
+                for a in params.get("actions", []):
+                    self.actions[a.get("action")] += 1
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.requests = 0
+            self.actions.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def serve_forever(self):
+        """現在のスレッドで動かす (Ctrl+C で終了)"""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake AnkiConnect server backed by an in-memory note store")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--notes", type=int, default=1000, help="Number of notes to create")
+    parser.add_argument("--deck", type=str, default=None, help="Deck for the generated notes")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait per request")
+    args = parser.parse_args()
+
+    store = FakeAnkiStore.populated(args.notes, args.deck)
+    server = FakeAnkiConnectServer(store, args.host, args.port, args.latency)
+    print(f"🧪 Fake AnkiConnect: {server.url} ({len(store.notes)} 件)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 終了します。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# scripts と同じく backend ディレクトリを import のルートにする
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from instance import config
+from src.testing.fake_anki_connect import FakeAnkiConnectServer, FakeAnkiStore
+
+DECK = "Test"
+MODEL = "Basic"
+FIELDS = ("Front", "Back")
+
+
+@pytest.fixture
+def anki_config(monkeypatch, tmp_path):
+    """テスト用の Anki の設定 (.env の内容に左右されないようにする)"""
+    monkeypatch.setattr(config, "ANKI_DECK_NAME", DECK)
+    monkeypatch.setattr(config, "ANKI_MODEL_NAME", MODEL)
+    monkeypatch.setattr(config, "FIELD_FRONT", FIELDS[0])
+    monkeypatch.setattr(config, "FIELD_BACK", FIELDS[1])
+    monkeypatch.setattr(config, "SEARCH_INDEX_PATH", str(tmp_path / "search_index.sqlite3"))
+    return config
+
+
+@pytest.fixture
+def store(anki_config):
+    store = FakeAnkiStore(model_name=MODEL, fields=FIELDS)
+    store.decks.add(DECK)
+    return store
+
+
+@pytest.fixture
+def fake_anki(store, anki_config, monkeypatch):
+    """store を公開する Fake AnkiConnect サーバー (config.ANKI_CONNECT_URL も向け直す)"""
+    with FakeAnkiConnectServer(store) as server:
+        monkeypatch.setattr(config, "ANKI_CONNECT_URL", server.url)
+        yield server
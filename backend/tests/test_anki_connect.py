@@ -0,0 +1,77 @@
+from src.clients.anki_connect import AnkiConnectClient
+
+
+def note(front, deck="Test", back="answer", tags=(), **options):
+    data = {"deckName": deck, "modelName": "Basic", "fields": {"Front": front, "Back": back}, "tags": list(tags)}
+    if options:
+        data["options"] = options
+    return data
+
+
+def make_client(fake_anki, **kwargs):
+    return AnkiConnectClient(fake_anki.url, **kwargs)
+
+
+def test_invoke_and_errors(fake_anki):
+    client = make_client(fake_anki)
+    note_id = client.invoke("addNote", note=note("q"))
+    assert client.invoke("findNotes", query='"deck:Test"') == [note_id]
+    # AnkiConnect のエラーは None になる
+    assert client.invoke("addNote", note=note("q")) is None
+    client.close()
+
+
+def test_batch_sends_one_multi_and_keeps_per_action_errors(fake_anki):
+    client = make_client(fake_anki)
+    batch = client.batch()
+    added = batch.add("addNote", note=note("q1"))
+    duplicate = batch.add("addNote", note=note("q1"))
+    found = batch.add("findNotes", query='"deck:Test"')
+    batch.flush()
+
+    assert fake_anki.requests == 1
+    assert added.ok and duplicate.error and not duplicate.ok
+    assert found.result == [added.result]
+    client.close()
+
+
+def test_batch_splits_at_max_batch_size(fake_anki):
+    client = make_client(fake_anki, max_batch_size=2)
+    results = client.invoke_multi([("addNote", {"note": note(f"q{i}")}) for i in range(5)])
+    assert fake_anki.actions["multi"] == 3
+    assert all(r.ok for r in results)
+    client.close()
+
+
+def test_notes_info_chunks_and_iter_notes_info(fake_anki, store):
+    ids = [store._insert("Test", {"Front": f"q{i}", "Back": "a"}, []) for i in range(25)]
+    client = make_client(fake_anki)
+
+    notes = client.notes_info(ids + [1], chunk_size=10)
+    # 存在しないノートは除いて、順序どおりに返す
+    assert [n["noteId"] for n in notes] == ids
+    assert fake_anki.actions["notesInfo"] == 3 and fake_anki.actions["multi"] == 1
+
+    batches = list(client.iter_notes_info(ids, batch_size=10))
+    assert [len(b) for b in batches] == [10, 10, 5]
+    assert [n["noteId"] for b in batches for n in b] == ids
+    client.close()
+
+
+def test_fake_matches_real_anki_connect(fake_anki):
+    client = make_client(fake_anki)
+    store_deck = client.invoke("createDeck", deck="Other")
+    assert store_deck
+    note_id = client.invoke("addNote", note=note("<b>q</b>"))
+
+    # notesInfo には deckName が含まれない
+    assert "deckName" not in client.invoke("notesInfo", notes=[note_id])[0]
+    # 重複はデッキではなくノートタイプごと (HTML タグは無視) に判定する
+    assert client.invoke("canAddNotes", notes=[note("q", deck="Other"), note(" q ")]) == [False, False]
+    assert client.invoke("canAddNotes", notes=[note("q", deck="Other", duplicateScope="deck")]) == [True]
+    # addNotes は1件でも失敗すると、null ではなくエラーで全体が失敗する
+    batch = client.batch()
+    added = batch.add("addNotes", notes=[note("new"), note("q")])
+    batch.flush()
+    assert not added.ok and "duplicate" in added.error
+    client.close()
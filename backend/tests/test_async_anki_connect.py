@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import time
+
+from src.clients.async_anki_connect import AsyncAnkiConnectClient
+from src.core import converter
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_batch_chunks_are_sent_in_order(fake_anki, store):
+    events = []
+    invoke = store.invoke
+
+    def slow_invoke(action, params=None):
+        events.append(("start", action))
+        if action == "multi":
+            time.sleep(0.05)
+        result = invoke(action, params)
+        events.append(("end", action))
+        return result
+
+    store.invoke = slow_invoke
+    note_id = store.invoke("addNote", {"note": {
+        "deckName": "Test", "modelName": "Basic", "fields": {"Front": "q", "Back": "a"}, "tags": ["a"],
+    }})["result"]
+    events.clear()
+
+    async def main():
+        client = AsyncAnkiConnectClient(fake_anki.url, max_batch_size=1)
+        try:
+            batch = client.batch()
+            batch.add("removeTags", notes=[note_id], tags="a")
+            batch.add("addTags", notes=[note_id], tags="a")
+            return await batch.flush()
+        finally:
+            await client.aclose()
+
+    results = run(main())
+    assert all(r.ok for r in results)
+    # 1つ目の multi が終わってから2つ目を送る
+    assert [kind for kind, action in events if action == "multi"] == ["start", "end", "start", "end"]
+    assert store.notes[note_id]["tags"] == ["a"]
+
+
+def test_small_conversion_runs_off_the_event_loop():
+    threads = []
+
+    def convert_chunk(items):
+        threads.append(threading.get_ident())
+        return [item.upper() for item in items]
+
+    async def main():
+        return await converter._bulk_convert_async(convert_chunk, ["a", "b"]), threading.get_ident()
+
+    result, loop_thread = run(main())
+    assert result == ["A", "B"]
+    assert threads and threads[0] != loop_thread
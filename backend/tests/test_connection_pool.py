@@ -0,0 +1,118 @@
+import http.client
+import socket
+import threading
+import time
+
+import pytest
+
+from src.clients.anki_connect import is_read_only
+from src.clients.connection_pool import HTTPConnectionPool
+
+
+class ScriptedServer:
+    """
+    受け取ったリクエストを数え、behavior(n) に従って応答する HTTP サーバー (n は通算のリクエスト番号)
+    "ok": Keep-Alive で応答 / "drop": 応答せずに切断 (実行後に切れた場合を再現) / "close": 応答してから切断
+    """
+    def __init__(self, behavior):
+        self.behavior = behavior
+        self.requests = 0
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen()
+        self.url = f"http://127.0.0.1:{self._sock.getsockname()[1]}/"
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        reader = conn.makefile("rb")
+        with conn, reader:
+            while True:
+                length = None
+                line = reader.readline()
+                if not line:
+                    return
+                while line not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                    line = reader.readline()
+                reader.read(length or 0)
+                self.requests += 1
+                action = self.behavior(self.requests)
+                if action == "drop":
+                    return
+                body = b'{"result": 1, "error": null}'
+                conn.sendall(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                if action == "close":
+                    return
+
+    def close(self):
+        self._sock.close()
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def make(behavior):
+        server = ScriptedServer(behavior)
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.close()
+
+
+def test_write_is_not_resent_when_connection_drops_after_sending(make_server):
+    server = make_server(lambda n: "drop" if n == 2 else "ok")
+    pool = HTTPConnectionPool(server.url)
+    assert pool.post(b"{}") is not None
+
+    with pytest.raises(http.client.RemoteDisconnected):
+        pool.post(b"{}", idempotent=False)
+    # サーバーが受け取った (= 実行した可能性がある) のは1回だけ
+    assert server.requests == 2
+    pool.close()
+
+
+def test_read_only_request_is_resent_on_new_connection(make_server):
+    server = make_server(lambda n: "drop" if n == 2 else "ok")
+    pool = HTTPConnectionPool(server.url)
+    pool.post(b"{}")
+
+    assert pool.post(b"{}", idempotent=True) == b'{"result": 1, "error": null}'
+    assert server.requests == 3
+    pool.close()
+
+
+def test_idle_connection_closed_by_server_is_not_reused(make_server):
+    server = make_server(lambda n: "close" if n == 1 else "ok")
+    pool = HTTPConnectionPool(server.url)
+    pool.post(b"{}")
+    # 待機中にサーバー側のタイムアウトで切断された状態にする
+    time.sleep(0.1)
+    # サーバーが閉じた接続は捨て、書き込みも1回だけ送る
+    assert pool.post(b"{}", idempotent=False) is not None
+    assert server.requests == 2
+    pool.close()
+
+
+def test_is_read_only():
+    assert is_read_only({"action": "findNotes", "params": {}})
+    assert not is_read_only({"action": "addNote", "params": {}})
+    multi = {"action": "multi", "params": {"actions": [{"action": "notesInfo"}, {"action": "addTags"}]}}
+    assert not is_read_only(multi)
+    multi["params"]["actions"].pop()
+    assert is_read_only(multi)
@@ -0,0 +1,126 @@
+import os
+import runpy
+import sys
+
+import pytest
+
+from instance import config
+from src.clients.anki_connect import close_shared_client
+from src.core.export_manifest import ExportManifest
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture
+def output_dir(fake_anki, monkeypatch, tmp_path):
+    directory = tmp_path / "vault"
+    monkeypatch.setattr(config, "OUTPUT_DIR", str(directory))
+    # 共有クライアントは最初に作った時の URL を使い続けるため、テストごとに作り直す
+    close_shared_client()
+    yield directory
+    close_shared_client()
+
+
+def run_export(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["export.py", *args])
+    runpy.run_path(os.path.join(BACKEND_DIR, "scripts", "export.py"), run_name="__main__")
+
+
+def add_note(store, deck, front):
+    store.decks.add(deck)
+    return store._insert(deck, {"Front": front, "Back": "answer"}, [])
+
+
+def exported_files(directory):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/")
+        for root, _, names in os.walk(directory) for name in names if name.endswith(".md")
+    )
+
+
+def test_second_deck_does_not_delete_first_decks_files(output_dir, store, monkeypatch):
+    a_ids = [add_note(store, "A", f"a{i}") for i in range(3)]
+    b_id = add_note(store, "B", "b0")
+
+    run_export(monkeypatch, "--deck", "A")
+    run_export(monkeypatch, "--deck", "B")
+    assert exported_files(output_dir) == sorted(
+        [f"a{i}_{nid}.md" for i, nid in enumerate(a_ids)] + [f"b0_{b_id}.md"]
+    )
+
+    # A から消えたノートだけが、次の A のエクスポートで削除される
+    store.invoke("deleteNotes", {"notes": [a_ids[0]]})
+    run_export(monkeypatch, "--deck", "B")
+    assert f"a0_{a_ids[0]}.md" in exported_files(output_dir)
+    run_export(monkeypatch, "--deck", "A")
+    assert f"a0_{a_ids[0]}.md" not in exported_files(output_dir)
+    assert len(exported_files(output_dir)) == 3
+
+
+def test_note_moved_to_another_exported_deck_is_kept(output_dir, store, monkeypatch):
+    note_id = add_note(store, "A", "moved")
+    stay_id = add_note(store, "A", "stay")
+    run_export(monkeypatch, "--deck", "A")
+
+    store.notes[note_id]["deckName"] = "B"
+    store.decks.add("B")
+    run_export(monkeypatch, "--deck", "B")
+    run_export(monkeypatch, "--deck", "A")
+    assert exported_files(output_dir) == [f"moved_{note_id}.md", f"stay_{stay_id}.md"]
+    assert ExportManifest.load(str(output_dir)).get(note_id)["scopes"] == ["deck:B"]
+
+
+def test_unchanged_notes_are_skipped(output_dir, store, monkeypatch, capsys):
+    add_note(store, "Test", "q")
+    run_export(monkeypatch)
+    capsys.readouterr()
+    run_export(monkeypatch)
+    assert "前回から変更のない 1 件" in capsys.readouterr().out
+
+
+def test_switching_layout_is_rejected(output_dir, store, monkeypatch, capsys):
+    parent_id = add_note(store, "Test", "default")
+    child_id = add_note(store, "Parent::Child", "child")
+
+    run_export(monkeypatch, "--all-decks")
+    tree = [f"Parent/Child/child_{child_id}.md", f"Test/default_{parent_id}.md"]
+    assert exported_files(output_dir) == tree
+
+    # 単一デッキ (フォルダ分けなし) のエクスポートは受け付けず、ファイルも動かさない
+    capsys.readouterr()
+    run_export(monkeypatch)
+    assert "❌" in capsys.readouterr().out
+    assert exported_files(output_dir) == tree
+
+
+def test_failed_deck_lookup_does_not_delete(output_dir, store, monkeypatch):
+    a_id = add_note(store, "A", "a")
+    b_id = add_note(store, "B", "b")
+    run_export(monkeypatch, "--deck", "A", "--deck", "B")
+
+    invoke = store.invoke
+
+    def failing_invoke(action, params=None):
+        if action == "findNotes" and "deck:B" in params["query"]:
+            return {"result": None, "error": "collection is not available"}
+        return invoke(action, params)
+
+    monkeypatch.setattr(store, "invoke", failing_invoke)
+    run_export(monkeypatch, "--deck", "A", "--deck", "B")
+    assert exported_files(output_dir) == [f"A/a_{a_id}.md", f"B/b_{b_id}.md"]
+
+
+def test_changed_notes_are_rewritten_and_renamed(output_dir, store, monkeypatch):
+    keep_id = add_note(store, "Test", "keep")
+    edit_id = add_note(store, "Test", "edit")
+    run_export(monkeypatch)
+    keep_path = output_dir / f"keep_{keep_id}.md"
+    keep_mtime = os.stat(keep_path).st_mtime_ns
+
+    store.invoke("updateNoteFields", {"note": {"id": edit_id, "fields": {"Front": "renamed", "Back": "new"}}})
+    run_export(monkeypatch)
+
+    assert exported_files(output_dir) == sorted([f"keep_{keep_id}.md", f"renamed_{edit_id}.md"])
+    assert "new" in (output_dir / f"renamed_{edit_id}.md").read_text(encoding="utf-8")
+    # 変更のないノートのファイルは書き込まない
+    assert os.stat(keep_path).st_mtime_ns == keep_mtime
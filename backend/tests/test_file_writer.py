@@ -0,0 +1,48 @@
+import os
+import stat
+
+from src.core import file_writer
+from src.core.file_writer import FileWriter, replace_file, write_text_atomic
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_file_gets_umask_permissions(tmp_path):
+    path = tmp_path / "new.md"
+    assert write_text_atomic(str(path), "text")
+    assert mode(path) == file_writer.NEW_FILE_MODE
+
+
+def test_existing_file_keeps_its_permissions(tmp_path):
+    path = tmp_path / "note.md"
+    path.write_text("old", encoding="utf-8")
+    os.chmod(path, 0o640)
+    assert write_text_atomic(str(path), "new")
+    assert path.read_text(encoding="utf-8") == "new"
+    assert mode(path) == 0o640
+
+
+def test_unchanged_content_is_not_written(tmp_path):
+    path = tmp_path / "note.md"
+    write_text_atomic(str(path), "same")
+    assert not write_text_atomic(str(path), "same")
+    # 一時ファイルは残らない
+    assert os.listdir(tmp_path) == ["note.md"]
+
+
+def test_replace_file_and_writer(tmp_path):
+    old = tmp_path / "old.md"
+    old.write_text("a", encoding="utf-8")
+    assert replace_file(str(tmp_path / "new.md"), "b", str(old))
+    assert os.listdir(tmp_path) == ["new.md"]
+
+    done = []
+    with FileWriter(max_workers=2, on_done=done.append) as writer:
+        for i in range(20):
+            writer.write(str(tmp_path / f"{i}.md"), str(i), key=i)
+        writer.remove(str(tmp_path / "new.md"), key="removed")
+    # 追加した順に通知される
+    assert [op.key for op in done] == list(range(20)) + ["removed"]
+    assert all(op.ok and op.changed for op in done)
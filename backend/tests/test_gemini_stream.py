@@ -0,0 +1,44 @@
+import asyncio
+from types import SimpleNamespace
+
+from instance import config
+from src.clients.gemini import GeminiClient, chunk_text
+
+
+def make_chunk(*texts):
+    parts = [SimpleNamespace(text=text) for text in texts]
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))])
+
+
+# セーフティでブロックされたチャンク・終了理由だけのチャンク (parts がない)
+BLOCKED_CHUNK = SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[]), finish_reason=3)])
+EMPTY_CHUNK = SimpleNamespace(candidates=[])
+
+
+class StreamingModel:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        async def stream_chunks():
+            for chunk in self.chunks:
+                yield chunk
+        return stream_chunks()
+
+
+def test_chunk_text_skips_chunks_without_text():
+    assert chunk_text(make_chunk("a", "b")) == "ab"
+    assert chunk_text(BLOCKED_CHUNK) == ""
+    assert chunk_text(EMPTY_CHUNK) == ""
+
+
+def test_stream_skips_empty_chunks(monkeypatch):
+    monkeypatch.setattr(config, "GEMINI_CACHE_ENABLED", False)
+    client = GeminiClient()
+    client.api_key = "test"
+    client.model = StreamingModel([make_chunk('{"front": '), BLOCKED_CHUNK, make_chunk('"q"}'), EMPTY_CHUNK])
+
+    async def collect():
+        return [text async for text in client.stream_content_async("prompt", use_cache=False)]
+
+    assert asyncio.run(collect()) == ['{"front": ', '"q"}']
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+from src.core.response_cache import ResponseCache
+
+
+def test_get_set_and_lru_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=0, max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    # 最後に使われたのが古い b から削除される
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.stats()["hits"] == 3
+    cache.close()
+
+
+def test_async_methods_run_off_the_event_loop(tmp_path):
+    threads = []
+
+    class RecordingCache(ResponseCache):
+        def get(self, key):
+            threads.append(threading.get_ident())
+            return super().get(key)
+
+        def set(self, key, value):
+            threads.append(threading.get_ident())
+            super().set(key, value)
+
+    cache = RecordingCache(str(tmp_path / "cache.sqlite3"))
+
+    async def main():
+        await cache.set_async("key", "value")
+        value = await cache.get_async("key")
+        await cache.delete_async("key")
+        return value, await cache.get_async("key"), threading.get_ident()
+
+    value, missing, loop_thread = asyncio.run(main())
+    assert (value, missing) == ("value", None)
+    assert threads and loop_thread not in threads
+    cache.close()
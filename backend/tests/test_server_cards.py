@@ -0,0 +1,145 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def add_note(store, front, back="answer", tags=(), deck="Test", mod=None):
+    return store._insert(deck, {"Front": front, "Back": back}, list(tags), mod=mod)
+
+
+@pytest.fixture
+def api(fake_anki):
+    from src.server import app
+    with TestClient(app) as client:
+        yield client
+
+
+def test_modified_since_is_applied_before_paging(api, store):
+    now = int(time.time())
+    recent = []
+    for i in range(10):
+        # 同じ日の中で、半分は modified_since より前に更新されたノート
+        note_id = add_note(store, f"q{i}", mod=now - 7200 if i % 2 else now - 10)
+        if not i % 2:
+            recent.append(note_id)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"modified_since": now - 3600, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = api.get("/cards", params=params)
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == str(len(recent))
+        page = response.json()
+        assert len(page) == min(2, len(recent) - len(seen))
+        seen.extend(card["id"] for card in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == recent
+
+
+def test_get_cards_pages_with_total(api, store):
+    ids = [add_note(store, f"q{i}", tags=["t"] if i < 3 else []) for i in range(5)]
+    response = api.get("/cards", params={"limit": 2, "offset": 1, "fields": "id,front"})
+    assert response.headers["X-Total-Count"] == "5"
+    assert response.json() == [{"id": ids[1], "front": "q1"}, {"id": ids[2], "front": "q2"}]
+    assert response.headers["X-Next-Cursor"] == str(ids[2])
+
+    response = api.get("/cards", params={"tag": "t"})
+    assert [card["id"] for card in response.json()] == ids[:3]
+
+
+def test_create_card_converts_markdown(api, store):
+    response = api.post("/cards", json={"front": "**q**", "back": "a", "tags": ["t"]})
+    note_id = response.json()["id"]
+    assert store.notes[note_id]["fields"]["Front"]["value"] == "<p><strong>q</strong></p>"
+    assert store.notes[note_id]["deckName"] == "Test"
+
+
+def test_bulk_create_reports_duplicates_per_card(api, store):
+    add_note(store, "exists")
+    response = api.post("/cards/bulk", json={"cards": [
+        {"front": "one", "back": "a"},
+        {"front": "exists", "back": "a"},
+        {"front": "two", "back": "a"},
+    ]})
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 1)
+    assert [r["id"] is not None for r in body["results"]] == [True, False, True]
+    assert body["results"][1]["error"] == "Duplicate or invalid note"
+
+
+def test_bulk_create_skips_duplicates_within_the_request(api, store):
+    # canAddNotes は両方を通すが、addNotes に両方を送るとチャンク全体が失敗する
+    response = api.post("/cards/bulk", json={"cards": [
+        {"front": "same", "back": "a"},
+        {"front": "other", "back": "a"},
+        {"front": "<b>same</b>", "back": "b"},
+    ]})
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 1)
+    assert body["results"][2]["error"] == "Duplicate of card 0 in this request"
+    assert sorted(note["fields"]["Front"]["value"] for note in store.notes.values()) == ["<p>other</p>", "<p>same</p>"]
+
+
+def test_update_card_sends_only_changes(api, store, fake_anki):
+    note_id = add_note(store, "<p>q</p>", "<p>a</p>", tags=["keep", "old"])
+
+    fake_anki.reset_stats()
+    response = api.put(f"/cards/{note_id}", json={"front": "q", "back": "a", "tags": ["keep", "old"]})
+    assert response.json()["message"] == "Card is already up to date"
+    assert fake_anki.actions["multi"] == 0
+
+    response = api.put(f"/cards/{note_id}", json={"front": "q", "back": "b", "tags": ["keep", "new"]})
+    body = response.json()
+    assert (body["updated_fields"], body["added_tags"], body["removed_tags"]) == (["Back"], ["new"], ["old"])
+    assert store.notes[note_id]["fields"]["Back"]["value"] == "<p>b</p>"
+    assert store.notes[note_id]["tags"] == ["keep", "new"]
+
+    assert api.put("/cards/1", json={"front": "q", "back": "a"}).status_code == 404
+
+
+def test_search_indexes_the_same_markdown_as_get_cards(api, store):
+    # 照合済みの scope には、POST 後の検索では Anki と照合せず upsert した内容が返る
+    api.get("/cards/search", params={"q": "光合成"})
+    # リストは Anki の HTML から戻すと記号が変わる ("- " -> "* ")
+    response = api.post("/cards", json={"front": "- 光合成の反応", "back": "**葉緑体**", "tags": ["bio"]})
+    note_id = response.json()["id"]
+
+    hits = api.get("/cards/search", params={"q": "光合成"}).json()
+    card = api.get("/cards", params={"fields": "id,front,back"}).json()[0]
+    assert [hit["id"] for hit in hits] == [note_id]
+    assert (hits[0]["front"], hits[0]["back"]) == (card["front"], card["back"])
+
+
+def test_search_pages_with_total_and_picks_up_anki_edits(api, store):
+    ids = [add_note(store, f"光合成 {i}") for i in range(3)]
+    add_note(store, "呼吸")
+    response = api.get("/cards/search", params={"q": "光合成", "limit": 2})
+    assert response.headers["X-Total-Count"] == "3"
+    assert len(response.json()) == 2
+
+    store.notes[ids[0]]["fields"]["Front"]["value"] = "呼吸"
+    store.notes[ids[0]]["mod"] += 1
+    api.app.state.search_index._refreshed_at.clear()
+    response = api.get("/cards/search", params={"q": "光合成"})
+    assert sorted(hit["id"] for hit in response.json()) == ids[1:]
+
+
+def test_search_index_runs_sqlite_off_the_event_loop(api, monkeypatch):
+    import threading
+    index = api.app.state.search_index
+    threads = []
+    search = index.search
+    monkeypatch.setattr(index, "search", lambda *args: threads.append(threading.get_ident()) or search(*args))
+    upsert = index.upsert
+    monkeypatch.setattr(index, "upsert", lambda *args: threads.append(threading.get_ident()) or upsert(*args))
+
+    loop_thread = api.portal.call(threading.get_ident)
+    api.post("/cards", json={"front": "q", "back": "a"})
+    api.get("/cards/search", params={"q": "q"})
+    assert len(threads) == 2 and loop_thread not in threads
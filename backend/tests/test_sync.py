@@ -0,0 +1,85 @@
+import os
+import runpy
+import sys
+
+import pytest
+
+from instance import config
+from src.clients.anki_connect import close_shared_client
+from src.core.converter import parse_anki_markdown
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture
+def vault(fake_anki, monkeypatch, tmp_path):
+    directory = tmp_path / "vault"
+    directory.mkdir()
+    monkeypatch.setattr(config, "SYNC_BASE_DIR", str(directory))
+    monkeypatch.setattr(config, "OUTPUT_DIR", str(directory))
+    monkeypatch.setattr(config, "SYNC_CARD_TYPE", "AnkiCards")
+    close_shared_client()
+    yield directory
+    close_shared_client()
+
+
+def run_sync(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["sync.py", *args])
+    runpy.run_path(os.path.join(BACKEND_DIR, "scripts", "sync.py"), run_name="__main__")
+
+
+def write_card(path, front, back, tags=(), note_id=None):
+    tag_lines = "".join(f"\n  - {tag}" for tag in tags)
+    path.write_text(
+        f"---\ntype: AnkiCards\ntags:{tag_lines}\nid: {note_id or ''}\n---\n\n"
+        f"## Question\n{front}\n\n## Answer\n{back}\n",
+        encoding="utf-8",
+    )
+
+
+def file_id(path):
+    return parse_anki_markdown(path.read_text(encoding="utf-8"))["id"]
+
+
+def test_new_file_is_added_and_unchanged_file_is_not_sent(vault, store, fake_anki, monkeypatch):
+    card = vault / "card.md"
+    write_card(card, "What is ATP?", "Energy", tags=["bio"])
+    (vault / "note.md").write_text("# not a card\n", encoding="utf-8")
+
+    run_sync(monkeypatch, "--all")
+    note_id = file_id(card)
+    assert note_id in store.notes
+    assert store.notes[note_id]["tags"] == ["bio"]
+    assert len(store.notes) == 1
+
+    fake_anki.reset_stats()
+    run_sync(monkeypatch, "--all")
+    assert fake_anki.requests == 0
+
+
+def test_only_changed_fields_and_tags_are_sent(vault, store, fake_anki, monkeypatch):
+    card = vault / "card.md"
+    write_card(card, "Question", "Answer", tags=["a"])
+    run_sync(monkeypatch, "--all")
+    note_id = file_id(card)
+
+    write_card(card, "Question", "New answer", tags=["b"], note_id=note_id)
+    fake_anki.reset_stats()
+    run_sync(monkeypatch, "--all")
+
+    assert fake_anki.actions["addNote"] == 0
+    assert fake_anki.actions["updateNoteFields"] == 1
+    assert store.notes[note_id]["fields"]["Back"]["value"] == "<p>New answer</p>"
+    assert store.notes[note_id]["fields"]["Front"]["value"] == "<p>Question</p>"
+    assert store.notes[note_id]["tags"] == ["b"]
+
+
+def test_file_without_id_is_matched_to_existing_note(vault, store, monkeypatch):
+    existing_id = store._insert("Test", {"Front": "<p>Existing</p>", "Back": "old"}, [])
+    card = vault / "card.md"
+    write_card(card, "Existing", "Answer")
+
+    run_sync(monkeypatch, "--all")
+    assert file_id(card) == existing_id
+    assert len(store.notes) == 1
+    assert store.notes[existing_id]["fields"]["Back"]["value"] == "<p>Answer</p>"
@@ -10,7 +10,21 @@ import { GenerateCard } from './features/generate/components/GenerateCard';
  * 必要に応じて、ここに React Router (Routes, Route) や Context Provider を追加してください。
  */
 function App() {
-  const { cards, addCard, updateCard } = useCards();
+  const {
+    cards,
+    total,
+    deckTotal,
+    loading,
+    hasMore,
+    loadMore,
+    addCard,
+    updateCard,
+    tags,
+    selectedTags,
+    setSelectedTags,
+    query,
+    setQuery,
+  } = useCards();
   const [newCard, setNewCard] = useState({ front: '', back: '' });
 
   const handleCardGenerated = (front: string, back: string) => {
@@ -18,7 +32,7 @@ function App() {
   };
 
   return (
-    <MainLayout totalCards={cards.length}>
+    <MainLayout totalCards={deckTotal}>
       <div className="grid gap-8 md:grid-cols-[350px_1fr]">
         {/* Sidebar: Add New Card Form */}
         <aside>
@@ -34,7 +48,19 @@ function App() {
 
         {/* Main Content: Card List */}
         <main>
-          <CardList cards={cards} onUpdate={updateCard} />
+          <CardList
+            cards={cards}
+            total={total}
+            tags={tags}
+            selectedTags={selectedTags}
+            onSelectedTagsChange={setSelectedTags}
+            query={query}
+            onQueryChange={setQuery}
+            onUpdate={updateCard}
+            hasMore={hasMore}
+            loading={loading}
+            onLoadMore={loadMore}
+          />
         </main>
       </div>
     </MainLayout>
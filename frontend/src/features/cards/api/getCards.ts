@@ -1,10 +1,34 @@
 import { axiosInstance } from '@/lib/axios';
 import type { Card } from '@/types';
 
+export type GetCardsParams = {
+  deck?: string;
+  tag?: string[];
+  q?: string;
+  limit?: number;
+  cursor?: number;
+};
+
+export type CardPage = {
+  cards: Card[];
+  total: number;
+  nextCursor: number | null;
+};
+
 /**
- * すべてのカードを取得するAPI
+ * カードを1ページ分取得するAPI
+ * 総件数と次ページのカーソルはレスポンスヘッダーから取得します。
  */
-export const getCards = async (): Promise<Card[]> => {
-  const response = await axiosInstance.get('/cards');
-  return response.data;
+export const getCards = async (params: GetCardsParams = {}): Promise<CardPage> => {
+  const response = await axiosInstance.get('/cards', {
+    params,
+    // tag=a&tag=b 形式で送る (FastAPIのList[str]クエリに合わせる)
+    paramsSerializer: { indexes: null },
+  });
+  const nextCursor = response.headers['x-next-cursor'];
+  return {
+    cards: response.data,
+    total: Number(response.headers['x-total-count'] ?? response.data.length),
+    nextCursor: nextCursor ? Number(nextCursor) : null,
+  };
 };
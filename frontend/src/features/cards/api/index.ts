@@ -1,3 +1,4 @@
 export * from './getCards';
 export * from './createCard';
 export * from './updateCard';
+export * from './searchCards';
@@ -0,0 +1,32 @@
+import { axiosInstance } from '@/lib/axios';
+import type { Card } from '@/types';
+
+export type SearchCardsParams = {
+  q: string;
+  deck?: string;
+  limit?: number;
+  offset?: number;
+};
+
+export type CardSearchHit = Omit<Card, 'deckName'> & {
+  // 一致箇所を <mark> で囲んだ抜粋
+  snippet: string;
+  score: number;
+};
+
+export type CardSearchPage = {
+  hits: CardSearchHit[];
+  total: number;
+};
+
+/**
+ * カードを全文検索するAPI (一致度の高い順)
+ * 総件数はレスポンスヘッダーから取得します。
+ */
+export const searchCards = async (params: SearchCardsParams): Promise<CardSearchPage> => {
+  const response = await axiosInstance.get('/cards/search', { params });
+  return {
+    hits: response.data,
+    total: Number(response.headers['x-total-count'] ?? response.data.length),
+  };
+};
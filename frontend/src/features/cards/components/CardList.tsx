@@ -1,10 +1,25 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import type { Card } from '../../../types';
 import { ModifyCardAI } from '../../generate/components/ModifyCardAI';
 
+// 入力が止まってから検索するまでの時間 (ミリ秒)
+const SEARCH_DEBOUNCE_MS = 300;
+
 interface CardListProps {
   cards: Card[];
+  // 現在の絞り込みに一致するカードの総件数 (読み込み済みでないものも含む)
+  total: number;
+  // タグの選択肢
+  tags: string[];
+  selectedTags: string[];
+  onSelectedTagsChange: (tags: string[]) => void;
+  // 全文検索の検索語 (空なら一覧を表示)
+  query: string;
+  onQueryChange: (query: string) => void;
   onUpdate: (id: number, front: string, back: string, tags?: string[]) => void;
+  hasMore?: boolean;
+  loading?: boolean;
+  onLoadMore?: () => void;
 }
 
 interface EditableCardHelperProps {
@@ -108,9 +123,11 @@ function EditableCard({ card, onUpdate }: EditableCardHelperProps) {
       {/* Header: DeckName, Tags & Actions */}
       <div className="flex justify-between items-start mb-3">
         <div className="flex items-center gap-2 flex-wrap">
-          <span className="text-xs font-medium px-2.5 py-1 bg-gray-100 text-gray-600 rounded-md">
-            {card.deckName}
-          </span>
+          {card.deckName && (
+            <span className="text-xs font-medium px-2.5 py-1 bg-gray-100 text-gray-600 rounded-md">
+              {card.deckName}
+            </span>
+          )}
           {card.tags && card.tags.map((tag) => (
             <span key={tag} className="text-xs font-medium px-2 py-0.5 bg-blue-50 text-blue-600 rounded border border-blue-100">
               #{tag}
@@ -152,32 +169,36 @@ function EditableCard({ card, onUpdate }: EditableCardHelperProps) {
  * カードリストを表示するコンポーネント
  * カードの一覧表示、編集開始アクションを提供します。
  */
-export function CardList({ cards, onUpdate }: CardListProps) {
-  const [selectedTags, setSelectedTags] = useState<string[]>([]);
-
-  // 全カードからユニークなタグを抽出してソート
-  const allTags = Array.from(new Set(cards.flatMap(c => c.tags || []))).sort();
-
-  // 選択されたタグでフィルタリング (AND検索: 選択した全てのタグを持っているカードを表示)
-  // OR検索にしたい場合は .some() を使いますが、通常フィルタは絞り込み(AND)が直感的です。
-  // ここでは「選択したタグのいずれかを含む(OR)」か「すべてを含む(AND)」か迷うところですが、
-  // タグフィルタは通常「このタグに関連するもの」を見たいので、複数選択時はOR（いずれかを含む）の方が
-  // 緩やかに集合を作れて使いやすいことが多いです。
-  // しかし、AnkiのBrowser検索などでは AND がデフォルトのことが多いです。
-  // ユーザーの意図としては「これとこれに関連するカード」を見たい場合が多いので、
-  // ここでは OR (いずれかを含む) を採用してみます。もし絞り込みすぎると何も出なくなるため。
-
-  // 選択されたすべてのタグを含むカードを表示 (AND検索)
-  // ユーザー要望により、複数選択時は A AND B で絞り込みます。
-  const filteredCards = selectedTags.length > 0
-    ? cards.filter(c => selectedTags.every(tag => c.tags?.includes(tag)))
-    : cards;
+export function CardList({
+  cards,
+  total,
+  tags,
+  selectedTags,
+  onSelectedTagsChange,
+  query,
+  onQueryChange,
+  onUpdate,
+  hasMore = false,
+  loading = false,
+  onLoadMore,
+}: CardListProps) {
+  // 選択されたすべてのタグを含むカード (AND検索) をサーバーで絞り込みます。
+  // 選択中のタグは、一覧に含まれなくなっても選択肢に残す
+  const allTags = Array.from(new Set([...tags, ...selectedTags])).sort();
+  const searching = query.trim() !== '';
+
+  // 入力のたびにリクエストしないよう、入力が止まってから検索する
+  const [searchInput, setSearchInput] = useState(query);
+  useEffect(() => {
+    const timer = setTimeout(() => onQueryChange(searchInput), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchInput, onQueryChange]);
 
   const toggleTag = (tag: string) => {
-    setSelectedTags(prev =>
-      prev.includes(tag)
-        ? prev.filter(t => t !== tag)
-        : [...prev, tag]
+    onSelectedTagsChange(
+      selectedTags.includes(tag)
+        ? selectedTags.filter(t => t !== tag)
+        : [...selectedTags, tag]
     );
   };
 
@@ -185,14 +206,23 @@ export function CardList({ cards, onUpdate }: CardListProps) {
     <div>
       <div className="flex flex-col gap-4 mb-6">
         <div className="flex justify-between items-center">
-          <h2 className="text-xl font-bold text-gray-800">Your Cards <span className="text-sm font-normal text-gray-500">({filteredCards.length})</span></h2>
+          <h2 className="text-xl font-bold text-gray-800">Your Cards <span className="text-sm font-normal text-gray-500">({total})</span></h2>
         </div>
 
-        {/* Tag Filters */}
-        {allTags.length > 0 && (
+        {/* Full-text Search */}
+        <input
+          type="search"
+          className="w-full border p-2 rounded-lg text-sm focus:ring-2 focus:ring-blue-500 focus:outline-none"
+          value={searchInput}
+          onChange={(e) => setSearchInput(e.target.value)}
+          placeholder="Search front, back and tags..."
+        />
+
+        {/* Tag Filters (全文検索中は使わない) */}
+        {!searching && allTags.length > 0 && (
           <div className="flex flex-wrap gap-2 pb-2">
             <button
-              onClick={() => setSelectedTags([])}
+              onClick={() => onSelectedTagsChange([])}
               className={`px-3 py-1 text-xs font-medium rounded-full transition-colors ${
                 selectedTags.length === 0
                   ? 'bg-gray-800 text-white'
@@ -219,7 +249,7 @@ export function CardList({ cards, onUpdate }: CardListProps) {
       </div>
 
       <div className="space-y-4">
-        {filteredCards.map((card) => (
+        {cards.map((card) => (
           <EditableCard
             key={card.id}
             card={card}
@@ -227,11 +257,28 @@ export function CardList({ cards, onUpdate }: CardListProps) {
           />
         ))}
 
+        {/* 続きのページ読み込み */}
+        {hasMore && onLoadMore && (
+          <div className="text-center">
+            <button
+              onClick={onLoadMore}
+              disabled={loading}
+              className="px-4 py-2 text-sm text-gray-600 bg-white border border-gray-200 rounded-lg hover:bg-gray-50 disabled:opacity-50"
+            >
+              {loading ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
+
         {/* Empty State */}
-        {filteredCards.length === 0 && (
+        {cards.length === 0 && !loading && (
           <div className="text-center py-12 bg-white rounded-xl border border-dashed border-gray-300">
             <p className="text-gray-400 mb-2">No cards found</p>
-            {selectedTags.length > 0 ? (
+            {searching ? (
+               <p className="text-sm text-gray-500">
+                 Try different search words.
+               </p>
+            ) : selectedTags.length > 0 ? (
                <p className="text-sm text-gray-500">
                  Try selecting different tags or clear the filter.
                </p>
@@ -1,37 +1,135 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import type { Card } from '../../../types';
 import * as cardApi from '../api';
 
+// 1回のリクエストで取得するカード数
+const PAGE_SIZE = 200;
+
+// 読み込み済みの一覧に、まだ含まれていないカードだけを追加する (ページの境界で同じカードが返る場合がある)
+const appendUnique = (prev: Card[], next: Card[]) => {
+  const seen = new Set(prev.map((card) => card.id));
+  return [...prev, ...next.filter((card) => !seen.has(card.id))];
+};
+
+const hasAllTags = (card: Card, tags: string[]) => tags.every((tag) => card.tags?.includes(tag));
+
+// 検索結果にはデッキ名が含まれない
+const hitToCard = (hit: cardApi.CardSearchHit): Card => ({
+  id: hit.id,
+  front: hit.front,
+  back: hit.back,
+  tags: hit.tags,
+  deckName: '',
+});
+
 /**
  * カードデータのCRUD操作を管理するカスタムフック
+ * タグの絞り込みはサーバー (GET /cards の tag) で行い、選択が変わったら1ページ目から取り直します。
+ * 検索語がある時は全文検索 (GET /cards/search、一致度順) の結果を表示します (タグの絞り込みは使わない)。
  */
 export const useCards = () => {
   const [cards, setCards] = useState<Card[]>([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  // 現在の絞り込みに一致する総件数
+  const [total, setTotal] = useState(0);
+  // 絞り込みなしの総件数 (ヘッダー表示用)
+  const [deckTotal, setDeckTotal] = useState(0);
+  // 次のページの位置 (一覧では最後のノートID、検索では offset)
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  const [selectedTags, setSelectedTags] = useState<string[]>([]);
+  const [query, setQuery] = useState('');
+  const searchText = query.trim();
+  const activeTags = searchText ? [] : selectedTags;
+  // これまでに取得したカードのタグ (絞り込み中も選択肢から消えないようにする)
+  const [knownTags, setKnownTags] = useState<string[]>([]);
+  // 絞り込みを変えた後に、古い条件のレスポンスで一覧を上書きしないための連番
+  const requestId = useRef(0);
+
+  const rememberTags = useCallback((newCards: Card[]) => {
+    setKnownTags((prev) => {
+      const tags = new Set(prev);
+      newCards.forEach((card) => card.tags?.forEach((tag) => tags.add(tag)));
+      return tags.size === prev.length ? prev : Array.from(tags).sort();
+    });
+  }, []);
+
+  // position から1ページ分を取得する (null は1ページ目)
+  const getPage = useCallback(async (position: number | null): Promise<cardApi.CardPage> => {
+    if (searchText) {
+      const offset = position ?? 0;
+      const page = await cardApi.searchCards({ q: searchText, limit: PAGE_SIZE, offset });
+      const end = offset + page.hits.length;
+      return { cards: page.hits.map(hitToCard), total: page.total, nextCursor: end < page.total ? end : null };
+    }
+    return cardApi.getCards({ limit: PAGE_SIZE, tag: selectedTags, cursor: position ?? undefined });
+  }, [searchText, selectedTags]);
 
   const fetchCards = useCallback(async () => {
+    const id = ++requestId.current;
     setLoading(true);
     try {
-      const data = await cardApi.getCards();
-      setCards(data);
+      const page = await getPage(null);
+      if (id !== requestId.current) return;
+      setCards(page.cards);
+      setTotal(page.total);
+      if (!searchText && selectedTags.length === 0) setDeckTotal(page.total);
+      setNextCursor(page.nextCursor);
+      rememberTags(page.cards);
       setError(null);
     } catch (err) {
+      if (id !== requestId.current) return;
       setError('Failed to fetch cards');
       console.error(err);
     } finally {
-      setLoading(false);
+      if (id === requestId.current) setLoading(false);
     }
-  }, []);
+  }, [getPage, searchText, selectedTags, rememberTags]);
 
   useEffect(() => {
     fetchCards();
   }, [fetchCards]);
 
+  // 次のページを取得して末尾に追加する
+  const loadMore = useCallback(async () => {
+    if (nextCursor === null) return;
+    const id = ++requestId.current;
+    setLoading(true);
+    try {
+      const page = await getPage(nextCursor);
+      if (id !== requestId.current) return;
+      setCards((prev) => appendUnique(prev, page.cards));
+      setTotal(page.total);
+      setNextCursor(page.nextCursor);
+      rememberTags(page.cards);
+    } catch (err) {
+      if (id !== requestId.current) return;
+      setError('Failed to fetch cards');
+      console.error(err);
+    } finally {
+      if (id === requestId.current) setLoading(false);
+    }
+  }, [nextCursor, getPage, rememberTags]);
+
   const addCard = async (front: string, back: string, deckName: string) => {
     try {
-      await cardApi.createCard({ front, back, deckName });
-      await fetchCards();
+      const created = await cardApi.createCard({ front, back, deckName });
+      const card: Card = { id: created.id, front, back, deckName, tags: [] };
+      setDeckTotal((prev) => prev + 1);
+      if (searchText) {
+        // 検索結果のどこに入るかは一致度で決まるため、取り直す
+        await fetchCards();
+        return;
+      }
+      if (!hasAllTags(card, selectedTags)) return;
+      // 新しいカードはIDが最大なので、最後のページまで読み込み済みの時だけ末尾に追加する
+      // 続きのページがある場合は、カーソルと総件数が合うように1ページ目から取り直す
+      if (nextCursor === null) {
+        setCards((prev) => appendUnique(prev, [card]));
+        setTotal((prev) => prev + 1);
+      } else {
+        await fetchCards();
+      }
     } catch (err) {
       console.error('Failed to create card', err);
     }
@@ -40,11 +138,36 @@ export const useCards = () => {
   const updateCard = async (id: number, front: string, back: string, tags?: string[]) => {
     try {
       await cardApi.updateCard(id, { front, back, tags });
-      await fetchCards();
+      const target = cards.find((card) => card.id === id);
+      if (target && !hasAllTags({ ...target, tags: tags ?? target.tags }, activeTags)) {
+        // タグを外して絞り込みに一致しなくなったカードは一覧から除く
+        setCards((prev) => prev.filter((card) => card.id !== id));
+        setTotal((prev) => prev - 1);
+        return;
+      }
+      setCards((prev) =>
+        prev.map((card) => (card.id === id ? { ...card, front, back, tags: tags ?? card.tags } : card))
+      );
+      if (tags) rememberTags([{ id, front, back, deckName: '', tags }]);
     } catch (err) {
       console.error('Failed to update card', err);
     }
   };
 
-  return { cards, loading, error, addCard, updateCard };
+  return {
+    cards,
+    total,
+    deckTotal,
+    loading,
+    error,
+    hasMore: nextCursor !== null,
+    loadMore,
+    addCard,
+    updateCard,
+    tags: knownTags,
+    selectedTags,
+    setSelectedTags,
+    query,
+    setQuery,
+  };
 };
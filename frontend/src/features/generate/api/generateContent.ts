@@ -1,4 +1,5 @@
 import { axiosInstance as axios } from '@/lib/axios';
+import { postEventStream } from '@/lib/sse';
 
 export type GenerateRequest = {
   prompt: string;
@@ -24,3 +25,25 @@ export const generateContent = async (data: GenerateRequest): Promise<GenerateRe
   }
   return response.data;
 };
+
+export type GenerateField = keyof GenerateResponse;
+
+// ストリーミング版: chat / front / back が完成するたびに onField を呼び、最後に全体を返す
+export const generateContentStream = async (
+  data: GenerateRequest,
+  onField: (key: GenerateField, value: string) => void,
+  signal?: AbortSignal
+): Promise<GenerateResponse> => {
+  let result: GenerateResponse = { chat: '', front: '', back: '' };
+  await postEventStream('/generate', { ...data, stream: true }, ({ event, data: payload }) => {
+    if (event === 'field') {
+      result = { ...result, [payload.key]: payload.value };
+      onField(payload.key, payload.value);
+    } else if (event === 'done') {
+      result = { ...result, ...payload };
+    } else if (event === 'error') {
+      throw new Error(payload.detail || 'Failed to generate content');
+    }
+  }, signal);
+  return result;
+};
@@ -1,4 +1,5 @@
 import { axiosInstance as axios } from '@/lib/axios';
+import { postEventStream } from '@/lib/sse';
 
 export type ModifyRequest = {
   front: string;
@@ -15,3 +16,23 @@ export const modifyContent = async (data: ModifyRequest): Promise<ModifyResponse
   const response = await axios.post<ModifyResponse>('/generate/modify', data);
   return response.data;
 };
+
+// ストリーミング版: front / back が完成するたびに onField を呼び、最後に全体を返す
+export const modifyContentStream = async (
+  data: ModifyRequest,
+  onField: (key: keyof ModifyResponse, value: string) => void,
+  signal?: AbortSignal
+): Promise<ModifyResponse> => {
+  let result: ModifyResponse = { front: data.front, back: data.back };
+  await postEventStream('/generate/modify', { ...data, stream: true }, ({ event, data: payload }) => {
+    if (event === 'field') {
+      result = { ...result, [payload.key]: payload.value };
+      onField(payload.key, payload.value);
+    } else if (event === 'done') {
+      result = { ...result, ...payload };
+    } else if (event === 'error') {
+      throw new Error(payload.detail || 'Failed to modify content');
+    }
+  }, signal);
+  return result;
+};
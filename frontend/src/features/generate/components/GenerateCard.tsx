@@ -1,6 +1,5 @@
 import { useState } from 'react';
-import { AxiosError } from 'axios';
-import { generateContent } from '../api/generateContent';
+import { generateContentStream } from '../api/generateContent';
 
 type GenerateStatus = 'idle' | 'loading' | 'success' | 'error';
 
@@ -22,8 +21,11 @@ export function GenerateCard({ onCardGenerated }: GenerateCardProps) {
     setChatResult('');
 
     try {
-      const response = await generateContent({ prompt });
-      
+      // chat が完成した時点で表示し、カードは生成完了後にフォームへ反映する
+      const response = await generateContentStream({ prompt }, (key, value) => {
+        if (key === 'chat') setChatResult(value);
+      });
+
       setChatResult(response.chat);
       setStatus('success');
       
@@ -31,10 +33,7 @@ export function GenerateCard({ onCardGenerated }: GenerateCardProps) {
         onCardGenerated(response.front, response.back);
       }
     } catch (e) {
-      const errorMessage =
-        e instanceof AxiosError
-          ? e.response?.data?.detail || 'Failed to generate content'
-          : 'Failed to generate content';
+      const errorMessage = e instanceof Error && e.message ? e.message : 'Failed to generate content';
       setError(errorMessage);
       setStatus('error');
     }
@@ -87,7 +86,7 @@ export function GenerateCard({ onCardGenerated }: GenerateCardProps) {
           </div>
         )}
 
-        {status === 'success' && chatResult && (
+        {(status === 'loading' || status === 'success') && chatResult && (
           <div className="mt-4">
             <label className="block text-xs font-semibold text-gray-500 uppercase tracking-wide mb-1">
               AI Response
@@ -95,10 +94,12 @@ export function GenerateCard({ onCardGenerated }: GenerateCardProps) {
             <div className="p-3 bg-purple-50 rounded-lg text-sm whitespace-pre-wrap border border-purple-100 text-purple-900 max-h-60 overflow-y-auto">
               {chatResult}
             </div>
-            <div className="mt-2 text-xs text-green-600 font-medium text-right flex items-center justify-end gap-1">
-              <span className="w-2 h-2 rounded-full bg-green-500 inline-block"></span>
-              Card content has been applied to the form below
-            </div>
+            {status === 'success' && (
+              <div className="mt-2 text-xs text-green-600 font-medium text-right flex items-center justify-end gap-1">
+                <span className="w-2 h-2 rounded-full bg-green-500 inline-block"></span>
+                Card content has been applied to the form below
+              </div>
+            )}
           </div>
         )}
       </div>
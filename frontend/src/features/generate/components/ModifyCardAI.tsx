@@ -1,6 +1,5 @@
 import { useState } from 'react';
-import { AxiosError } from 'axios';
-import { modifyContent } from '../api/modifyContent';
+import { modifyContentStream } from '../api/modifyContent';
 
 type Status = 'idle' | 'loading' | 'success' | 'error';
 
@@ -15,26 +14,29 @@ export function ModifyCardAI({ currentFront, currentBack, onModified, onCancel }
   const [instruction, setInstruction] = useState('');
   const [status, setStatus] = useState<Status>('idle');
   const [error, setError] = useState('');
+  const [preview, setPreview] = useState<{ front?: string; back?: string }>({});
 
   const handleModify = async () => {
     if (!instruction.trim()) return;
 
     setStatus('loading');
     setError('');
+    setPreview({});
 
     try {
-      const response = await modifyContent({
-        front: currentFront,
-        back: currentBack,
-        instruction: instruction,
-      });
+      // front / back が完成するたびにプレビューを表示し、完了後にフォームへ反映する
+      const response = await modifyContentStream(
+        {
+          front: currentFront,
+          back: currentBack,
+          instruction: instruction,
+        },
+        (key, value) => setPreview((prev) => ({ ...prev, [key]: value }))
+      );
       onModified(response.front, response.back);
       setStatus('success');
     } catch (e) {
-      const errorMessage =
-        e instanceof AxiosError
-          ? e.response?.data?.detail || 'Failed to modify content'
-          : 'Failed to modify content';
+      const errorMessage = e instanceof Error && e.message ? e.message : 'Failed to modify content';
       setError(errorMessage);
       setStatus('error');
     }
@@ -60,6 +62,13 @@ export function ModifyCardAI({ currentFront, currentBack, onModified, onCancel }
         />
       </div>
 
+      {status === 'loading' && (preview.front || preview.back) && (
+        <div className="mb-3 p-2 bg-white rounded border border-purple-100 text-xs text-gray-700 whitespace-pre-wrap max-h-40 overflow-y-auto">
+          {preview.front && <div className="mb-1">{preview.front}</div>}
+          {preview.back && <div className="text-gray-500">{preview.back}</div>}
+        </div>
+      )}
+
       {error && (
         <div className="mb-3 p-2 bg-red-50 text-red-600 text-xs rounded border border-red-100">
           {error}
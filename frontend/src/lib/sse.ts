@@ -0,0 +1,55 @@
+import { API_URL } from '../config';
+
+export type ServerSentEvent = {
+  event: string;
+  // eslint-disable-next-line @typescript-eslint/no-explicit-any
+  data: any;
+};
+
+// POST して text/event-stream のレスポンスを1イベントずつ onEvent に渡す
+// (EventSource は GET しか使えないため fetch + ReadableStream で読む)
+export const postEventStream = async (
+  path: string,
+  body: unknown,
+  onEvent: (event: ServerSentEvent) => void,
+  signal?: AbortSignal
+): Promise<void> => {
+  const response = await fetch(`${API_URL}${path}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify(body),
+    signal,
+  });
+  if (!response.ok || !response.body) {
+    const detail = await response.json().then((d) => d.detail).catch(() => undefined);
+    throw new Error(detail || `Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  const dispatch = (block: string) => {
+    let event = 'message';
+    const dataLines: string[] = [];
+    for (const line of block.split('\n')) {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+    }
+    if (dataLines.length === 0) return;
+    onEvent({ event, data: JSON.parse(dataLines.join('\n')) });
+  };
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let separator = buffer.indexOf('\n\n');
+    while (separator !== -1) {
+      dispatch(buffer.slice(0, separator));
+      buffer = buffer.slice(separator + 2);
+      separator = buffer.indexOf('\n\n');
+    }
+  }
+  if (buffer.trim()) dispatch(buffer);
+};